@@ -4,18 +4,33 @@ Snapshot Store Engine.
 Main entry point coordinating all components.
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Optional, List, Set, Dict
-import json
+from typing import Iterator, Optional, List, Set, Dict
+import os
+import re
+import struct
+import threading
+import time
 
 from .storage.layout import StorageLayout
 from .storage.object_store import ObjectStore
+from .storage.sqlite_store import SqliteObjectStore
 from .storage.gc import GarbageCollector
 from .integrity.verification import (
     verify_snapshot_recursive,
     detect_tampering,
 )
 from .integration.sync_adapter import SyncAdapter
+from .integrity.hashing import (
+    DIGEST_SIZE,
+    compute_hash,
+    hash_to_digest,
+    iter_digest_hashes,
+)
+from .integrity.canonical import decode_json, pretty_json
 from .errors import (
     SnapshotStoreError,
     SnapshotVerificationError,
@@ -27,6 +42,62 @@ from .model.snapshot import Snapshot
 from .model.tree import Tree
 
 
+# Number of bundles, snapshots and trees kept by the model cache
+MODEL_CACHE_SIZE = 4096
+
+# Number of verified object fingerprints remembered between calls
+VERIFIED_CACHE_SIZE = 65536
+
+# Matches the missing hash in ReferenceMissingError messages
+_MISSING_REF_RE = re.compile(r'references missing object ([0-9a-f]{64})\b')
+
+
+class _VerifiedObjects:
+    """
+    Visited set for verify_snapshot_recursive backed by a shared memo.
+    
+    Hashes verified in this pass are members, as are hashes verified by
+    earlier passes whose object file still has the fingerprint it had
+    then. The fingerprint includes the ctime, which a writer cannot set
+    back, so any rewrite since is re-verified. Objects without a
+    fingerprint (inline SQLite rows) are only remembered for the
+    current pass.
+    """
+    
+    def __init__(self, fingerprint_func, memo: OrderedDict, lock: threading.Lock):
+        """Initialize an empty pass over the shared memo."""
+        self._fingerprint = fingerprint_func
+        self._memo = memo
+        self._lock = lock
+        self._local: Set[str] = set()
+    
+    def __contains__(self, obj_hash: str) -> bool:
+        """Check whether an object is known to be intact."""
+        if obj_hash in self._local:
+            return True
+        
+        with self._lock:
+            remembered = self._memo.get(obj_hash)
+        if remembered is None or remembered != self._fingerprint(obj_hash):
+            return False
+        
+        self._local.add(obj_hash)
+        return True
+    
+    def add(self, obj_hash: str) -> None:
+        """Record an object as verified."""
+        self._local.add(obj_hash)
+        
+        fingerprint = self._fingerprint(obj_hash)
+        if fingerprint is None:
+            return
+        with self._lock:
+            self._memo[obj_hash] = fingerprint
+            self._memo.move_to_end(obj_hash)
+            if len(self._memo) > VERIFIED_CACHE_SIZE:
+                self._memo.popitem(last=False)
+
+
 class SnapshotStoreEngine:
     """
     Main engine for snapshot and object store operations.
@@ -39,25 +110,67 @@ class SnapshotStoreEngine:
     - Integrating with sqlite-sync-core
     """
     
-    def __init__(self, store_path: str | Path):
+    def __init__(
+        self,
+        store_path: str | Path,
+        backend: str = 'file',
+        existence_filter: bool = False
+    ):
         """
         Initialize snapshot store at given path.
         
         Args:
             store_path: filesystem path for object storage
+            backend: 'file' for one file per object, or 'sqlite' to keep
+                small objects in a single SQLite database
+            existence_filter: keep a Bloom filter of stored hashes, built
+                by initialize(), so has_object answers most misses without
+                touching storage; only safe when this engine is the
+                store's sole writer. Garbage collection never consults
+                it, so a stale filter cannot cause reachable objects to
+                be deleted.
         """
         self.store_path = Path(store_path).resolve()
         self.layout = StorageLayout(self.store_path)
-        self.object_store = ObjectStore(self.layout)
+        
+        if backend == 'file':
+            self.object_store = ObjectStore(self.layout)
+        elif backend == 'sqlite':
+            self.object_store = SqliteObjectStore(self.layout)
+        else:
+            raise ValueError(f"Unknown storage backend: {backend}")
+        
+        self.backend = backend
+        self.existence_filter = existence_filter
+        
+        # (monotonic time, statistics) of the last get_statistics() scan
+        self._stats_cache: Optional[tuple] = None
+        
+        # obj_hash -> (file fingerprint, verified stored bytes), see _get_model
+        self._model_cache: OrderedDict = OrderedDict()
+        self._model_cache_lock = threading.Lock()
+        # obj_hash -> file fingerprint when last verified, see _VerifiedObjects
+        self._verified_memo: OrderedDict = OrderedDict()
+        self._verified_memo_lock = threading.Lock()
+        
         self.sync_adapter = SyncAdapter(self.object_store)
         
         # Initialize garbage collector
         self.gc = GarbageCollector(
-            list_all_func=self.object_store.list_all_objects,
+            list_all_func=self.object_store.iter_all_objects,
             load_object_func=lambda h: self.object_store.get_object(h, verify=False),
             delete_object_func=self.object_store.delete_object,
-            exists_func=self.object_store.has_object,
+            # A filter false negative would leave children untraversed
+            exists_func=lambda h: self.object_store.has_object(h, use_filter=False),
+            delete_many_func=self.object_store.delete_many,
+            load_many_func=self.object_store.load_many,
+            references_func=self.object_store.get_object_refs,
+            references_many_func=self.object_store.get_object_refs_many,
         )
+        
+        # GC closures keyed by root hash. Content addressing makes a
+        # complete closure immutable, so entries never need invalidation.
+        self._closure_cache: Dict[str, frozenset] = {}
     
     def initialize(self) -> None:
         """
@@ -67,6 +180,19 @@ class SnapshotStoreEngine:
         Safe to call multiple times (idempotent).
         """
         self.layout.initialize()
+        
+        if self.existence_filter:
+            self.object_store.enable_existence_filter()
+    
+    def close(self) -> None:
+        """
+        Close the store.
+        
+        Saves the existence filter, if enabled, so the next engine
+        opened on an unchanged store skips the scan that builds it, and
+        closes the descriptor held on the objects directory.
+        """
+        self.object_store.close()
     
     # ========== Object Storage ==========
     
@@ -80,14 +206,20 @@ class SnapshotStoreEngine:
         
         Returns:
             str: content hash of stored blob
+        
+        The content is stored as raw bytes rather than base64; the hash
+        is the same as that of the blob's canonical dictionary.
         """
-        blob = Blob(data, metadata)
-        return self.object_store.put_object(blob.to_dict())
+        return self.object_store.put_blob(data, metadata)
     
     def get_blob(self, blob_hash: str) -> Blob:
         """Retrieve a blob by hash."""
-        obj_data = self.object_store.get_object(blob_hash)
-        return Blob.from_dict(obj_data)
+        content = self.object_store.get_blob_content(blob_hash)
+        if content is None:
+            # Stored as canonical JSON
+            obj_data = self.object_store.get_object(blob_hash)
+            return Blob.from_dict(obj_data, blob_hash)
+        return Blob.from_content(*content, obj_hash=blob_hash)
     
     def put_bundle(self, bundle_data: dict, metadata: Optional[dict] = None) -> str:
         """
@@ -104,8 +236,7 @@ class SnapshotStoreEngine:
     
     def get_bundle(self, bundle_hash: str) -> Bundle:
         """Retrieve a bundle by hash."""
-        obj_data = self.object_store.get_object(bundle_hash)
-        return Bundle.from_dict(obj_data)
+        return self._get_model(Bundle, bundle_hash)
     
     def put_snapshot(
         self,
@@ -125,12 +256,11 @@ class SnapshotStoreEngine:
             str: content hash of stored snapshot
         """
         snapshot = Snapshot(bundles, parent, metadata)
-        return self.object_store.put_object(snapshot.to_dict())
+        return self.object_store.put_model(snapshot)
     
     def get_snapshot(self, snapshot_hash: str) -> Snapshot:
         """Retrieve a snapshot by hash."""
-        obj_data = self.object_store.get_object(snapshot_hash)
-        return Snapshot.from_dict(obj_data)
+        return self._get_model(Snapshot, snapshot_hash)
     
     def put_tree(self, children: List[str], metadata: Optional[dict] = None) -> str:
         """
@@ -144,21 +274,67 @@ class SnapshotStoreEngine:
             str: content hash of stored tree
         """
         tree = Tree(children, metadata)
-        return self.object_store.put_object(tree.to_dict())
+        return self.object_store.put_model(tree)
     
     def get_tree(self, tree_hash: str) -> Tree:
         """Retrieve a tree by hash."""
-        obj_data = self.object_store.get_object(tree_hash)
-        return Tree.from_dict(obj_data)
+        return self._get_model(Tree, tree_hash)
     
     def has_object(self, obj_hash: str) -> bool:
         """Check if an object exists."""
         return self.object_store.has_object(obj_hash)
     
+    def _get_model(self, model_cls, obj_hash: str):
+        """
+        Load and verify an object as a model instance, with caching.
+        
+        The verified stored bytes of an object are kept in an LRU cache
+        together with the fingerprint of their file, and reused while
+        the file is unchanged; the fingerprint includes the ctime, so
+        even an in-place rewrite with a restored mtime reloads the
+        object. Objects without a file fingerprint (inline SQLite rows)
+        are always loaded. Each call decodes a new instance, so callers
+        modifying a model's nested data never affect one another.
+        """
+        fingerprint = self.object_store.object_fingerprint(obj_hash)
+        
+        payload = None
+        if fingerprint is not None:
+            with self._model_cache_lock:
+                entry = self._model_cache.get(obj_hash)
+                if entry is not None and entry[0] == fingerprint:
+                    self._model_cache.move_to_end(obj_hash)
+                    payload = entry[1]
+        
+        if payload is not None:
+            return model_cls.from_dict(decode_json(payload), obj_hash)
+        
+        obj_data, payload = self.object_store.load_verified_object(obj_hash)
+        obj = model_cls.from_dict(obj_data, obj_hash)
+        
+        # Only bundles, snapshots and trees get here, stored as JSON
+        if fingerprint is not None:
+            with self._model_cache_lock:
+                self._model_cache[obj_hash] = (fingerprint, payload)
+                if len(self._model_cache) > MODEL_CACHE_SIZE:
+                    self._model_cache.popitem(last=False)
+        
+        return obj
+    
     def get_object_raw(self, obj_hash: str) -> dict:
         """Get raw object dictionary."""
         return self.object_store.get_object(obj_hash)
     
+    def train_compression_dictionary(self, max_samples: int = 1000) -> None:
+        """
+        Enable zstd compression of object files for this store.
+        
+        Trains a dictionary from up to max_samples existing objects and
+        saves it in the store; object files written afterwards are
+        compressed with it. Requires the optional zstandard package.
+        """
+        self.object_store.train_compression_dictionary(max_samples)
+    
     # ========== Named References ==========
     
     def create_snapshot_ref(self, name: str, snapshot_hash: str) -> None:
@@ -190,34 +366,78 @@ class SnapshotStoreEngine:
         Returns True if valid.
         Raises ObjectCorruptedError if corrupted.
         """
-        # get_object with verify=True will check integrity
-        self.object_store.get_object(obj_hash, verify=True)
-        return True
+        return self.object_store.verify_object(obj_hash)
     
-    def verify_snapshot(self, snapshot_hash: str) -> Dict[str, any]:
+    def verify_snapshot(
+        self,
+        snapshot_hash: str,
+        visited: Optional[Set[str]] = None,
+        use_index: bool = False
+    ) -> Dict[str, any]:
         """
         Verify a snapshot and all its references recursively.
         
+        With use_index=True, a snapshot whose closure was fully verified
+        before is accepted if none of its object files has changed size,
+        mtime, ctime or inode since, and only a stat per object is needed. This
+        trusts file metadata; detect_tampering always re-hashes.
+        
+        Objects verified by earlier calls are likewise not re-hashed
+        while their file is unchanged (see clear_verification_cache).
+        
+        Args:
+            snapshot_hash: snapshot to verify
+            visited: optional set of already-verified object hashes,
+                shared across calls to skip re-hashing common objects;
+                replaces the engine's own memo for this call
+            use_index: consult and update the verification index
+        
         Returns dict with:
             - valid: bool
             - errors: list of error messages
         """
+        if use_index and self._verify_index_matches(snapshot_hash):
+            return {
+                'valid': True,
+                'errors': [],
+            }
+        
         is_valid, errors = verify_snapshot_recursive(
             snapshot_hash,
-            load_func=lambda h: self.object_store.get_object(h, verify=False),
-            exists_func=self.object_store.has_object,
+            load_func=self.object_store.load_object,
+            exists_many_func=self.object_store.exists_many,
+            visited=visited if visited is not None else self._verified_objects(),
         )
         
+        if use_index and is_valid:
+            self._save_verify_index(snapshot_hash)
+        
         return {
             'valid': is_valid,
             'errors': errors,
         }
     
+    def clear_verification_cache(self) -> None:
+        """Forget which objects verify_snapshot has already verified."""
+        with self._verified_memo_lock:
+            self._verified_memo.clear()
+    
+    def _verified_objects(self) -> _VerifiedObjects:
+        """Create a visited set backed by the engine's verification memo."""
+        return _VerifiedObjects(
+            self.object_store.object_fingerprint,
+            self._verified_memo,
+            self._verified_memo_lock,
+        )
+    
     def detect_tampering(self) -> Dict[str, any]:
         """
         Detect tampering across all stored objects.
         
         Verifies that all objects' content matches their hashes.
+        Objects are streamed from the store and verified in chunks on a
+        thread pool (see ObjectStore.verify_many); hashing releases the
+        GIL, so this scales with cores.
         
         Returns dict with:
             - tampered: list of tampered object hashes
@@ -230,13 +450,22 @@ class SnapshotStoreEngine:
             'errors': [],
         }
         
-        for obj_hash in self.object_store.list_all_objects():
-            try:
-                self.verify_object(obj_hash)
-                result['verified'] += 1
-            except Exception as e:
-                result['tampered'].append(obj_hash)
-                result['errors'].append(f"{obj_hash}: {e}")
+        workers = os.cpu_count() or 1
+        all_objects = self.object_store.iter_all_objects()
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Submit bounded chunks so the listing is never materialized
+            while True:
+                chunk = list(islice(all_objects, workers * 64))
+                if not chunk:
+                    break
+                
+                for obj_hash, error in zip(chunk, self.object_store.verify_many(chunk, executor)):
+                    if error is None:
+                        result['verified'] += 1
+                    else:
+                        result['tampered'].append(obj_hash)
+                        result['errors'].append(f"{obj_hash}: {error}")
         
         return result
     
@@ -253,6 +482,10 @@ class SnapshotStoreEngine:
             'missing_objects': set(),
         }
         
+        # Shared across snapshots so common bundles and ancestors are
+        # hashed once for the whole scan
+        verified = self._verified_objects()
+        
         # Check all snapshots
         for obj_hash in self.object_store.list_all_objects():
             try:
@@ -262,19 +495,16 @@ class SnapshotStoreEngine:
                     continue
                 
                 # Verify this snapshot
-                verify_result = self.verify_snapshot(obj_hash)
+                verify_result = self.verify_snapshot(obj_hash, visited=verified)
                 
                 if not verify_result['valid']:
                     result['broken_snapshots'].append(obj_hash)
                     
                     # Extract missing objects from errors
                     for error in verify_result['errors']:
-                        if 'missing' in error.lower():
-                            # Try to extract hash from error message
-                            parts = error.split()
-                            for part in parts:
-                                if len(part) == 64:  # BLAKE3 hash length
-                                    result['missing_objects'].add(part)
+                        result['missing_objects'].update(
+                            _MISSING_REF_RE.findall(error)
+                        )
             
             except Exception:
                 continue
@@ -288,22 +518,57 @@ class SnapshotStoreEngine:
         Run garbage collection.
         
         Deletes unreachable objects not referenced by any named snapshot.
+        The reachable set is assembled from per-root closures, which are
+        cached in memory and under cache/gc/ so repeated collections do
+        not re-walk unchanged snapshots.
         
         Args:
             dry_run: if True, only report what would be deleted
         
         Returns dict with GC results.
         """
-        # Find all roots from named snapshot references
-        roots = set()
-        
-        for ref_name in self.list_snapshot_refs():
-            snapshot_hash = self.get_snapshot_ref(ref_name)
-            if snapshot_hash:
-                roots.add(snapshot_hash)
+        roots, reachable = self._gc_reachable()
         
         # Run garbage collection
-        return self.gc.collect(roots, dry_run=dry_run)
+        result = self.gc.collect(roots, dry_run=dry_run, reachable=reachable)
+        
+        with self._model_cache_lock:
+            for obj_hash in result['deleted']:
+                self._model_cache.pop(obj_hash, None)
+        
+        return result
+    
+    def iter_garbage_collect(self, dry_run: bool = False) -> Iterator[tuple]:
+        """
+        Run garbage collection, yielding each unreachable object as it is swept.
+        
+        Unlike garbage_collect, no set of unreachable objects is built,
+        so memory does not grow with the amount of garbage.
+        
+        Yields (obj_hash, status, error) tuples as described in
+        GarbageCollector.collect_iter.
+        """
+        roots, reachable = self._gc_reachable()
+        
+        for obj_hash, status, error in self.gc.collect_iter(roots, dry_run, reachable):
+            if status == 'deleted':
+                with self._model_cache_lock:
+                    self._model_cache.pop(obj_hash, None)
+            yield obj_hash, status, error
+    
+    def _gc_reachable(self) -> tuple:
+        """
+        Get the GC roots and the set of objects reachable from them.
+        
+        Roots are the targets of all named snapshot references.
+        """
+        roots = {h for h in self.object_store.dump_snapshot_refs().values() if h}
+        
+        reachable = set()
+        for root in roots:
+            reachable |= self._get_closure(root)
+        
+        return roots, reachable
     
     def verify_gc_safety(self) -> List[str]:
         """
@@ -311,15 +576,106 @@ class SnapshotStoreEngine:
         
         Returns list of warnings/issues.
         """
-        roots = set()
-        
-        for ref_name in self.list_snapshot_refs():
-            snapshot_hash = self.get_snapshot_ref(ref_name)
-            if snapshot_hash:
-                roots.add(snapshot_hash)
+        roots = {h for h in self.object_store.dump_snapshot_refs().values() if h}
         
         return self.gc.verify_gc_safety(roots)
     
+    def _get_closure(self, root: str) -> frozenset:
+        """
+        Get the set of objects reachable from a GC root.
+        
+        Complete closures are memoized and persisted; closures with
+        missing or unreadable objects are recomputed on every call, since
+        the missing part of the graph may appear later.
+        """
+        closure = self._closure_cache.get(root)
+        if closure is not None:
+            return closure
+        
+        closure = self._load_closure(root)
+        if closure is None:
+            closure, complete = self.gc.compute_closure(root)
+            if not complete:
+                return closure
+            self._save_closure(root, closure)
+        
+        self._closure_cache[root] = closure
+        return closure
+    
+    def _load_closure(self, root: str) -> Optional[frozenset]:
+        """
+        Load a persisted closure, or None if absent or damaged.
+        
+        The file holds a checksum digest followed by the raw digests of
+        every object in the closure, DIGEST_SIZE bytes each.
+        """
+        body = self.layout.read_cache_file(self.layout.get_gc_cache_path(root))
+        
+        # A truncated closure could let GC delete live objects
+        if body is None or len(body) % DIGEST_SIZE:
+            return None
+        
+        return frozenset(iter_digest_hashes(body))
+    
+    def _save_closure(self, root: str, closure: frozenset) -> None:
+        """Persist a closure; failures only cost a recomputation later."""
+        digests = [hash_to_digest(h) for h in sorted(closure)]
+        if None in digests:
+            return
+        
+        self.layout.write_cache_file(self.layout.get_gc_cache_path(root), b''.join(digests))
+    
+    def _closure_fingerprint(self, closure: List[str]) -> Optional[str]:
+        """
+        Hash the file fingerprints of a closure, in the given order.
+        
+        Returns None if any object has no file fingerprint.
+        """
+        parts = []
+        for obj_hash in closure:
+            fingerprint = self.object_store.object_fingerprint(obj_hash)
+            if fingerprint is None:
+                return None
+            parts.append(bytes.fromhex(obj_hash) + struct.pack('<4Q', *fingerprint))
+        return compute_hash(b''.join(parts))
+    
+    def _verify_index_matches(self, snapshot_hash: str) -> bool:
+        """Check whether a snapshot's indexed closure is unchanged on disk."""
+        body = self.layout.read_cache_file(self.layout.get_verify_cache_path(snapshot_hash))
+        if body is None or len(body) % DIGEST_SIZE:
+            return False
+        
+        aggregate = body[:DIGEST_SIZE]
+        closure = list(iter_digest_hashes(body[DIGEST_SIZE:]))
+        if snapshot_hash not in closure:
+            return False
+        
+        fingerprint = self._closure_fingerprint(closure)
+        return fingerprint is not None and fingerprint == aggregate.hex()
+    
+    def _save_verify_index(self, snapshot_hash: str) -> None:
+        """
+        Record the fingerprints of a freshly verified snapshot closure.
+        
+        The cache file body is the closure fingerprint followed by the
+        raw digests of the closure, in sorted order.
+        """
+        closure, complete = self.gc.compute_closure(snapshot_hash)
+        if not complete:
+            return
+        
+        ordered = sorted(closure)
+        digests = [hash_to_digest(h) for h in ordered]
+        if None in digests:
+            return
+        
+        fingerprint = self._closure_fingerprint(ordered)
+        if fingerprint is None:
+            return
+        
+        body = bytes.fromhex(fingerprint) + b''.join(digests)
+        self.layout.write_cache_file(self.layout.get_verify_cache_path(snapshot_hash), body)
+    
     # ========== Integration with sqlite-sync-core ==========
     
     def import_sync_bundles(
@@ -373,15 +729,32 @@ class SnapshotStoreEngine:
         """Export all bundles from a snapshot back to sqlite-sync-core format."""
         return self.sync_adapter.export_snapshot_bundles(snapshot_hash)
     
+    def iter_snapshot_bundles(self, snapshot_hash: str) -> Iterator[dict]:
+        """Export a snapshot's bundles lazily, one bundle at a time."""
+        return self.sync_adapter.iter_snapshot_bundles(snapshot_hash)
+    
     # ========== Statistics and Diagnostics ==========
     
-    def get_statistics(self) -> Dict[str, any]:
+    def get_statistics(self, max_age: float = 0.0) -> Dict[str, any]:
         """
         Get store statistics.
         
+        Computing statistics lists every object; only objects stored
+        since the last call are read to learn their type. With
+        max_age > 0, a result computed less than max_age seconds ago is
+        reused, so frequent polling does not rescan the store each time.
+        
         Returns comprehensive statistics about the store.
         """
-        return self.sync_adapter.get_statistics()
+        now = time.monotonic()
+        if self._stats_cache is not None and max_age > 0:
+            computed_at, stats = self._stats_cache
+            if now - computed_at < max_age:
+                return dict(stats)
+        
+        stats = self.sync_adapter.get_statistics()
+        self._stats_cache = (now, stats)
+        return dict(stats)
     
     def list_all_objects(self) -> List[str]:
         """List all object hashes in store."""
@@ -392,29 +765,40 @@ class SnapshotStoreEngine:
         Export a snapshot and all its data to a JSON file.
         
         Useful for debugging and archival.
+        
+        The file holds snapshot_hash, snapshot and a bundles mapping of
+        hash to bundle, as indented key-sorted JSON. Bundles are written
+        one at a time, so memory use is bounded by the largest bundle
+        rather than the whole snapshot.
         """
         output_path = Path(output_path)
         
         # Load snapshot
         snapshot = self.get_snapshot(snapshot_hash)
+        bundle_hashes = sorted(set(snapshot.bundles))
         
-        # Collect all data
-        export_data = {
-            'snapshot_hash': snapshot_hash,
-            'snapshot': snapshot.to_dict(),
-            'bundles': {},
-        }
-        
-        # Export all bundles
-        for bundle_hash in snapshot.bundles:
-            bundle = self.get_bundle(bundle_hash)
-            export_data['bundles'][bundle_hash] = bundle.to_dict()
+        def nested(obj, depth: int) -> bytes:
+            # JSON strings never contain raw newlines, so re-indenting
+            # every line break nests a pretty-printed value safely
+            return pretty_json(obj).replace(b'\n', b'\n' + b'  ' * depth)
         
-        # Write to file
-        with output_path.open('w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, sort_keys=True)
+        # Write top-level keys in sorted order, streaming the bundles
+        with output_path.open('wb') as f:
+            f.write(b'{\n  "bundles": {')
+            for i, bundle_hash in enumerate(bundle_hashes):
+                bundle = self.get_bundle(bundle_hash)
+                f.write(b',\n    ' if i else b'\n    ')
+                f.write(pretty_json(bundle_hash) + b': ' + nested(bundle.to_dict(), 2))
+            f.write(b'\n  },\n' if bundle_hashes else b'},\n')
+            f.write(b'  "snapshot": ' + nested(snapshot.to_dict(), 1) + b',\n')
+            f.write(b'  "snapshot_hash": ' + pretty_json(snapshot_hash) + b'\n}')
     
-    def __repr__(self) -> str:
+    def describe(self) -> str:
+        """
+        Describe the store including object counts.
+        
+        Unlike repr(), this scans the store to compute statistics.
+        """
         stats = self.get_statistics()
         return (
             f"SnapshotStoreEngine("
@@ -422,3 +806,6 @@ class SnapshotStoreEngine:
             f"objects={stats.get('total_objects', 0)}, "
             f"snapshots={stats.get('snapshot_refs', 0)})"
         )
+    
+    def __repr__(self) -> str:
+        return f"SnapshotStoreEngine(path={self.store_path}, backend={self.backend})"
@@ -4,12 +4,19 @@ Integration adapter for sqlite-sync-core.
 Provides seamless conversion between sync bundles and snapshot objects.
 """
 
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Dict, Any
+import os
 from ..model.bundle import Bundle
 from ..model.snapshot import Snapshot
 from ..errors import InvalidObjectError
 
 
+# Imports with at least this many bundles are encoded and hashed on a
+# thread pool; below it the pool costs more than it saves.
+PARALLEL_IMPORT_THRESHOLD = 64
+
+
 class SyncAdapter:
     """
     Adapter for integrating sqlite-sync-core bundles into the snapshot store.
@@ -55,7 +62,7 @@ class SyncAdapter:
         bundle = Bundle(bundle_data, metadata)
         
         # Store in object store
-        bundle_hash = self.store.put_object(bundle.to_dict())
+        bundle_hash = self.store.put_model(bundle)
         
         return bundle_hash
     
@@ -69,6 +76,10 @@ class SyncAdapter:
         
         Returns list of bundle hashes in same order as input.
         
+        All bundles are validated before any is stored. Large imports
+        encode and hash bundles on a thread pool; all writes are then
+        committed as one batch with put_encoded_many.
+        
         Args:
             bundles: list of sync bundles
             metadata_func: optional function to generate metadata for each bundle
@@ -76,14 +87,19 @@ class SyncAdapter:
         Returns:
             list[str]: list of bundle hashes
         """
-        bundle_hashes = []
-        
+        models = []
         for i, bundle_data in enumerate(bundles):
+            self._validate_bundle(bundle_data)
             metadata = metadata_func(bundle_data, i) if metadata_func else None
-            bundle_hash = self.import_bundle(bundle_data, metadata)
-            bundle_hashes.append(bundle_hash)
+            models.append(Bundle(bundle_data, metadata))
+        
+        if len(models) >= PARALLEL_IMPORT_THRESHOLD:
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+                encoded = list(executor.map(self.store.encode_model, models))
+        else:
+            encoded = [self.store.encode_model(bundle) for bundle in models]
         
-        return bundle_hashes
+        return self.store.put_encoded_many(encoded)
     
     def create_snapshot_from_bundles(
         self,
@@ -105,9 +121,11 @@ class SyncAdapter:
         Returns:
             str: hash of the created snapshot
         """
-        # Verify all bundles exist
-        for bundle_hash in bundle_hashes:
-            if not self.store.has_object(bundle_hash):
+        # Verify all bundles exist, checking repeated hashes only once
+        unique_hashes = list(dict.fromkeys(bundle_hashes))
+        existing = self.store.exists_many(unique_hashes)
+        for bundle_hash in unique_hashes:
+            if bundle_hash not in existing:
                 raise InvalidObjectError(
                     f"Bundle does not exist: {bundle_hash}",
                     bundle_hash
@@ -117,7 +135,7 @@ class SyncAdapter:
         snapshot = Snapshot(bundle_hashes, parent, metadata)
         
         # Store in object store
-        snapshot_hash = self.store.put_object(snapshot.to_dict())
+        snapshot_hash = self.store.put_model(snapshot)
         
         return snapshot_hash
     
@@ -136,6 +154,10 @@ class SyncAdapter:
         2. Create snapshot referencing those bundles
         3. Optionally create named reference to snapshot
         
+        Bundles and snapshot are written as a single batch. The bundles
+        were just stored, so the snapshot is written without checking
+        that they exist.
+        
         Args:
             bundles: list of sync bundles from sqlite-sync-core
             parent: optional parent snapshot hash
@@ -145,15 +167,13 @@ class SyncAdapter:
         Returns:
             tuple: (bundle_hashes, snapshot_hash)
         """
-        # Import all bundles
-        bundle_hashes = self.import_bundles(bundles)
-        
-        # Create snapshot
-        snapshot_hash = self.create_snapshot_from_bundles(
-            bundle_hashes,
-            parent,
-            metadata
-        )
+        with self.store.write_batch():
+            # Import all bundles
+            bundle_hashes = self.import_bundles(bundles)
+            
+            # Create snapshot
+            snapshot = Snapshot(bundle_hashes, parent, metadata)
+            snapshot_hash = self.store.put_model(snapshot)
         
         # Create named reference if requested
         if snapshot_name:
@@ -224,17 +244,25 @@ class SyncAdapter:
         Returns:
             list[dict]: list of sync bundle data
         """
-        # Load snapshot
-        obj_data = self.store.get_object(snapshot_hash)
-        snapshot = Snapshot.from_dict(obj_data)
+        return list(self.iter_snapshot_bundles(snapshot_hash))
+    
+    def iter_snapshot_bundles(self, snapshot_hash: str) -> Iterator[dict]:
+        """
+        Export the bundles of a snapshot one at a time.
         
-        # Export all bundles
-        bundles = []
-        for bundle_hash in snapshot.bundles:
-            bundle_data = self.export_bundle(bundle_hash)
-            bundles.append(bundle_data)
+        Like export_snapshot_bundles, but each bundle is loaded only when
+        the iterator reaches it, so memory use is bounded by the largest
+        bundle. The snapshot itself is loaded immediately, so a missing
+        snapshot raises here rather than on first iteration.
         
-        return bundles
+        Args:
+            snapshot_hash: hash of snapshot to export
+        
+        Returns:
+            Iterator[dict]: sync bundle data in snapshot order
+        """
+        obj_data = self.store.get_object(snapshot_hash)
+        return map(self.export_bundle, Snapshot.bundle_hashes_only(obj_data))
     
     def get_snapshot_chain(self, snapshot_hash: str) -> List[str]:
         """
@@ -261,10 +289,8 @@ class SyncAdapter:
             visited.add(current)
             chain.append(current)
             
-            # Load snapshot and get parent
-            obj_data = self.store.get_object(current)
-            snapshot = Snapshot.from_dict(obj_data)
-            current = snapshot.parent
+            # Only the parent pointer is needed from each hop
+            current = Snapshot.parent_only(self.store.get_object(current))
         
         # Reverse to get root-first order
         return list(reversed(chain))
@@ -293,23 +319,8 @@ class SyncAdapter:
         """
         stats = self.store.get_stats()
         
-        # Count bundles and snapshots
-        bundle_count = 0
-        snapshot_count = 0
-        
-        for obj_hash in self.store.list_all_objects():
-            try:
-                obj_data = self.store.get_object(obj_hash, verify=False)
-                obj_type = obj_data.get('type')
-                
-                if obj_type == 'bundle':
-                    bundle_count += 1
-                elif obj_type == 'snapshot':
-                    snapshot_count += 1
-            except Exception:
-                continue  # Skip corrupted objects
-        
-        stats['bundle_count'] = bundle_count
-        stats['snapshot_count'] = snapshot_count
+        counts = self.store.count_objects_by_type()
+        stats['bundle_count'] = counts['bundle']
+        stats['snapshot_count'] = counts['snapshot']
         
         return stats
@@ -5,7 +5,45 @@ Ensures same input always produces same hash.
 """
 
 import json
-from typing import Any
+import re
+from json.encoder import encode_basestring
+from typing import Any, Iterator, Optional, Sequence, Union
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Large floats used to check that orjson writes exponents like the
+# standard library ('1e+16'); older releases write '1e16'
+_EXPONENT_PROBE = [1e16, 1.5e300, -2.5e22, 1.2345678901234568e+17]
+
+if HAS_ORJSON:
+    # Types the standard library cannot encode must still raise
+    _ORJSON_CANONICAL_OPTIONS = (
+        orjson.OPT_SORT_KEYS
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_SUBCLASS
+    )
+    _ORJSON_CANONICAL = (
+        orjson.dumps(_EXPONENT_PROBE)
+        == json.dumps(_EXPONENT_PROBE, separators=(',', ':')).encode('utf-8')
+    )
+else:
+    _ORJSON_CANONICAL = False
+
+# Any run of 19 digits may be an integer beyond 64 bits, which orjson
+# parses as a float instead of rejecting
+_LONG_DIGITS = re.compile(rb'[0-9]{19}')
+
+# List elements encoded per fragment by iter_canonical_json
+STREAM_LIST_CHUNK = 1024
+
+# Printable ASCII except '"' and '\\': a string of only these characters
+# is its own JSON encoding between quotes
+_PLAIN_CHARS = bytes(c for c in range(0x20, 0x7f) if c not in b'"\\')
 
 
 def canonical_json(obj: Any) -> bytes:
@@ -20,7 +58,16 @@ def canonical_json(obj: Any) -> bytes:
     - No trailing newlines
     
     Same input always produces same output.
+    
+    Uses orjson when a compatible release is installed. Its output is
+    only kept when it is guaranteed to match the standard library byte
+    for byte; anything else falls back to the standard library encoder.
     """
+    if _ORJSON_CANONICAL:
+        encoded = _orjson_canonical(obj)
+        if encoded is not None:
+            return encoded
+    
     json_str = json.dumps(
         obj,
         sort_keys=True,
@@ -31,19 +78,98 @@ def canonical_json(obj: Any) -> bytes:
     return json_str.encode('utf-8')
 
 
+def iter_canonical_json(obj: Any) -> Iterator[bytes]:
+    """
+    Encode an object to canonical JSON as a sequence of fragments.
+    
+    The fragments concatenate to exactly canonical_json(obj). Dicts with
+    string keys are walked key by key and long lists are encoded
+    STREAM_LIST_CHUNK elements at a time, so a large document can be fed
+    to a hasher without building it whole; everything else is encoded
+    by canonical_json in one piece. Keys are escaped with the standard
+    library's C string encoder rather than a full encoder call each.
+    """
+    if isinstance(obj, dict) and all(isinstance(key, str) for key in obj):
+        yield b'{'
+        for i, key in enumerate(sorted(obj)):
+            yield (b',' if i else b'') + encode_basestring(key).encode('utf-8') + b':'
+            yield from iter_canonical_json(obj[key])
+        yield b'}'
+    elif isinstance(obj, (list, tuple)) and len(obj) > STREAM_LIST_CHUNK:
+        yield b'['
+        for start in range(0, len(obj), STREAM_LIST_CHUNK):
+            # Drop the brackets of each chunk's own list encoding
+            encoded = canonical_json(list(obj[start:start + STREAM_LIST_CHUNK]))
+            yield (b',' if start else b'') + encoded[1:-1]
+        yield b']'
+    else:
+        yield canonical_json(obj)
+
+
+def canonical_string_list(items: Sequence[str]) -> bytes:
+    """
+    Encode a sequence of strings as a canonical JSON array.
+    
+    Hash lists make up most of a snapshot or tree. When no string needs
+    escaping, as with hex hashes, they are joined directly instead of
+    being encoded one by one; the result always equals
+    canonical_json(list(items)).
+    """
+    try:
+        joined = ''.join(items)
+    except TypeError:
+        return canonical_json(list(items))
+    
+    if not joined.isascii() or joined.encode('ascii').translate(None, _PLAIN_CHARS):
+        return canonical_json(list(items))
+    if not items:
+        return b'[]'
+    return ('["' + '","'.join(items) + '"]').encode('ascii')
+
+
+def _orjson_canonical(obj: Any) -> Optional[bytes]:
+    """
+    Encode with orjson, or return None if the result may not be canonical.
+    
+    orjson escapes strings and orders keys exactly like the standard
+    library, but differs on:
+    - floats below 1e-4, written as 1e-5 or 0.00001 instead of 1e-05
+    - NaN and infinity, written as null instead of being rejected
+    - integers beyond 64 bits and non-str keys, which it rejects
+    - UUIDs and enums, which it encodes but the standard library rejects
+    
+    Any output containing 'e-', '0.0000' or 'null' is discarded, as is
+    any TypeError, including the one _reject_type raises for types
+    passed through to it (dataclasses, datetimes and subclasses of
+    builtins); strings that merely contain those sequences just take
+    the slower path. The rest is kept only if it decodes back to an
+    equal object, which UUIDs and enums without a builtin base do not.
+    """
+    try:
+        encoded = orjson.dumps(obj, default=_reject_type, option=_ORJSON_CANONICAL_OPTIONS)
+    except TypeError:
+        return None
+    
+    if b'null' in encoded or b'e-' in encoded or b'0.0000' in encoded:
+        return None
+    if orjson.loads(encoded) != obj:
+        return None
+    return encoded
+
+
+def _reject_type(obj: Any) -> Any:
+    """Hand every type orjson passes through back to the standard library."""
+    raise TypeError(f"Object of type {type(obj).__name__} is not encoded by orjson")
+
+
 def canonical_json_str(obj: Any) -> str:
     """
     Encode an object to canonical JSON string.
     
-    Useful for debugging and logging.
+    Useful for debugging and logging. Shares canonical_json's encoder,
+    so it is as fast and produces exactly the hashed bytes.
     """
-    return json.dumps(
-        obj,
-        sort_keys=True,
-        separators=(',', ':'),
-        ensure_ascii=False,
-        allow_nan=False,
-    )
+    return canonical_json(obj).decode('utf-8')
 
 
 def validate_canonical_structure(obj: Any) -> None:
@@ -56,3 +182,35 @@ def validate_canonical_structure(obj: Any) -> None:
         canonical_json(obj)
     except (TypeError, ValueError) as e:
         raise ValueError(f"Object cannot be canonically encoded: {e}")
+
+
+def decode_json(data: Union[bytes, bytearray, memoryview]) -> Any:
+    """
+    Decode UTF-8 JSON bytes.
+    
+    Uses orjson if available, otherwise the standard library. orjson
+    silently parses integers beyond 64 bits (which canonical_json can
+    emit) as floats, so input with a run of 19 or more digits is left to
+    the standard library, as is input orjson rejects; both paths return
+    the same values. Any bytes-like input (e.g. a memoryview into a
+    larger payload) is accepted; orjson parses it in place.
+    
+    Raises json.JSONDecodeError (or UnicodeDecodeError) on invalid input.
+    """
+    if HAS_ORJSON and _LONG_DIGITS.search(data) is None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(str(data, 'utf-8'))
+
+
+def pretty_json(obj: Any) -> bytes:
+    """
+    Encode an object as indented, key-sorted UTF-8 JSON.
+    
+    For human-readable exports only - the output is not canonical and
+    must never be hashed. Always the standard library's output, so
+    exports do not depend on which optional libraries are installed.
+    """
+    return json.dumps(obj, indent=2, sort_keys=True).encode('utf-8')
@@ -4,8 +4,14 @@ Content-addressed hashing using BLAKE3 or SHA-256.
 Provides deterministic hash computation for all object types.
 """
 
+import base64
 import hashlib
-from typing import Any
+import heapq
+import mmap
+import os
+import sys
+from concurrent.futures import Executor
+from typing import Any, Iterator, List, Optional, Sequence
 
 try:
     import blake3
@@ -13,7 +19,54 @@ try:
 except ImportError:
     HAS_BLAKE3 = False
 
-from .canonical import canonical_json
+# Name of the hash function objects are addressed by. It is fixed for
+# the lifetime of a store: the same object hashes differently under each
+HASH_ALGORITHM = 'blake3' if HAS_BLAKE3 else 'sha256'
+
+# Single-threaded hasher constructor; accepts the initial data directly
+_new_hasher_with = blake3.blake3 if HAS_BLAKE3 else hashlib.sha256
+
+from .canonical import canonical_json, iter_canonical_json
+
+
+# Raw digest length in bytes; hex hashes are twice this long
+DIGEST_SIZE = 32
+
+# Characters of a hex hash; see is_valid_hash
+_HEX_DIGITS = b'0123456789abcdef'
+
+# Payloads at least this large are hashed with BLAKE3's multithreaded
+# subtree hashing; below it the thread handoff costs more than it saves.
+PARALLEL_HASH_THRESHOLD = 128 * 1024
+
+# Multithreaded hashing only pays off with more than one core
+_MULTICORE = (os.cpu_count() or 1) > 1
+
+# Files at least this large are hashed through a read-only memory map
+MMAP_THRESHOLD = 4 * 1024
+
+# Raw bytes encoded per step when streaming base64 content into a
+# hasher; a multiple of 3 so chunks concatenate without padding
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def new_hasher(size_hint: int = 0):
+    """
+    Create a fresh incremental hasher.
+    
+    Uses BLAKE3 if available, otherwise SHA-256. When size_hint reaches
+    PARALLEL_HASH_THRESHOLD the BLAKE3 hasher may use multiple threads.
+    
+    The returned object supports update(), hexdigest() and digest(), and
+    hashes independently of any other hasher, so distinct objects can be
+    hashed concurrently from worker threads.
+    """
+    if HAS_BLAKE3:
+        if _MULTICORE and size_hint >= PARALLEL_HASH_THRESHOLD:
+            return blake3.blake3(max_threads=blake3.blake3.AUTO)
+        return blake3.blake3()
+    else:
+        return hashlib.sha256()
 
 
 def compute_hash(data: bytes) -> str:
@@ -23,10 +76,80 @@ def compute_hash(data: bytes) -> str:
     Uses BLAKE3 if available, otherwise SHA-256.
     Returns hex-encoded hash string.
     """
+    if len(data) < PARALLEL_HASH_THRESHOLD:
+        # Most objects are small: hash in one call, skipping setup
+        return _new_hasher_with(data).hexdigest()
+    
+    hasher = new_hasher(len(data))
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def compute_hashes_bulk(
+    payloads: Sequence[bytes],
+    executor: Optional[Executor] = None
+) -> List[str]:
+    """
+    Compute the hashes of several payloads, in input order.
+    
+    With an executor, payloads are split into one group per core, each
+    payload going (largest first) to the group with the fewest bytes so
+    far, and the groups are hashed concurrently; hashing releases the
+    GIL. Each task hashes a whole group, so small payloads do not pay a
+    task handoff each. Without an executor, or when there is too little
+    data to share, payloads are hashed in turn.
+    """
+    num_groups = min(len(payloads), os.cpu_count() or 1)
+    if (executor is None or num_groups < 2
+            or sum(map(len, payloads)) < PARALLEL_HASH_THRESHOLD):
+        return [compute_hash(data) for data in payloads]
+    
+    groups: List[List[int]] = [[] for _ in range(num_groups)]
+    loads = [(0, g) for g in range(num_groups)]
+    for index in sorted(range(len(payloads)), key=lambda i: len(payloads[i]), reverse=True):
+        load, g = heapq.heappop(loads)
+        groups[g].append(index)
+        heapq.heappush(loads, (load + len(payloads[index]), g))
+    
+    def hash_group(group: List[int]) -> List[str]:
+        return [compute_hash(payloads[i]) for i in group]
+    
+    hashes: List[str] = [''] * len(payloads)
+    for group, group_hashes in zip(groups, executor.map(hash_group, groups)):
+        for index, obj_hash in zip(group, group_hashes):
+            hashes[index] = obj_hash
+    return hashes
+
+
+def compute_file_hash(path) -> str:
+    """
+    Compute hash of a file's raw contents.
+    
+    Files of MMAP_THRESHOLD bytes or more are memory-mapped and fed to
+    the hasher straight from the page cache, without copying them into
+    a Python bytes object. With BLAKE3 the file is handed to its native
+    update_mmap, which maps and hashes it without holding the GIL.
+    
+    Raises OSError if the file cannot be read.
+    """
     if HAS_BLAKE3:
-        return blake3.blake3(data).hexdigest()
-    else:
-        return hashlib.sha256(data).hexdigest()
+        hasher = new_hasher(os.stat(path).st_size)
+        hasher.update_mmap(path)
+        return hasher.hexdigest()
+    
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        hasher = new_hasher(size)
+        
+        if size < MMAP_THRESHOLD:
+            hasher.update(f.read())
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                hasher.update(mm)
+    
+    return hasher.hexdigest()
 
 
 def compute_object_hash(obj: Any) -> str:
@@ -38,10 +161,16 @@ def compute_object_hash(obj: Any) -> str:
     - Independent of Python dict ordering
     - Independent of timestamp or random values in metadata
     
+    The encoding is streamed into the hasher in fragments (see
+    iter_canonical_json), so large objects are hashed without building
+    their full canonical JSON.
+    
     Returns hex-encoded hash string.
     """
-    canonical_bytes = canonical_json(obj)
-    return compute_hash(canonical_bytes)
+    hasher = new_hasher()
+    for fragment in iter_canonical_json(obj):
+        hasher.update(fragment)
+    return hasher.hexdigest()
 
 
 def verify_hash(data: bytes, expected_hash: str) -> bool:
@@ -64,18 +193,50 @@ def compute_content_hash(content: bytes, object_type: str, metadata: dict = None
     - metadata (if provided)
     
     This is used for creating content-addressed objects.
-    """
-    import base64
     
-    obj = {
-        "type": object_type,
-        "content": base64.b64encode(content).decode('ascii') if isinstance(content, bytes) else content,
-    }
+    Byte content is streamed into the hasher in base64 chunks, framed
+    exactly as canonical_json would frame the whole object, so no
+    full-size base64 string or JSON document is built. Any bytes-like
+    content (e.g. a memoryview) is streamed the same way.
+    """
+    if not isinstance(content, (bytes, bytearray, memoryview)):
+        obj = {
+            "type": object_type,
+            "content": content,
+        }
+        if metadata:
+            obj["metadata"] = metadata
+        return compute_object_hash(obj)
     
+    # Canonical key order is content, metadata, type; base64 output
+    # needs no JSON escaping
+    hasher = new_hasher(len(content) * 4 // 3)
+    hasher.update(b'{"content":"')
+    view = memoryview(content)
+    for start in range(0, len(view), BASE64_CHUNK_SIZE):
+        hasher.update(base64.b64encode(view[start:start + BASE64_CHUNK_SIZE]))
+    hasher.update(b'"')
     if metadata:
-        obj["metadata"] = metadata
+        hasher.update(b',"metadata":' + canonical_json(metadata))
+    hasher.update(b',"type":' + canonical_json(object_type) + b'}')
     
-    return compute_object_hash(obj)
+    return hasher.hexdigest()
+
+
+def is_valid_hash(hash_str: Any) -> bool:
+    """
+    Check whether a value is a hex hash as produced by compute_hash.
+    
+    Object hashes name files, so anything else (wrong length, upper
+    case, path separators) is rejected before it reaches a path. The
+    digits are checked in C by deleting them with bytes.translate.
+    """
+    return (
+        isinstance(hash_str, str)
+        and len(hash_str) == 2 * DIGEST_SIZE
+        and hash_str.isascii()
+        and not hash_str.encode('ascii').translate(None, _HEX_DIGITS)
+    )
 
 
 def get_hash_prefix(hash_str: str, prefix_length: int = 2) -> str:
@@ -87,3 +248,42 @@ def get_hash_prefix(hash_str: str, prefix_length: int = 2) -> str:
     if len(hash_str) < prefix_length:
         raise ValueError(f"Hash too short for prefix length {prefix_length}")
     return hash_str[:prefix_length]
+
+
+def intern_hash(hash_str: Any) -> Any:
+    """
+    Intern a hash string so equal hashes share one object.
+    
+    Hashes recur across snapshots, trees and the GC/verification sets;
+    interning stores each once and lets set lookups hit the identity
+    fast path. Non-string values are returned unchanged.
+    """
+    if isinstance(hash_str, str):
+        return sys.intern(hash_str)
+    return hash_str
+
+
+def hash_to_digest(hash_str: str) -> Optional[bytes]:
+    """
+    Convert a hex hash to its raw digest.
+    
+    Binary files and indexes store digests, which are half the size of
+    hex hashes. Returns None if hash_str is not a hex hash of
+    DIGEST_SIZE bytes.
+    """
+    try:
+        digest = bytes.fromhex(hash_str)
+    except (TypeError, ValueError):
+        return None
+    return digest if len(digest) == DIGEST_SIZE else None
+
+
+def iter_digest_hashes(body: bytes, record_size: int = DIGEST_SIZE) -> Iterator[str]:
+    """
+    Yield the interned hex hash of each fixed-size record in body.
+    
+    Each record starts with a raw digest; any bytes after it (up to
+    record_size) are left to the caller.
+    """
+    for i in range(0, len(body) - DIGEST_SIZE + 1, record_size):
+        yield intern_hash(body[i:i + DIGEST_SIZE].hex())
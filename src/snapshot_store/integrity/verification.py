@@ -4,7 +4,9 @@ Integrity verification for objects and snapshots.
 Provides tamper detection and recursive verification.
 """
 
-from typing import Set, List, Tuple
+from collections import deque
+import re
+from typing import List, Optional, Set, Tuple
 
 from ..errors import (
     ObjectCorruptedError,
@@ -12,10 +14,38 @@ from ..errors import (
     ReferenceMissingError,
     TamperDetectedError,
 )
-from .hashing import compute_hash, compute_object_hash
+from .hashing import compute_hash, compute_object_hash, intern_hash
 from .canonical import canonical_json
 
 
+# Types verify_object_structure accepts
+_OBJECT_TYPES = frozenset(('blob', 'bundle', 'snapshot', 'tree'))
+
+# Stands in for absent metadata in verify_object_structure's fast path
+_NO_METADATA: dict = {}
+
+# Content fields holding references, per object type, as
+# (field name, whether it holds a list of hashes); other types are leaves
+_REFERENCE_FIELDS = {
+    'snapshot': (('bundles', True), ('parent', False)),
+    'tree': (('children', True),),
+}
+
+# Canonical encodings put the content first and the type last, so the
+# references of snapshots and trees can be matched in the stored bytes
+_ENCODED_HASH_LIST = rb'\[((?:"[0-9a-f]{64}"(?:,"[0-9a-f]{64}")*)?)\]'
+_ENCODED_REFERENCES = {
+    b',"type":"snapshot"}': re.compile(
+        rb'\{"content":\{"bundles":' + _ENCODED_HASH_LIST
+        + rb'(?:,"parent":"([0-9a-f]{64})")?\},'
+    ),
+    b',"type":"tree"}': re.compile(
+        rb'\{"content":\{"children":' + _ENCODED_HASH_LIST + rb'\},'
+    ),
+}
+_ENCODED_LEAVES = (b',"type":"bundle"}', b',"type":"blob"}')
+
+
 def verify_object_integrity(obj_data: dict, expected_hash: str) -> None:
     """
     Verify that an object's content matches its hash.
@@ -27,6 +57,25 @@ def verify_object_integrity(obj_data: dict, expected_hash: str) -> None:
         raise ObjectCorruptedError(expected_hash, expected_hash, actual_hash)
 
 
+def verify_object_integrity_bytes(obj_data: dict, raw: bytes, expected_hash: str) -> None:
+    """
+    Verify an object against the stored bytes it was decoded from.
+    
+    Objects are stored as their canonical encoding, whose structure was
+    checked when it was written, so raw bytes hashing to expected_hash
+    prove the object intact without re-encoding it. Any other bytes
+    (e.g. an equivalent but non-canonical encoding) are checked in full.
+    
+    Raises InvalidObjectError if the structure is invalid.
+    Raises ObjectCorruptedError if mismatch detected.
+    """
+    if compute_hash(raw) == expected_hash:
+        return
+    
+    verify_object_structure(obj_data)
+    verify_object_integrity(obj_data, expected_hash)
+
+
 def verify_object_structure(obj_data: dict) -> None:
     """
     Verify that an object has valid structure.
@@ -36,8 +85,20 @@ def verify_object_structure(obj_data: dict) -> None:
     - 'content' field
     - optional 'metadata' field
     
+    Valid objects pass a single combined check; the individual checks
+    only run to report what is wrong with an invalid one.
+    
     Raises InvalidObjectError if structure is invalid.
     """
+    if (
+        type(obj_data) is dict
+        and type(obj_data.get('type')) is str
+        and obj_data['type'] in _OBJECT_TYPES
+        and 'content' in obj_data
+        and type(obj_data.get('metadata', _NO_METADATA)) is dict
+    ):
+        return
+    
     if not isinstance(obj_data, dict):
         raise InvalidObjectError("Object must be a dictionary")
     
@@ -47,9 +108,9 @@ def verify_object_structure(obj_data: dict) -> None:
     if 'content' not in obj_data:
         raise InvalidObjectError("Object missing 'content' field")
     
-    valid_types = {'blob', 'bundle', 'snapshot', 'tree'}
-    if obj_data['type'] not in valid_types:
-        raise InvalidObjectError(f"Invalid object type: {obj_data['type']}")
+    obj_type = obj_data['type']
+    if not isinstance(obj_type, str) or obj_type not in _OBJECT_TYPES:
+        raise InvalidObjectError(f"Invalid object type: {obj_type}")
     
     if 'metadata' in obj_data and not isinstance(obj_data['metadata'], dict):
         raise InvalidObjectError("Metadata must be a dictionary")
@@ -65,55 +126,93 @@ def extract_references(obj_data: dict) -> Set[str]:
     - bundle: no references (leaf object)
     - blob: no references (leaf object)
     
-    Returns set of referenced hashes.
+    Returns set of referenced hashes, interned.
     """
+    fields = _REFERENCE_FIELDS.get(obj_data.get('type'))
+    if not fields:
+        return set()  # Leaf object
+    
+    content = obj_data.get('content')
+    if not isinstance(content, dict):
+        return set()
+    
     refs = set()
-    obj_type = obj_data.get('type')
-    content = obj_data.get('content', {})
+    for field_name, is_list in fields:
+        value = content.get(field_name)
+        if not value:
+            continue
+        if is_list:
+            refs.update(map(intern_hash, value))
+        else:
+            refs.add(intern_hash(value))
     
-    if obj_type == 'snapshot':
-        # Snapshots reference bundles and optionally a parent
-        if isinstance(content, dict):
-            if 'bundles' in content:
-                refs.update(content['bundles'])
-            if 'parent' in content and content['parent']:
-                refs.add(content['parent'])
+    return refs
+
+
+def extract_encoded_references(data: bytes) -> Optional[Set[str]]:
+    """
+    Extract the references of an object from its canonical encoding.
     
-    elif obj_type == 'tree':
-        # Trees reference child objects
-        if isinstance(content, dict) and 'children' in content:
-            refs.update(content['children'])
+    Snapshots and trees are matched with precompiled patterns over the
+    bytes and bundles and blobs are recognized by their trailing type,
+    so no JSON is parsed. Returns the same set as extract_references
+    would for the decoded object, or None if data is not in the form
+    recognized here; callers then decode it and use extract_references.
+    """
+    if data.endswith(_ENCODED_LEAVES):
+        return set()
     
-    # blob and bundle are leaf objects with no references
+    for suffix, pattern in _ENCODED_REFERENCES.items():
+        if not data.endswith(suffix):
+            continue
+        match = pattern.match(data)
+        if match is None:
+            return None
+        
+        hashes, *single = match.groups()
+        refs = set()
+        if hashes:
+            refs.update(map(intern_hash, hashes.decode('ascii')[1:-1].split('","')))
+        refs.update(intern_hash(ref.decode('ascii')) for ref in single if ref)
+        return refs
     
-    return refs
+    return None
 
 
-def verify_references_exist(obj_hash: str, references: Set[str], exists_func) -> None:
+def verify_references_exist(obj_hash: str, references: Set[str], exists_many_func) -> None:
     """
     Verify that all referenced objects exist.
     
-    exists_func should be a callable that takes a hash and returns bool.
+    exists_many_func should be a callable that takes an iterable of
+    hashes and returns the set of those that exist.
     
     Raises ReferenceMissingError if any reference is missing.
     """
-    for ref_hash in references:
-        if not exists_func(ref_hash):
-            raise ReferenceMissingError(obj_hash, ref_hash)
+    missing = references - exists_many_func(references)
+    if missing:
+        raise ReferenceMissingError(obj_hash, min(missing))
 
 
 def verify_snapshot_recursive(
     snapshot_hash: str,
     load_func,
-    exists_func,
+    exists_many_func,
     visited: Set[str] = None
 ) -> Tuple[bool, List[str]]:
     """
-    Recursively verify a snapshot and all its references.
+    Verify a snapshot and all its references.
+    
+    The snapshot graph is walked breadth-first with an explicit queue, so
+    chain depth is not limited by the recursion limit. Each reachable
+    object is loaded at most once per call and its integrity checked
+    once; objects shared by several snapshots are not reloaded.
     
-    load_func: callable that loads object data by hash
-    exists_func: callable that checks if object exists by hash
-    visited: set of already-visited hashes (for cycle detection)
+    load_func: callable that loads object data by hash; it may instead
+        return (obj_data, stored_bytes), so intact objects are verified by
+        hashing those bytes instead of re-encoding the object
+    exists_many_func: callable returning the subset of given hashes that exist
+    visited: set of hashes whose integrity is already verified; pass the
+        same set to several calls to avoid re-hashing shared objects
     
     Returns (is_valid, errors) where errors is list of error messages.
     """
@@ -122,71 +221,85 @@ def verify_snapshot_recursive(
     
     errors = []
     
-    # Detect cycles
-    if snapshot_hash in visited:
-        errors.append(f"Cycle detected: {snapshot_hash}")
-        return False, errors
-    
-    visited.add(snapshot_hash)
-    
     # Load and verify the snapshot object
     try:
-        obj_data = load_func(snapshot_hash)
+        obj_data, raw = _load(load_func, snapshot_hash)
     except Exception as e:
         errors.append(f"Failed to load {snapshot_hash}: {e}")
         return False, errors
     
-    # Verify object structure
-    try:
-        verify_object_structure(obj_data)
-    except InvalidObjectError as e:
-        errors.append(f"Invalid structure in {snapshot_hash}: {e}")
-        return False, errors
-    
-    # Verify object integrity (hash matches content)
-    try:
-        verify_object_integrity(obj_data, snapshot_hash)
-    except ObjectCorruptedError as e:
-        errors.append(f"Corruption in {snapshot_hash}: {e}")
-        return False, errors
+    if snapshot_hash not in visited:
+        try:
+            _check_loaded(obj_data, raw, snapshot_hash)
+        except InvalidObjectError as e:
+            errors.append(f"Invalid structure in {snapshot_hash}: {e}")
+            return False, errors
+        except ObjectCorruptedError as e:
+            errors.append(f"Corruption in {snapshot_hash}: {e}")
+            return False, errors
+        
+        visited.add(snapshot_hash)
     
     # Verify this is actually a snapshot
     if obj_data.get('type') != 'snapshot':
         errors.append(f"Object {snapshot_hash} is not a snapshot")
         return False, errors
     
-    # Extract and verify all references
-    refs = extract_references(obj_data)
-    
-    try:
-        verify_references_exist(snapshot_hash, refs, exists_func)
-    except ReferenceMissingError as e:
-        errors.append(str(e))
-        return False, errors
+    queue = deque([(snapshot_hash, obj_data)])
+    # Objects already loaded by this walk
+    seen = {snapshot_hash}
     
-    # Recursively verify referenced objects
-    for ref_hash in refs:
+    while queue:
+        current_hash, current_data = queue.popleft()
+        
+        # Extract and verify all references
+        refs = extract_references(current_data)
+        
         try:
-            ref_obj = load_func(ref_hash)
-            verify_object_structure(ref_obj)
-            verify_object_integrity(ref_obj, ref_hash)
+            verify_references_exist(current_hash, refs, exists_many_func)
+        except ReferenceMissingError as e:
+            errors.append(str(e))
+            continue
+        
+        # Verify referenced objects, queueing snapshots for expansion
+        for ref_hash in refs:
+            if ref_hash in seen:
+                continue
+            seen.add(ref_hash)
+            
+            try:
+                ref_obj, raw = _load(load_func, ref_hash)
+                if ref_hash not in visited:
+                    _check_loaded(ref_obj, raw, ref_hash)
+                    visited.add(ref_hash)
+            except Exception as e:
+                errors.append(f"Failed to verify reference {ref_hash}: {e}")
+                break
             
-            # If reference is also a snapshot, verify it recursively
             if ref_obj.get('type') == 'snapshot':
-                is_valid, sub_errors = verify_snapshot_recursive(
-                    ref_hash, load_func, exists_func, visited
-                )
-                if not is_valid:
-                    errors.extend(sub_errors)
-        
-        except Exception as e:
-            errors.append(f"Failed to verify reference {ref_hash}: {e}")
-            return False, errors
+                queue.append((ref_hash, ref_obj))
     
     is_valid = len(errors) == 0
     return is_valid, errors
 
 
+def _load(load_func, obj_hash: str) -> Tuple[dict, Optional[bytes]]:
+    """Call load_func, returning (obj_data, stored bytes or None)."""
+    loaded = load_func(obj_hash)
+    if isinstance(loaded, tuple):
+        return loaded
+    return loaded, None
+
+
+def _check_loaded(obj_data: dict, raw: Optional[bytes], obj_hash: str) -> None:
+    """Verify a loaded object, from its stored bytes when available."""
+    if raw is not None:
+        verify_object_integrity_bytes(obj_data, raw, obj_hash)
+    else:
+        verify_object_structure(obj_data)
+        verify_object_integrity(obj_data, obj_hash)
+
+
 def detect_tampering(obj_hash: str, stored_data: bytes, metadata: dict = None) -> bool:
     """
     Detect if an object has been tampered with.
@@ -4,15 +4,23 @@ System invariants and their verification.
 Defines and checks critical system guarantees.
 """
 
-from typing import Callable, List
+from typing import Callable, Dict, List
+import weakref
+
 from .errors import InvariantViolationError
 
 
+# Registries built by verify_store_invariants, one per live store
+_store_registries: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+
 class Invariant:
     """
     Represents a system invariant that must always hold.
     """
     
+    __slots__ = ('name', 'description', 'check_func')
+    
     def __init__(self, name: str, description: str, check_func: Callable[[], bool]):
         """
         Define an invariant.
@@ -56,13 +64,21 @@ class InvariantRegistry:
     Provides centralized management and verification of invariants.
     """
     
+    __slots__ = ('invariants',)
+    
     def __init__(self):
-        self.invariants: List[Invariant] = []
+        # Invariants by name, in registration order
+        self.invariants: Dict[str, Invariant] = {}
     
     def register(self, name: str, description: str, check_func: Callable[[], bool]) -> None:
-        """Register a new invariant."""
-        invariant = Invariant(name, description, check_func)
-        self.invariants.append(invariant)
+        """
+        Register a new invariant.
+        
+        Raises ValueError if an invariant with this name is already registered.
+        """
+        if name in self.invariants:
+            raise ValueError(f"Invariant already registered: {name}")
+        self.invariants[name] = Invariant(name, description, check_func)
     
     def verify_all(self) -> dict:
         """
@@ -79,7 +95,7 @@ class InvariantRegistry:
             'all_passed': True,
         }
         
-        for invariant in self.invariants:
+        for invariant in self.invariants.values():
             try:
                 invariant.verify()
                 result['passed'].append(invariant.name)
@@ -95,11 +111,10 @@ class InvariantRegistry:
         
         Returns True if passed, raises InvariantViolationError if failed.
         """
-        for invariant in self.invariants:
-            if invariant.name == name:
-                return invariant.verify()
-        
-        raise ValueError(f"Unknown invariant: {name}")
+        invariant = self.invariants.get(name)
+        if invariant is None:
+            raise ValueError(f"Unknown invariant: {name}")
+        return invariant.verify()
     
     def list_invariants(self) -> List[tuple]:
         """
@@ -107,7 +122,7 @@ class InvariantRegistry:
         
         Returns list of (name, description) tuples.
         """
-        return [(inv.name, inv.description) for inv in self.invariants]
+        return [(inv.name, inv.description) for inv in self.invariants.values()]
 
 
 def create_core_invariants(store) -> InvariantRegistry:
@@ -186,7 +201,18 @@ def verify_store_invariants(store) -> dict:
     """
     Verify all invariants for a store instance.
     
+    The invariants only close over the store, so the registry is built
+    once per store and reused by later calls.
+    
     Returns dict with verification results.
     """
-    registry = create_core_invariants(store)
+    try:
+        registry = _store_registries.get(store)
+    except TypeError:
+        # Store cannot be weakly referenced; build a registry per call
+        return create_core_invariants(store).verify_all()
+    
+    if registry is None:
+        registry = create_core_invariants(store)
+        _store_registries[store] = registry
     return registry.verify_all()
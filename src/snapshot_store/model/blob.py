@@ -5,27 +5,32 @@ Blobs store raw binary data content-addressed by hash.
 """
 
 import base64
+from dataclasses import dataclass, field
 from typing import Optional
-from ..integrity.hashing import compute_object_hash
+from ..integrity.canonical import canonical_json
+from ..integrity.hashing import compute_content_hash, compute_hash, intern_hash
 
 
+@dataclass(slots=True, frozen=True, eq=False)
 class Blob:
     """
     Immutable blob object containing raw data.
     
     Blobs are leaf objects - they contain no references.
+    
+    Args:
+        data: raw binary data
+        metadata: optional metadata dict
     """
     
-    def __init__(self, data: bytes, metadata: Optional[dict] = None):
-        """
-        Create a blob from raw bytes.
-        
-        Args:
-            data: raw binary data
-            metadata: optional metadata dict
-        """
-        self.data = data
-        self.metadata = metadata or {}
+    data: bytes
+    metadata: Optional[dict] = None
+    # Content hash and canonical encoding, computed once on first use
+    _hash: Optional[str] = field(default=None, init=False, repr=False)
+    _canonical: Optional[bytes] = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'metadata', self.metadata or {})
     
     def to_dict(self) -> dict:
         """
@@ -44,10 +49,13 @@ class Blob:
         return obj
     
     @classmethod
-    def from_dict(cls, data: dict) -> 'Blob':
+    def from_dict(cls, data: dict, obj_hash: Optional[str] = None) -> 'Blob':
         """
         Reconstruct blob from stored dictionary.
         
+        If obj_hash is given (the verified hash the data was loaded
+        under), it is cached so compute_hash does not re-encode.
+        
         Raises ValueError if data is invalid.
         """
         if data.get('type') != 'blob':
@@ -62,13 +70,41 @@ class Blob:
         except Exception as e:
             raise ValueError(f"Failed to decode blob content: {e}")
         
-        metadata = data.get('metadata', {})
+        return cls.from_content(content_bytes, data.get('metadata'), obj_hash)
+    
+    @classmethod
+    def from_content(cls, data: bytes, metadata: Optional[dict] = None,
+                     obj_hash: Optional[str] = None) -> 'Blob':
+        """
+        Build a blob from already-decoded content.
         
-        return cls(content_bytes, metadata)
+        If obj_hash is given it is cached, as in from_dict.
+        """
+        obj = cls(data, metadata)
+        if obj_hash is not None:
+            object.__setattr__(obj, '_hash', intern_hash(obj_hash))
+        return obj
+    
+    def canonical_bytes(self) -> bytes:
+        """Get the canonical encoding of this blob, caching the result."""
+        if self._canonical is None:
+            object.__setattr__(self, '_canonical', canonical_json(self.to_dict()))
+        return self._canonical
     
     def compute_hash(self) -> str:
-        """Compute content hash of this blob."""
-        return compute_object_hash(self.to_dict())
+        """
+        Compute content hash of this blob, caching the result.
+        
+        Reuses the canonical encoding if it was already built; otherwise
+        the content is streamed into the hasher without building it.
+        """
+        if self._hash is None:
+            if self._canonical is not None:
+                obj_hash = compute_hash(self._canonical)
+            else:
+                obj_hash = compute_content_hash(self.data, 'blob', self.metadata)
+            object.__setattr__(self, '_hash', obj_hash)
+        return self._hash
     
     def size(self) -> int:
         """Get size of blob data in bytes."""
@@ -4,28 +4,33 @@ Bundle object model.
 Bundles store sqlite-sync-core sync bundles.
 """
 
+from dataclasses import dataclass, field
 from typing import Optional, Any
-from ..integrity.hashing import compute_object_hash
+from ..integrity.canonical import canonical_json
+from ..integrity.hashing import compute_hash, intern_hash
 
 
+@dataclass(slots=True, frozen=True, eq=False)
 class Bundle:
     """
     Immutable bundle object containing a sync bundle from sqlite-sync-core.
     
     Bundles are leaf objects - they contain no references to other objects.
     They store the sync bundle data directly.
+    
+    Args:
+        bundle_data: the sync bundle from sqlite-sync-core
+        metadata: optional metadata (source, timestamp, etc)
     """
     
-    def __init__(self, bundle_data: dict, metadata: Optional[dict] = None):
-        """
-        Create a bundle from sync bundle data.
-        
-        Args:
-            bundle_data: the sync bundle from sqlite-sync-core
-            metadata: optional metadata (source, timestamp, etc)
-        """
-        self.bundle_data = bundle_data
-        self.metadata = metadata or {}
+    bundle_data: dict
+    metadata: Optional[dict] = None
+    # Content hash and canonical encoding, computed once on first use
+    _hash: Optional[str] = field(default=None, init=False, repr=False)
+    _canonical: Optional[bytes] = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'metadata', self.metadata or {})
     
     def to_dict(self) -> dict:
         """
@@ -44,10 +49,13 @@ class Bundle:
         return obj
     
     @classmethod
-    def from_dict(cls, data: dict) -> 'Bundle':
+    def from_dict(cls, data: dict, obj_hash: Optional[str] = None) -> 'Bundle':
         """
         Reconstruct bundle from stored dictionary.
         
+        If obj_hash is given (the verified hash the data was loaded
+        under), it is cached so compute_hash does not re-encode.
+        
         Raises ValueError if data is invalid.
         """
         if data.get('type') != 'bundle':
@@ -57,13 +65,24 @@ class Bundle:
             raise ValueError("Bundle missing content field")
         
         bundle_data = data['content']
-        metadata = data.get('metadata', {})
+        metadata = data.get('metadata')
         
-        return cls(bundle_data, metadata)
+        obj = cls(bundle_data, metadata)
+        if obj_hash is not None:
+            object.__setattr__(obj, '_hash', intern_hash(obj_hash))
+        return obj
+    
+    def canonical_bytes(self) -> bytes:
+        """Get the canonical encoding of this bundle, caching the result."""
+        if self._canonical is None:
+            object.__setattr__(self, '_canonical', canonical_json(self.to_dict()))
+        return self._canonical
     
     def compute_hash(self) -> str:
-        """Compute content hash of this bundle."""
-        return compute_object_hash(self.to_dict())
+        """Compute content hash of this bundle, caching the result."""
+        if self._hash is None:
+            object.__setattr__(self, '_hash', compute_hash(self.canonical_bytes()))
+        return self._hash
     
     def get_operations(self) -> list:
         """
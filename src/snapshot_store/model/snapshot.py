@@ -4,10 +4,13 @@ Snapshot object model.
 Snapshots represent deterministic state references.
 """
 
-from typing import Optional, List
-from ..integrity.hashing import compute_object_hash
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple
+from ..integrity.canonical import canonical_json, canonical_string_list
+from ..integrity.hashing import compute_hash, intern_hash
 
 
+@dataclass(slots=True, frozen=True, eq=False)
 class Snapshot:
     """
     Immutable snapshot object representing a deterministic state.
@@ -18,25 +21,25 @@ class Snapshot:
     - Metadata (description, timestamp, etc)
     
     Snapshots form a DAG (directed acyclic graph) through parent references.
+    
+    Args:
+        bundles: ordered bundle hashes, stored as a tuple
+        parent: optional parent snapshot hash
+        metadata: optional metadata
     """
     
-    def __init__(
-        self,
-        bundles: List[str],
-        parent: Optional[str] = None,
-        metadata: Optional[dict] = None,
-    ):
-        """
-        Create a snapshot.
-        
-        Args:
-            bundles: ordered list of bundle hashes
-            parent: optional parent snapshot hash
-            metadata: optional metadata
-        """
-        self.bundles = list(bundles)  # Copy to ensure immutability
-        self.parent = parent
-        self.metadata = metadata or {}
+    bundles: Tuple[str, ...]
+    parent: Optional[str] = None
+    metadata: Optional[dict] = None
+    # Content hash and canonical encoding, computed once on first use
+    _hash: Optional[str] = field(default=None, init=False, repr=False)
+    _canonical: Optional[bytes] = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self):
+        # Intern hashes so snapshots sharing bundles share their strings
+        object.__setattr__(self, 'bundles', tuple(map(intern_hash, self.bundles)))
+        object.__setattr__(self, 'parent', intern_hash(self.parent))
+        object.__setattr__(self, 'metadata', self.metadata or {})
     
     def to_dict(self) -> dict:
         """
@@ -62,10 +65,13 @@ class Snapshot:
         return obj
     
     @classmethod
-    def from_dict(cls, data: dict) -> 'Snapshot':
+    def from_dict(cls, data: dict, obj_hash: Optional[str] = None) -> 'Snapshot':
         """
         Reconstruct snapshot from stored dictionary.
         
+        If obj_hash is given (the verified hash the data was loaded
+        under), it is cached so compute_hash does not re-encode.
+        
         Raises ValueError if data is invalid.
         """
         if data.get('type') != 'snapshot':
@@ -80,17 +86,77 @@ class Snapshot:
             raise ValueError("Snapshot content missing bundles field")
         
         bundles = content['bundles']
-        if not isinstance(bundles, list):
+        if not isinstance(bundles, (list, tuple)):
             raise ValueError("Snapshot bundles must be a list")
         
         parent = content.get('parent')
-        metadata = data.get('metadata', {})
+        metadata = data.get('metadata')
         
-        return cls(bundles, parent, metadata)
+        obj = cls(bundles, parent, metadata)
+        if obj_hash is not None:
+            object.__setattr__(obj, '_hash', intern_hash(obj_hash))
+        return obj
+    
+    @staticmethod
+    def bundle_hashes_only(data: dict) -> Tuple[str, ...]:
+        """
+        Get the bundle hashes of a stored snapshot dictionary.
+        
+        Lighter than from_dict when only the bundle list is needed.
+        
+        Raises ValueError if data is invalid.
+        """
+        if data.get('type') != 'snapshot':
+            raise ValueError(f"Invalid snapshot type: {data.get('type')}")
+        
+        bundles = data.get('content', {}).get('bundles')
+        if not isinstance(bundles, (list, tuple)):
+            raise ValueError("Snapshot bundles must be a list")
+        
+        return tuple(map(intern_hash, bundles))
+    
+    @staticmethod
+    def parent_only(data: dict) -> Optional[str]:
+        """
+        Get the parent hash of a stored snapshot dictionary.
+        
+        Lighter than from_dict when only the parent pointer is needed.
+        
+        Raises ValueError if data is invalid.
+        """
+        if data.get('type') != 'snapshot':
+            raise ValueError(f"Invalid snapshot type: {data.get('type')}")
+        
+        content = data.get('content')
+        if not isinstance(content, dict):
+            raise ValueError("Snapshot missing content field")
+        
+        return intern_hash(content.get('parent'))
+    
+    def canonical_bytes(self) -> bytes:
+        """
+        Get the canonical encoding of this snapshot, caching the result.
+        
+        The fixed keys are written directly around the encoded fields,
+        which gives the same bytes as canonical_json(self.to_dict())
+        without building and key-sorting the dictionaries.
+        """
+        if self._canonical is None:
+            parts = [b'{"content":{"bundles":', canonical_string_list(self.bundles)]
+            if self.parent:
+                parts += (b',"parent":', canonical_json(self.parent))
+            parts.append(b'}')
+            if self.metadata:
+                parts += (b',"metadata":', canonical_json(self.metadata))
+            parts.append(b',"type":"snapshot"}')
+            object.__setattr__(self, '_canonical', b''.join(parts))
+        return self._canonical
     
     def compute_hash(self) -> str:
-        """Compute content hash of this snapshot."""
-        return compute_object_hash(self.to_dict())
+        """Compute content hash of this snapshot, caching the result."""
+        if self._hash is None:
+            object.__setattr__(self, '_hash', compute_hash(self.canonical_bytes()))
+        return self._hash
     
     def bundle_count(self) -> int:
         """Get number of bundles in this snapshot."""
@@ -130,7 +196,7 @@ class Snapshot:
         Returns new Snapshot instance (immutable).
         """
         return Snapshot(
-            bundles=self.bundles + new_bundles,
+            bundles=self.bundles + tuple(new_bundles),
             parent=self.parent,
             metadata=self.metadata.copy(),
         )
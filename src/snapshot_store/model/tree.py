@@ -4,10 +4,13 @@ Tree object model.
 Trees provide hierarchical grouping of objects.
 """
 
-from typing import List, Optional
-from ..integrity.hashing import compute_object_hash
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+from ..integrity.canonical import canonical_json, canonical_string_list
+from ..integrity.hashing import compute_hash, intern_hash
 
 
+@dataclass(slots=True, frozen=True, eq=False)
 class Tree:
     """
     Immutable tree object for grouping other objects.
@@ -19,22 +22,24 @@ class Tree:
     - Snapshots
     
     Trees enable organizing objects into directories or collections.
+    
+    Args:
+        children: child object hashes, stored as a tuple
+        metadata: optional metadata (names, permissions, etc)
     """
     
-    def __init__(
-        self,
-        children: List[str],
-        metadata: Optional[dict] = None,
-    ):
-        """
-        Create a tree.
-        
-        Args:
-            children: list of child object hashes
-            metadata: optional metadata (names, permissions, etc)
-        """
-        self.children = list(children)  # Copy to ensure immutability
-        self.metadata = metadata or {}
+    children: Tuple[str, ...]
+    metadata: Optional[dict] = None
+    # Content hash and canonical encoding, computed once on first use
+    _hash: Optional[str] = field(default=None, init=False, repr=False)
+    _canonical: Optional[bytes] = field(default=None, init=False, repr=False)
+    # Child names parallel to children, computed once on first use
+    _names: Optional[Tuple[str, ...]] = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self):
+        # Intern hashes so trees sharing children share their strings
+        object.__setattr__(self, 'children', tuple(map(intern_hash, self.children)))
+        object.__setattr__(self, 'metadata', self.metadata or {})
     
     def to_dict(self) -> dict:
         """
@@ -57,10 +62,13 @@ class Tree:
         return obj
     
     @classmethod
-    def from_dict(cls, data: dict) -> 'Tree':
+    def from_dict(cls, data: dict, obj_hash: Optional[str] = None) -> 'Tree':
         """
         Reconstruct tree from stored dictionary.
         
+        If obj_hash is given (the verified hash the data was loaded
+        under), it is cached so compute_hash does not re-encode.
+        
         Raises ValueError if data is invalid.
         """
         if data.get('type') != 'tree':
@@ -75,16 +83,36 @@ class Tree:
             raise ValueError("Tree content missing children field")
         
         children = content['children']
-        if not isinstance(children, list):
+        if not isinstance(children, (list, tuple)):
             raise ValueError("Tree children must be a list")
         
-        metadata = data.get('metadata', {})
+        metadata = data.get('metadata')
         
-        return cls(children, metadata)
+        obj = cls(children, metadata)
+        if obj_hash is not None:
+            object.__setattr__(obj, '_hash', intern_hash(obj_hash))
+        return obj
+    
+    def canonical_bytes(self) -> bytes:
+        """
+        Get the canonical encoding of this tree, caching the result.
+        
+        Written directly around the encoded fields, like
+        Snapshot.canonical_bytes.
+        """
+        if self._canonical is None:
+            parts = [b'{"content":{"children":', canonical_string_list(self.children), b'}']
+            if self.metadata:
+                parts += (b',"metadata":', canonical_json(self.metadata))
+            parts.append(b',"type":"tree"}')
+            object.__setattr__(self, '_canonical', b''.join(parts))
+        return self._canonical
     
     def compute_hash(self) -> str:
-        """Compute content hash of this tree."""
-        return compute_object_hash(self.to_dict())
+        """Compute content hash of this tree, caching the result."""
+        if self._hash is None:
+            object.__setattr__(self, '_hash', compute_hash(self.canonical_bytes()))
+        return self._hash
     
     def child_count(self) -> int:
         """Get number of children in this tree."""
@@ -94,14 +122,27 @@ class Tree:
         """Check if this tree has any children."""
         return len(self.children) > 0
     
+    def child_names(self) -> Tuple[str, ...]:
+        """
+        Get the names of the children, in the same order as children.
+        
+        Unnamed children have the name ''. The tuple is computed once,
+        so enumerating children with their names needs no lookups.
+        """
+        if self._names is None:
+            names = self.metadata.get('names') or {}
+            object.__setattr__(
+                self, '_names', tuple(names.get(child, '') for child in self.children)
+            )
+        return self._names
+    
     def get_child_names(self) -> dict:
         """
         Get mapping of child hashes to names if present in metadata.
         
         Returns dict mapping hash -> name.
         """
-        names = self.metadata.get('names', {})
-        return {child: names.get(child, '') for child in self.children}
+        return dict(zip(self.children, self.child_names()))
     
     def with_child(self, child_hash: str, name: Optional[str] = None) -> 'Tree':
         """
@@ -109,13 +150,12 @@ class Tree:
         
         Returns new Tree instance (immutable).
         """
-        new_children = self.children + [child_hash]
+        new_children = self.children + (child_hash,)
         new_metadata = self.metadata.copy()
         
         if name:
-            if 'names' not in new_metadata:
-                new_metadata['names'] = {}
-            new_metadata['names'][child_hash] = name
+            # Copy the names so this tree's metadata is left untouched
+            new_metadata['names'] = {**new_metadata.get('names', {}), child_hash: name}
         
         return Tree(new_children, new_metadata)
     
@@ -123,15 +163,20 @@ class Tree:
         """
         Create a new tree without a specific child.
         
-        Returns new Tree instance (immutable).
+        Returns new Tree instance (immutable), or this tree itself if
+        child_hash is not one of its children.
         """
-        new_children = [c for c in self.children if c != child_hash]
+        if child_hash not in self.children:
+            return self
+        
+        new_children = tuple(c for c in self.children if c != child_hash)
         new_metadata = self.metadata.copy()
         
-        # Remove name if present
-        if 'names' in new_metadata and child_hash in new_metadata['names']:
+        # Remove name if present; other names are shared unchanged
+        names = new_metadata.get('names')
+        if names and child_hash in names:
             new_metadata['names'] = {
-                k: v for k, v in new_metadata['names'].items()
+                k: v for k, v in names.items()
                 if k != child_hash
             }
         
@@ -0,0 +1,97 @@
+"""
+Raw binary encoding for stored blobs.
+
+Stores blob content as raw bytes instead of base64 inside canonical JSON.
+"""
+
+import base64
+import struct
+from typing import Optional, Tuple
+
+from ..errors import InvalidObjectError
+from ..integrity.canonical import canonical_json, decode_json
+from ..integrity.hashing import compute_content_hash
+
+
+# Canonical JSON starts with '{' and zstd frames with ZSTD_MAGIC, so
+# stored bytes remain self-describing.
+BLOB_MAGIC = b'\x00SSB'
+
+_HEADER = struct.Struct('>4sI')
+
+
+def encode_blob_payload(data: bytes, metadata: Optional[dict] = None) -> bytes:
+    """
+    Encode blob content and metadata as a raw payload.
+    
+    The payload is BLOB_MAGIC, the length of the metadata, the metadata
+    as canonical JSON (empty if there is none) and the raw content.
+    
+    Raises InvalidObjectError if metadata is not a dictionary.
+    """
+    if metadata and not isinstance(metadata, dict):
+        raise InvalidObjectError("Metadata must be a dictionary")
+    
+    encoded_metadata = canonical_json(metadata) if metadata else b''
+    header = _HEADER.pack(BLOB_MAGIC, len(encoded_metadata))
+    return b''.join((header, encoded_metadata, data))
+
+
+def is_blob_payload(payload: bytes) -> bool:
+    """Check whether stored bytes are a raw blob payload."""
+    return payload[:len(BLOB_MAGIC)] == BLOB_MAGIC
+
+
+def decode_blob_payload(payload: bytes) -> Tuple[memoryview, dict]:
+    """
+    Split a raw blob payload into (content, metadata).
+    
+    The content is a view into payload, so no copy of it is made.
+    
+    Raises ValueError if the payload is truncated or its metadata invalid.
+    """
+    if len(payload) < _HEADER.size or not is_blob_payload(payload):
+        raise ValueError("Not a blob payload")
+    
+    _, metadata_size = _HEADER.unpack_from(payload)
+    content_start = _HEADER.size + metadata_size
+    if content_start > len(payload):
+        raise ValueError("Truncated blob payload")
+    
+    view = memoryview(payload)
+    metadata = {}
+    if metadata_size:
+        metadata = decode_json(view[_HEADER.size:content_start])
+        if not isinstance(metadata, dict) or not metadata:
+            raise ValueError("Invalid blob metadata")
+    
+    return view[content_start:], metadata
+
+
+def blob_payload_hash(payload: bytes) -> str:
+    """
+    Compute the hash of the blob stored in a raw payload.
+    
+    This is the hash of the blob's canonical JSON encoding, streamed
+    from the raw content without building it.
+    
+    Raises ValueError if the payload is invalid.
+    """
+    content, metadata = decode_blob_payload(payload)
+    return compute_content_hash(content, 'blob', metadata)
+
+
+def blob_payload_to_object(payload: bytes) -> dict:
+    """
+    Build the object dictionary of the blob stored in a raw payload.
+    
+    Raises ValueError if the payload is invalid.
+    """
+    content, metadata = decode_blob_payload(payload)
+    obj = {
+        'type': 'blob',
+        'content': base64.b64encode(content).decode('ascii'),
+    }
+    if metadata:
+        obj['metadata'] = metadata
+    return obj
@@ -0,0 +1,99 @@
+"""
+Bloom filter over object hashes.
+
+Provides fast negative answers to existence checks.
+"""
+
+import hashlib
+import math
+import struct
+
+from ..integrity.hashing import hash_to_digest
+
+
+# capacity, num_bits, num_hashes and count, ahead of the bit array
+_HEADER = struct.Struct('>QQBQ')
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter keyed by object hashes.
+    
+    Object hashes are already uniformly distributed, so bit positions
+    are taken directly from slices of the digest instead of rehashing.
+    Keys that are not hex digests are hashed with SHA-256 first.
+    
+    A negative answer is exact; a positive answer may be a false
+    positive with probability close to error_rate while the number of
+    added keys stays within capacity.
+    """
+    
+    def __init__(self, capacity: int, error_rate: float = 1e-4):
+        """
+        Create an empty filter.
+        
+        Args:
+            capacity: expected number of keys
+            error_rate: target false positive rate at capacity
+        """
+        capacity = max(1, capacity)
+        num_bits = -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        
+        self.capacity = capacity
+        self.num_bits = max(8, int(num_bits))
+        # Each position uses 4 bytes of the digest, so at most 8 fit
+        self.num_hashes = max(1, min(8, round(self.num_bits / capacity * math.log(2))))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+    
+    def add(self, key: str) -> None:
+        """Add a key to the filter."""
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def __contains__(self, key: str) -> bool:
+        """Check whether a key may have been added."""
+        bits = self._bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+    
+    def to_bytes(self) -> bytes:
+        """Serialize the filter, for from_bytes to restore."""
+        header = _HEADER.pack(self.capacity, self.num_bits, self.num_hashes, self.count)
+        return header + self._bits
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BloomFilter':
+        """
+        Restore a filter serialized by to_bytes.
+        
+        Raises ValueError if data is not a serialized filter.
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated Bloom filter")
+        
+        capacity, num_bits, num_hashes, count = _HEADER.unpack_from(data)
+        bits = bytearray(data[_HEADER.size:])
+        if len(bits) != (num_bits + 7) // 8 or not 1 <= num_hashes <= 8:
+            raise ValueError("Invalid Bloom filter")
+        
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.count = count
+        bloom._bits = bits
+        return bloom
+    
+    def _positions(self, key: str):
+        """Yield the bit positions for a key."""
+        digest = hash_to_digest(key)
+        if digest is None:
+            digest = hashlib.sha256(key.encode('utf-8')).digest()
+        
+        for i in range(self.num_hashes):
+            word = int.from_bytes(digest[4 * i:4 * i + 4], 'little')
+            yield word % self.num_bits
@@ -0,0 +1,196 @@
+"""
+Dictionary compression for stored objects.
+
+Uses zstd with a dictionary trained on the store's own objects.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+from ..errors import StorageError
+
+
+# Every zstd frame starts with this magic number; canonical JSON
+# always starts with '{', so stored bytes are self-describing.
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+DICT_SIZE = 64 * 1024
+COMPRESSION_LEVEL = 3
+
+
+class ObjectCompressor:
+    """
+    Compresses object payloads with a shared zstd dictionary.
+    
+    Compression is active once a dictionary has been trained and saved
+    at dict_path; until then payloads pass through unchanged. Payloads
+    that do not shrink (e.g. already-compressed blobs) are stored raw.
+    Hashes are always computed over the uncompressed canonical bytes.
+    
+    Every trained dictionary is also kept next to dict_path under its
+    zstd dictionary ID (see archive_path), and frames are decompressed
+    with the dictionary whose ID they record, so retraining never makes
+    earlier objects unreadable.
+    
+    Requires the optional zstandard package to compress; reading a
+    compressed object without it raises ValueError.
+    """
+    
+    def __init__(self, dict_path: Path):
+        """Initialize compressor using the dictionary at dict_path."""
+        self.dict_path = dict_path
+        self._dict: Optional['zstandard.ZstdCompressionDict'] = None
+        self._dict_loaded = False
+        # dict_id -> dictionary, for every dictionary read from the store
+        self._read_dicts: Dict[int, 'zstandard.ZstdCompressionDict'] = {}
+        self._read_lock = threading.Lock()
+        # zstd contexts are not thread-safe; keep one set per thread
+        self._local = threading.local()
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether new payloads will be compressed."""
+        return HAS_ZSTD and self._dictionary() is not None
+    
+    def archive_path(self, dict_id: int) -> Path:
+        """Get the path a dictionary is kept at for reading, by its ID."""
+        return self.dict_path.with_name(f'{self.dict_path.name}.{dict_id}')
+    
+    def compress(self, data: bytes) -> bytes:
+        """Compress a payload, or return it unchanged if that doesn't help."""
+        if not self.enabled:
+            return data
+        
+        compressed = self._compressor().compress(data)
+        if len(compressed) >= len(data):
+            return data
+        return compressed
+    
+    def decompress(self, data: bytes) -> bytes:
+        """
+        Return the canonical bytes of a stored payload.
+        
+        Raises ValueError if a compressed payload cannot be decoded,
+        including when the dictionary it was compressed with is missing.
+        """
+        if not data.startswith(ZSTD_MAGIC):
+            return data
+        
+        if not HAS_ZSTD:
+            raise ValueError("zstandard is required to read compressed objects")
+        
+        try:
+            dict_id = zstandard.get_frame_parameters(data).dict_id
+            return self._decompressor(dict_id).decompress(data)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Invalid compressed object: {e}")
+    
+    def train(self, samples: List[bytes], dict_size: int = DICT_SIZE) -> None:
+        """
+        Train a dictionary from sample payloads and save it.
+        
+        The new dictionary replaces the one used for compression; any
+        previous one stays archived for reading.
+        
+        Raises StorageError if zstandard is missing, training fails or
+        the dictionary cannot be written.
+        """
+        if not HAS_ZSTD:
+            raise StorageError("train_dictionary", str(self.dict_path),
+                               ImportError("zstandard is not installed"))
+        
+        try:
+            trained = zstandard.train_dictionary(dict_size, samples)
+        except zstandard.ZstdError as e:
+            raise StorageError("train_dictionary", str(self.dict_path), e)
+        
+        # Archive the current dictionary first, in case it predates archiving
+        current = self._read_dictionary_file(self.dict_path)
+        if current is not None:
+            self._write_dictionary_file(self.archive_path(current.dict_id()), current)
+        self._write_dictionary_file(self.archive_path(trained.dict_id()), trained)
+        self._write_dictionary_file(self.dict_path, trained)
+        
+        with self._read_lock:
+            self._read_dicts[trained.dict_id()] = trained
+        self._dict = trained
+        self._dict_loaded = True
+        self._local = threading.local()
+    
+    def _dictionary(self) -> Optional['zstandard.ZstdCompressionDict']:
+        """Load the dictionary on first use, or None if there is none."""
+        if not self._dict_loaded:
+            if HAS_ZSTD:
+                self._dict = self._read_dictionary_file(self.dict_path)
+            self._dict_loaded = True
+        return self._dict
+    
+    def _read_dictionary(self, dict_id: int) -> 'zstandard.ZstdCompressionDict':
+        """
+        Get the dictionary with a zstd dictionary ID.
+        
+        Dictionaries saved since the last lookup (e.g. trained by another
+        engine on the same store) are found by reading the store again.
+        
+        Raises ValueError if the store has no such dictionary.
+        """
+        with self._read_lock:
+            zdict = self._read_dicts.get(dict_id)
+            if zdict is None:
+                for path in (self.archive_path(dict_id), self.dict_path):
+                    zdict = self._read_dictionary_file(path)
+                    if zdict is not None and zdict.dict_id() == dict_id:
+                        self._read_dicts[dict_id] = zdict
+                        break
+                else:
+                    raise ValueError(f"Missing compression dictionary {dict_id}")
+            return zdict
+    
+    def _read_dictionary_file(self, path: Path) -> Optional['zstandard.ZstdCompressionDict']:
+        """Read a saved dictionary, or None if there is none at path."""
+        try:
+            return zstandard.ZstdCompressionDict(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise StorageError("read_dictionary", str(path), e)
+    
+    def _write_dictionary_file(self, path: Path, zdict: 'zstandard.ZstdCompressionDict') -> None:
+        """Atomically save a dictionary at path."""
+        temp_path = path.with_name(path.name + '.tmp')
+        try:
+            temp_path.write_bytes(zdict.as_bytes())
+            os.replace(temp_path, path)
+        except OSError as e:
+            raise StorageError("write_dictionary", str(path), e)
+    
+    def _compressor(self) -> 'zstandard.ZstdCompressor':
+        """Get this thread's compressor for the current dictionary."""
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(
+                level=COMPRESSION_LEVEL, dict_data=self._dictionary()
+            )
+            self._local.compressor = compressor
+        return compressor
+    
+    def _decompressor(self, dict_id: int) -> 'zstandard.ZstdDecompressor':
+        """Get this thread's decompressor for a zstd dictionary ID (0: none)."""
+        decompressors = getattr(self._local, 'decompressors', None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            zdict = self._read_dictionary(dict_id) if dict_id else None
+            decompressor = zstandard.ZstdDecompressor(dict_data=zdict)
+            decompressors[dict_id] = decompressor
+        return decompressor
@@ -4,13 +4,29 @@ Garbage collection for unreachable objects.
 Implements mark-and-sweep algorithm with safety guarantees.
 """
 
-from typing import Set, List, Callable
-from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, Set, List, Callable, Iterable, Iterator, Optional, Tuple
+from collections import OrderedDict, deque
+import os
+import threading
 
 from ..errors import GarbageCollectionError, InvariantViolationError
 from ..integrity.verification import extract_references
 
 
+# Waves of at least this many objects are loaded on a thread pool
+PARALLEL_MARK_THRESHOLD = 16
+
+# Object loads are I/O bound, so use more threads than cores
+MARK_WORKERS = min(32, 4 * (os.cpu_count() or 1))
+
+# Maximum number of objects whose references are cached between runs
+REFS_CACHE_SIZE = 100_000
+
+# Unreachable objects handed to delete_many_func per call
+SWEEP_BATCH_SIZE = 500
+
+
 class GarbageCollector:
     """
     Garbage collector for content-addressed object store.
@@ -22,36 +38,113 @@ class GarbageCollector:
     Safety guarantees:
     - Never deletes reachable objects
     - Atomic operation (all or nothing)
-    - No race conditions (single-threaded)
+    - No race conditions (objects are only deleted from one thread)
     """
     
     def __init__(
         self,
-        list_all_func: Callable[[], List[str]],
+        list_all_func: Callable[[], Iterable[str]],
         load_object_func: Callable[[str], dict],
         delete_object_func: Callable[[str], bool],
         exists_func: Callable[[str], bool],
+        delete_many_func: Optional[
+            Callable[[List[str]], List[Tuple[bool, Optional[Exception]]]]
+        ] = None,
+        load_many_func: Optional[
+            Callable[[List[str], Optional[Executor]], Dict[str, Any]]
+        ] = None,
+        references_func: Optional[Callable[[str], Iterable[str]]] = None,
+        references_many_func: Optional[
+            Callable[[List[str], Optional[Executor]], Dict[str, Any]]
+        ] = None,
     ):
         """
         Initialize garbage collector.
         
-        list_all_func: returns list of all object hashes
+        list_all_func: returns an iterable of all object hashes
         load_object_func: loads object data by hash
         delete_object_func: deletes object by hash
         exists_func: checks if object exists
+        delete_many_func: optionally deletes a batch of objects, returning
+            a (deleted, error) pair per hash instead of raising; defaults
+            to calling delete_object_func for each hash
+        load_many_func: optionally loads a batch of objects, given the
+            hashes and an executor it may use; returns a dict mapping
+            each existing hash to its object data or to the exception
+            raised loading it. Used to load large mark waves at once.
+        references_func: optionally returns the hashes an object
+            references without building its dictionary; defaults to
+            extracting them from load_object_func's result
+        references_many_func: as load_many_func, but mapping each hash
+            to its references; preferred over load_many_func
         """
         self.list_all = list_all_func
         self.load_object = load_object_func
         self.delete_object = delete_object_func
         self.exists = exists_func
+        self.delete_many = delete_many_func or self._delete_each
+        self.load_many = load_many_func
+        self.load_references = references_func
+        self.load_references_many = references_many_func
+        # obj_hash -> references, in LRU order; objects are immutable, so
+        # entries stay valid until the object is deleted
+        self._refs_cache: OrderedDict = OrderedDict()
+        self._refs_lock = threading.Lock()
+    
+    def clear_reference_cache(self) -> None:
+        """Forget all cached object references."""
+        with self._refs_lock:
+            self._refs_cache.clear()
+    
+    def forget_object(self, obj_hash: str) -> None:
+        """Drop the cached references of a deleted object."""
+        with self._refs_lock:
+            self._refs_cache.pop(obj_hash, None)
+    
+    def references(self, obj_hash: str) -> frozenset:
+        """
+        Get the references of an object, loading it on a cache miss.
+        
+        Loaded references are kept in an LRU cache of REFS_CACHE_SIZE
+        entries, so repeated collections do not reload and re-parse
+        unchanged objects. Safe to call from several threads.
+        
+        Raises whatever load_object_func raises.
+        """
+        with self._refs_lock:
+            refs = self._refs_cache.get(obj_hash)
+            if refs is not None:
+                self._refs_cache.move_to_end(obj_hash)
+                return refs
+        
+        if self.load_references is not None:
+            refs = frozenset(self.load_references(obj_hash))
+        else:
+            refs = frozenset(extract_references(self.load_object(obj_hash)))
+        self._cache_references(obj_hash, refs)
+        return refs
+    
+    def _cache_references(self, obj_hash: str, refs: frozenset) -> None:
+        """Add loaded references to the cache, evicting the oldest entry."""
+        with self._refs_lock:
+            self._refs_cache[obj_hash] = refs
+            if len(self._refs_cache) > REFS_CACHE_SIZE:
+                self._refs_cache.popitem(last=False)
     
-    def collect(self, roots: Set[str], dry_run: bool = False) -> dict:
+    def collect(
+        self,
+        roots: Set[str],
+        dry_run: bool = False,
+        reachable: Optional[Set[str]] = None,
+    ) -> dict:
         """
         Run garbage collection.
         
         Args:
             roots: set of root object hashes to keep
             dry_run: if True, only report what would be deleted
+            reachable: precomputed reachable set for roots; when given,
+                the mark phase is skipped
         
         Returns dict with:
             - reachable: set of reachable object hashes
@@ -67,43 +160,93 @@ class GarbageCollector:
         }
         
         # Phase 1: Mark - find all reachable objects
-        try:
-            reachable = self._mark_reachable(roots)
-            result['reachable'] = reachable
-        except Exception as e:
-            result['errors'].append(f"Mark phase failed: {e}")
-            return result
+        if reachable is None:
+            try:
+                reachable = self._mark_reachable(roots)
+            except Exception as e:
+                result['errors'].append(f"Mark phase failed: {e}")
+                return result
+        result['reachable'] = reachable
         
-        # Phase 2: Identify unreachable objects
+        # Phases 2 and 3: stream unreachable objects and sweep them
         try:
-            all_objects = set(self.list_all())
-            unreachable = all_objects - reachable
-            result['unreachable'] = unreachable
+            for obj_hash, status, error in self.collect_iter(roots, dry_run, reachable):
+                result['unreachable'].add(obj_hash)
+                if status == 'deleted':
+                    result['deleted'].append(obj_hash)
+                elif status == 'error':
+                    result['errors'].append(f"Failed to delete {obj_hash}: {error}")
         except Exception as e:
             result['errors'].append(f"Failed to list objects: {e}")
-            return result
         
-        # Phase 3: Sweep - delete unreachable objects
-        if not dry_run and unreachable:
-            deleted = []
-            for obj_hash in unreachable:
-                try:
-                    # Double-check it's not reachable (safety)
-                    if obj_hash in reachable:
-                        result['errors'].append(
-                            f"Safety violation: attempted to delete reachable object {obj_hash}"
-                        )
-                        continue
-                    
-                    if self.delete_object(obj_hash):
-                        deleted.append(obj_hash)
-                
-                except Exception as e:
-                    result['errors'].append(f"Failed to delete {obj_hash}: {e}")
+        return result
+    
+    def collect_iter(
+        self,
+        roots: Set[str],
+        dry_run: bool = False,
+        reachable: Optional[Set[str]] = None,
+    ) -> Iterator[Tuple[str, str, Optional[Exception]]]:
+        """
+        Run garbage collection, yielding unreachable objects as they are swept.
+        
+        The object listing is streamed and each unreachable object is
+        deleted as soon as it is found, so memory scales with the
+        reachable set rather than with the whole store.
+        
+        Yields (obj_hash, status, error) for each unreachable object,
+        where status is:
+            - 'deleted': the object was deleted
+            - 'missing': the object was already gone
+            - 'unreachable': dry_run is set, nothing was deleted
+            - 'error': deleting failed with error
+        
+        Raises GarbageCollectionError if the mark phase fails; listing
+        errors propagate unchanged.
+        """
+        if reachable is None:
+            try:
+                reachable = self._mark_reachable(roots)
+            except Exception as e:
+                raise GarbageCollectionError(f"Mark phase failed: {e}") from e
+        
+        batch = []
+        for obj_hash in self.list_all():
+            if obj_hash in reachable:
+                continue
             
-            result['deleted'] = deleted
+            if dry_run:
+                yield obj_hash, 'unreachable', None
+                continue
+            
+            batch.append(obj_hash)
+            if len(batch) >= SWEEP_BATCH_SIZE:
+                yield from self.sweep(batch)
+                batch = []
         
-        return result
+        if batch:
+            yield from self.sweep(batch)
+    
+    def sweep(self, batch: List[str]) -> Iterator[Tuple[str, str, Optional[Exception]]]:
+        """Delete a batch of unreachable objects, yielding results as collect_iter does."""
+        for obj_hash, (deleted, error) in zip(batch, self.delete_many(batch)):
+            if error is not None:
+                yield obj_hash, 'error', error
+            elif deleted:
+                self.forget_object(obj_hash)
+                yield obj_hash, 'deleted', None
+            else:
+                yield obj_hash, 'missing', None
+    
+    def _delete_each(self, hashes: List[str]) -> List[Tuple[bool, Optional[Exception]]]:
+        """Default delete_many: call delete_object for each hash."""
+        results = []
+        for obj_hash in hashes:
+            try:
+                results.append((bool(self.delete_object(obj_hash)), None))
+            except Exception as e:
+                results.append((False, e))
+        return results
     
     def _mark_reachable(self, roots: Set[str]) -> Set[str]:
         """
@@ -113,39 +256,166 @@ class GarbageCollector:
         
         Returns set of reachable object hashes.
         """
+        reachable, _ = self._trace(roots)
+        return reachable
+    
+    def compute_closure(self, root: str) -> Tuple[frozenset, bool]:
+        """
+        Compute the set of objects reachable from a single root.
+        
+        Returns (closure, complete). complete is True only if every
+        traversed object existed and could be loaded, i.e. the closure
+        reflects the full object graph and can safely be reused.
+        """
+        reachable, complete = self._trace({root})
+        return frozenset(reachable), complete
+    
+    def _trace(self, roots: Set[str]) -> Tuple[Set[str], bool]:
+        """
+        Breadth-first trace from roots, one wave of the graph at a time.
+        
+        Objects of a wave are independent, so large waves are checked and
+        loaded on a thread pool; loading is dominated by file I/O, which
+        releases the GIL.
+        
+        Returns (reachable, complete) as described in compute_closure.
+        """
         reachable = set()
-        queue = deque(roots)
+        complete = True
+        # Objects visited or queued; each is enqueued only once
+        seen = set(roots)
+        wave = list(seen)
+        executor = None
         
-        while queue:
-            obj_hash = queue.popleft()
-            
-            # Skip if already processed
-            if obj_hash in reachable:
+        try:
+            while wave:
+                if len(wave) >= PARALLEL_MARK_THRESHOLD:
+                    if executor is None:
+                        executor = ThreadPoolExecutor(max_workers=MARK_WORKERS)
+                    if self.load_many is not None or self.load_references_many is not None:
+                        visited = self._visit_many(wave, executor)
+                    else:
+                        visited = executor.map(self._visit, wave)
+                else:
+                    visited = map(self._visit, wave)
+                
+                frontier = []
+                for obj_hash, (exists, refs) in zip(wave, visited):
+                    # Skip if doesn't exist
+                    if not exists:
+                        complete = False
+                        continue
+                    
+                    # Mark as reachable, even if it could not be loaded
+                    reachable.add(obj_hash)
+                    if refs is None:
+                        complete = False
+                        continue
+                    
+                    for ref in refs:
+                        if ref not in seen:
+                            seen.add(ref)
+                            frontier.append(ref)
+                
+                wave = frontier
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        return reachable, complete
+    
+    def _visit(self, obj_hash: str) -> Tuple[bool, Optional[Set[str]]]:
+        """
+        Check and load one object for _trace.
+        
+        Returns (exists, references); references is None if the object
+        exists but could not be loaded.
+        """
+        if not self.exists(obj_hash):
+            return False, None
+        
+        try:
+            return True, self.references(obj_hash)
+        except Exception:
+            # If we can't load an object, we can't traverse it
+            # but we still mark it as reachable to be safe
+            return True, None
+    
+    def _visit_many(
+        self,
+        wave: List[str],
+        executor: Executor
+    ) -> List[Tuple[bool, Optional[Set[str]]]]:
+        """
+        Check and load a whole wave for _trace with one batched call, to
+        references_many_func if given, otherwise to load_many_func.
+        
+        Objects with cached references are only checked for existence.
+        Returns one (exists, references) pair per hash, as _visit does.
+        """
+        with self._refs_lock:
+            cached = {}
+            for obj_hash in wave:
+                refs = self._refs_cache.get(obj_hash)
+                if refs is not None:
+                    self._refs_cache.move_to_end(obj_hash)
+                    cached[obj_hash] = refs
+        
+        misses = [obj_hash for obj_hash in wave if obj_hash not in cached]
+        loaded = self._load_references_many(misses, executor) if misses else {}
+        
+        visited = []
+        for obj_hash in wave:
+            if obj_hash in cached:
+                if self.exists(obj_hash):
+                    visited.append((True, cached[obj_hash]))
+                else:
+                    visited.append((False, None))
                 continue
             
-            # Skip if doesn't exist
-            if not self.exists(obj_hash):
+            if obj_hash not in loaded:
+                visited.append((False, None))
                 continue
             
-            # Mark as reachable
-            reachable.add(obj_hash)
-            
-            # Load object and find references
-            try:
-                obj_data = self.load_object(obj_hash)
-                refs = extract_references(obj_data)
-                
-                # Add references to queue
-                for ref in refs:
-                    if ref not in reachable:
-                        queue.append(ref)
-            
-            except Exception:
-                # If we can't load an object, we can't traverse it
-                # but we still mark it as reachable to be safe
+            # Unloadable objects stay reachable but are not traversed
+            refs = loaded[obj_hash]
+            if isinstance(refs, Exception):
+                visited.append((True, None))
                 continue
+            
+            self._cache_references(obj_hash, refs)
+            visited.append((True, refs))
         
-        return reachable
+        return visited
+    
+    def _load_references_many(
+        self,
+        hashes: List[str],
+        executor: Executor
+    ) -> Dict[str, Any]:
+        """
+        Load the references of a batch of objects for _visit_many.
+        
+        Returns a dict mapping each existing hash to a frozenset of its
+        references, or to the exception raised loading them.
+        """
+        if self.load_references_many is not None:
+            loaded = self.load_references_many(hashes, executor)
+            return {
+                obj_hash: refs if isinstance(refs, Exception) else frozenset(refs)
+                for obj_hash, refs in loaded.items()
+            }
+        
+        loaded = {}
+        for obj_hash, obj_data in self.load_many(hashes, executor).items():
+            if isinstance(obj_data, Exception):
+                loaded[obj_hash] = obj_data
+                continue
+            try:
+                loaded[obj_hash] = frozenset(extract_references(obj_data))
+            except Exception as e:
+                loaded[obj_hash] = e
+        return loaded
     
     def verify_gc_safety(self, roots: Set[str]) -> List[str]:
         """
@@ -189,37 +459,85 @@ class IncrementalGC:
         self.gc = gc
         self._reachable_cache: Set[str] = set()
         self._cache_valid = False
+        # Mark in progress: roots being traced, objects still to visit and
+        # objects visited or queued (so none is queued twice)
+        self._mark_roots: Optional[frozenset] = None
+        self._mark_queue: Optional[deque] = None
+        self._mark_seen: Set[str] = set()
+        # Unreachable objects not yet swept, once sweeping has started
+        self._sweep_queue: Optional[deque] = None
     
     def invalidate_cache(self) -> None:
-        """Invalidate the reachability cache."""
+        """Invalidate the reachability cache and any mark in progress."""
         self._cache_valid = False
         self._reachable_cache = set()
+        self._mark_roots = None
+        self._mark_queue = None
+        self._mark_seen = set()
+        self._sweep_queue = None
     
     def mark_batch(self, roots: Set[str], batch_size: int = 1000) -> dict:
         """
         Mark a batch of objects as reachable.
         
+        Each call visits at most batch_size objects, continuing the
+        breadth-first trace left by the previous call. A new trace is
+        started when none is in progress or the roots have changed. The
+        reachable set becomes usable by sweep_batch once the trace is
+        complete.
+        
         Returns dict with progress information.
         """
-        result = {
-            'marked': 0,
-            'remaining': 0,
-            'complete': False,
-        }
+        roots = frozenset(roots)
+        if self._mark_queue is None or roots != self._mark_roots:
+            self.invalidate_cache()
+            self._mark_roots = roots
+            self._mark_queue = deque(roots)
+            self._mark_seen = set(roots)
+        
+        reachable = self._reachable_cache
+        queue = self._mark_queue
+        seen = self._mark_seen
+        processed = 0
         
-        reachable = self.gc._mark_reachable(roots)
-        self._reachable_cache = reachable
-        self._cache_valid = True
+        while queue and processed < batch_size:
+            obj_hash = queue.popleft()
+            if not self.gc.exists(obj_hash):
+                continue
+            
+            reachable.add(obj_hash)
+            processed += 1
+            
+            try:
+                refs = self.gc.references(obj_hash)
+            except Exception:
+                # Unloadable objects stay reachable but are not traversed
+                continue
+            for ref in refs:
+                if ref not in seen:
+                    seen.add(ref)
+                    queue.append(ref)
         
-        result['marked'] = len(reachable)
-        result['complete'] = True
+        complete = not queue
+        if complete:
+            self._mark_queue = None
+            self._mark_seen = set()
+            self._cache_valid = True
         
-        return result
+        return {
+            'marked': len(reachable),
+            'remaining': len(queue),
+            'complete': complete,
+        }
     
     def sweep_batch(self, batch_size: int = 100) -> dict:
         """
         Sweep a batch of unreachable objects.
         
+        The unreachable objects are listed once, on the first call after
+        marking completes; each call then deletes up to batch_size of
+        them, continuing where the previous call stopped.
+        
         Returns dict with progress information.
         """
         if not self._cache_valid:
@@ -233,22 +551,25 @@ class IncrementalGC:
             'errors': [],
         }
         
-        # Find unreachable objects
-        all_objects = set(self.gc.list_all())
-        unreachable = all_objects - self._reachable_cache
+        if self._sweep_queue is None:
+            reachable = self._reachable_cache
+            self._sweep_queue = deque({
+                obj_hash for obj_hash in self.gc.list_all()
+                if obj_hash not in reachable
+            })
         
-        # Delete in batches
-        count = 0
-        for obj_hash in unreachable:
-            if count >= batch_size:
-                break
-            
-            if obj_hash not in self._reachable_cache:  # Safety check
-                try:
-                    if self.gc.delete_object(obj_hash):
-                        result['deleted'] += 1
-                        count += 1
-                except Exception as e:
-                    result['errors'].append(f"Failed to delete {obj_hash}: {e}")
+        queue = self._sweep_queue
+        batch = [
+            obj_hash
+            for obj_hash in (queue.popleft() for _ in range(min(batch_size, len(queue))))
+            if obj_hash not in self._reachable_cache  # Safety check
+        ]
+        
+        for obj_hash, status, error in self.gc.sweep(batch):
+            if status == 'deleted':
+                result['deleted'] += 1
+            elif status == 'error':
+                result['errors'].append(f"Failed to delete {obj_hash}: {error}")
         
+        result['remaining'] = len(queue)
         return result
@@ -5,11 +5,23 @@ Implements content-addressed storage with directory sharding.
 """
 
 import os
+import threading
+import weakref
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 from ..errors import StorageError
-from ..integrity.hashing import get_hash_prefix
+from ..integrity.hashing import DIGEST_SIZE, compute_hash, get_hash_prefix, is_valid_hash
+
+
+# Whether object files can be reached relative to a directory descriptor
+_DIR_FD_SUPPORTED = (
+    hasattr(os, 'O_DIRECTORY')
+    and {os.open, os.stat, os.unlink} <= os.supports_dir_fd
+)
+
+# Flags for opening object files; O_BINARY only exists on Windows
+_READ_FLAGS = os.O_RDONLY | getattr(os, 'O_BINARY', 0)
 
 
 class StorageLayout:
@@ -25,14 +37,38 @@ class StorageLayout:
                 <name>           # named snapshot references
             refs/
                 <ref_name>       # additional references (tags, etc)
+            objects.db           # small objects (SQLite backend only)
+            objects.zdict        # zstd dictionary for compressed objects
+            objects.zdict.<id>   # every trained dictionary, by zstd dict ID
+            cache/
+                gc/
+                    <hash>       # persisted GC closure of a snapshot
+                verify/
+                    <hash>       # fingerprints of a verified snapshot closure
+                types            # type of each object file, for statistics
+                exists           # saved Bloom filter of stored hashes
     """
     
     def __init__(self, store_root: Path):
         """Initialize storage layout at given root."""
         self.store_root = Path(store_root).resolve()
         self.objects_dir = self.store_root / "objects"
+        # String form of objects_dir, for building paths by concatenation
+        self._objects_prefix = str(self.objects_dir) + os.sep
         self.snapshots_dir = self.store_root / "snapshots"
         self.refs_dir = self.store_root / "refs"
+        self.objects_db_path = self.store_root / "objects.db"
+        self.zstd_dict_path = self.store_root / "objects.zdict"
+        self.gc_cache_dir = self.store_root / "cache" / "gc"
+        self.verify_cache_dir = self.store_root / "cache" / "verify"
+        self.type_index_path = self.store_root / "cache" / "types"
+        self.existence_filter_path = self.store_root / "cache" / "exists"
+        # Prefix directories known to exist; the store never removes them
+        self._known_prefixes: set[str] = set()
+        # Open descriptor of objects_dir, see objects_dir_fd()
+        self._objects_fd: Optional[int] = None
+        self._objects_fd_closer: Optional[weakref.finalize] = None
+        self._objects_fd_lock = threading.Lock()
     
     def initialize(self) -> None:
         """
@@ -48,15 +84,68 @@ class StorageLayout:
             self.refs_dir.mkdir(exist_ok=True)
         except OSError as e:
             raise StorageError("initialize", str(self.store_root), e)
+        
+        # The objects directory may have been recreated
+        self._known_prefixes.clear()
+        self.close()
+    
+    def close(self) -> None:
+        """Close the objects directory descriptor, if open."""
+        with self._objects_fd_lock:
+            if self._objects_fd_closer is not None:
+                self._objects_fd_closer()
+            self._objects_fd = None
+            self._objects_fd_closer = None
+    
+    def objects_dir_fd(self) -> Optional[int]:
+        """
+        Get a descriptor of objects_dir for dir_fd-relative syscalls.
+        
+        Resolving an object's path from it skips the lookup of every
+        directory above the shard on each stat, open or unlink. It is
+        opened on first use and closed by close() or when the layout is
+        discarded. Returns None where dir_fd is unsupported (Windows)
+        or the directory cannot be opened yet; callers then use the
+        absolute path.
+        """
+        if self._objects_fd is not None:
+            return self._objects_fd
+        if not _DIR_FD_SUPPORTED:
+            return None
+        
+        with self._objects_fd_lock:
+            if self._objects_fd is None:
+                try:
+                    fd = os.open(self.objects_dir, os.O_RDONLY | os.O_DIRECTORY)
+                except OSError:
+                    return None
+                self._objects_fd_closer = weakref.finalize(self, os.close, fd)
+                self._objects_fd = fd
+            return self._objects_fd
     
     def get_object_path(self, obj_hash: str) -> Path:
         """
         Get filesystem path for an object by its hash.
         
-        Uses 2-character prefix for directory sharding.
+        Uses 2-character prefix for directory sharding. Hot paths that
+        only hand the path to os use get_object_path_str instead.
+        
+        Raises ValueError if obj_hash is not a valid hash.
         """
-        prefix = get_hash_prefix(obj_hash, 2)
-        return self.objects_dir / prefix / obj_hash
+        self._check_hash(obj_hash)
+        return self.objects_dir.joinpath(obj_hash[:2], obj_hash)
+    
+    def get_object_path_str(self, obj_hash: str) -> str:
+        """
+        Get filesystem path for an object as a string.
+        
+        Built by plain concatenation, without creating Path objects; for
+        hot paths that pass the path straight to os or open().
+        
+        Raises ValueError if obj_hash is not a valid hash.
+        """
+        self._check_hash(obj_hash)
+        return self._objects_prefix + obj_hash[:2] + os.sep + obj_hash
     
     def get_snapshot_ref_path(self, name: str) -> Path:
         """Get path for a named snapshot reference."""
@@ -64,19 +153,36 @@ class StorageLayout:
         safe_name = self._sanitize_name(name)
         return self.snapshots_dir / safe_name
     
+    def get_gc_cache_path(self, root_hash: str) -> Path:
+        """Get path for the persisted GC closure of a root object."""
+        return self.gc_cache_dir / self._sanitize_name(root_hash)
+    
+    def get_verify_cache_path(self, snapshot_hash: str) -> Path:
+        """Get path for the verification index entry of a snapshot."""
+        return self.verify_cache_dir / self._sanitize_name(snapshot_hash)
+    
     def get_ref_path(self, ref_name: str) -> Path:
         """Get path for a named reference."""
         safe_name = self._sanitize_name(ref_name)
         return self.refs_dir / safe_name
     
     def ensure_object_directory(self, obj_hash: str) -> None:
-        """Ensure the directory for an object exists."""
+        """
+        Ensure the directory for an object exists.
+        
+        Each prefix directory is created at most once per layout; later
+        calls for the same prefix make no syscall.
+        """
         prefix = get_hash_prefix(obj_hash, 2)
+        if prefix in self._known_prefixes:
+            return
+        
         prefix_dir = self.objects_dir / prefix
         try:
             prefix_dir.mkdir(exist_ok=True)
         except OSError as e:
             raise StorageError("mkdir", str(prefix_dir), e)
+        self._known_prefixes.add(prefix)
     
     def list_all_objects(self) -> list[str]:
         """
@@ -84,43 +190,155 @@ class StorageLayout:
         
         Scans all prefix directories.
         """
-        objects = []
+        return list(self.iter_all_objects())
+    
+    def iter_all_objects(self) -> Iterator[str]:
+        """
+        Iterate over all object hashes in the store.
         
-        if not self.objects_dir.exists():
-            return objects
+        Scans prefix directories lazily, one directory at a time.
+        """
+        for entry in self._iter_object_entries():
+            yield entry.name
+    
+    def _iter_object_entries(self) -> Iterator[os.DirEntry]:
+        """
+        Iterate over the directory entries of all object files.
         
+        Uses os.scandir, whose entries carry the file type from the
+        directory listing, so no extra stat is needed per entry. Hidden
+        entries are skipped; these include the temporary files of writes
+        in progress, which must not be mistaken for (unreachable) objects.
+        """
         try:
-            for prefix_dir in self.objects_dir.iterdir():
-                if not prefix_dir.is_dir():
-                    continue
-                
-                for obj_file in prefix_dir.iterdir():
-                    if obj_file.is_file():
-                        objects.append(obj_file.name)
+            with os.scandir(self.objects_dir) as prefix_entries:
+                prefix_dirs = [
+                    entry.path for entry in prefix_entries
+                    if not entry.name.startswith('.') and entry.is_dir()
+                ]
+            
+            for prefix_dir in prefix_dirs:
+                try:
+                    with os.scandir(prefix_dir) as entries:
+                        for entry in entries:
+                            if not entry.name.startswith('.') and entry.is_file():
+                                yield entry
+                except FileNotFoundError:
+                    continue  # Removed while scanning
         
+        except FileNotFoundError:
+            return
         except OSError as e:
             raise StorageError("list_objects", str(self.objects_dir), e)
-        
-        return objects
     
     def list_snapshot_refs(self) -> list[str]:
         """List all named snapshot references."""
-        if not self.snapshots_dir.exists():
-            return []
-        
         try:
-            return [f.name for f in self.snapshots_dir.iterdir() if f.is_file()]
+            with os.scandir(self.snapshots_dir) as entries:
+                return [
+                    entry.name for entry in entries
+                    if not entry.name.startswith('.') and entry.is_file()
+                ]
+        except FileNotFoundError:
+            return []
         except OSError as e:
             raise StorageError("list_snapshots", str(self.snapshots_dir), e)
     
     def object_exists(self, obj_hash: str) -> bool:
         """Check if an object exists in storage."""
-        return self.get_object_path(obj_hash).exists()
+        if not is_valid_hash(obj_hash):
+            return False
+        try:
+            self.stat_object(obj_hash)
+        except OSError:
+            return False
+        return True
+    
+    def stat_object(self, obj_hash: str) -> os.stat_result:
+        """
+        Stat an object file, relative to objects_dir_fd() if open.
+        
+        Raises ValueError if obj_hash is invalid, OSError if the stat fails.
+        """
+        self._check_hash(obj_hash)
+        dir_fd = self.objects_dir_fd()
+        if dir_fd is None:
+            return os.stat(self._objects_prefix + obj_hash[:2] + os.sep + obj_hash)
+        return os.stat(obj_hash[:2] + os.sep + obj_hash, dir_fd=dir_fd)
+    
+    def open_object(self, obj_hash: str) -> int:
+        """
+        Open an object file for reading, relative to objects_dir_fd().
+        
+        Returns a file descriptor the caller must close.
+        Raises ValueError if obj_hash is invalid, OSError if it cannot be opened.
+        """
+        self._check_hash(obj_hash)
+        dir_fd = self.objects_dir_fd()
+        if dir_fd is None:
+            return os.open(self._objects_prefix + obj_hash[:2] + os.sep + obj_hash, _READ_FLAGS)
+        return os.open(obj_hash[:2] + os.sep + obj_hash, _READ_FLAGS, dir_fd=dir_fd)
+    
+    def unlink_object(self, obj_hash: str) -> None:
+        """
+        Remove an object file, relative to objects_dir_fd().
+        
+        Raises ValueError if obj_hash is invalid, OSError if it cannot be removed.
+        """
+        self._check_hash(obj_hash)
+        dir_fd = self.objects_dir_fd()
+        if dir_fd is None:
+            os.unlink(self._objects_prefix + obj_hash[:2] + os.sep + obj_hash)
+        else:
+            os.unlink(obj_hash[:2] + os.sep + obj_hash, dir_fd=dir_fd)
     
     def snapshot_ref_exists(self, name: str) -> bool:
         """Check if a named snapshot reference exists."""
         return self.get_snapshot_ref_path(name).exists()
     
+    def read_cache_file(self, path: Path) -> Optional[bytes]:
+        """
+        Read a cache file written by write_cache_file.
+        
+        Returns its body, or None if the file is absent, unreadable or
+        does not match its checksum.
+        """
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        
+        checksum, body = data[:DIGEST_SIZE], data[DIGEST_SIZE:]
+        if len(checksum) != DIGEST_SIZE or compute_hash(body) != checksum.hex():
+            return None
+        return body
+    
+    def write_cache_file(self, path: Path, body: bytes) -> None:
+        """
+        Atomically write a cache file: a checksum digest, then body.
+        
+        Caches can always be rebuilt, so failures are ignored.
+        """
+        checksum = bytes.fromhex(compute_hash(body))
+        temp_path = path.with_name(path.name + '.tmp')
+        
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(checksum + body)
+            os.replace(temp_path, path)
+        except OSError:
+            pass
+    
+    @staticmethod
+    def _check_hash(obj_hash: str) -> None:
+        """
+        Reject anything that is not a hex hash before it is made a path.
+        
+        Raises ValueError if obj_hash is invalid.
+        """
+        if not is_valid_hash(obj_hash):
+            raise ValueError(f"Invalid object hash: {obj_hash!r}")
+    
     @staticmethod
     def _sanitize_name(name: str) -> str:
         """
@@ -152,15 +370,14 @@ class StorageLayout:
             'snapshot_refs': 0,
         }
         
-        # Count objects and size
-        try:
-            for obj_hash in self.list_all_objects():
-                obj_path = self.get_object_path(obj_hash)
-                if obj_path.exists():
-                    stats['total_objects'] += 1
-                    stats['total_size_bytes'] += obj_path.stat().st_size
-        except OSError:
-            pass  # Best effort
+        # Count objects and size in the same directory scan
+        for entry in self._iter_object_entries():
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                continue  # Best effort
+            stats['total_objects'] += 1
+            stats['total_size_bytes'] += size
         
         # Count snapshot refs
         try:
@@ -4,38 +4,116 @@ Content-addressed object storage.
 Provides immutable object storage with content addressing.
 """
 
-import json
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Set
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+import errno
 import os
 import tempfile
+import threading
 
 from ..errors import (
+    SnapshotStoreError,
     ObjectNotFoundError,
     ObjectCorruptedError,
     StorageError,
     InvalidObjectError,
 )
-from ..integrity.hashing import compute_hash, compute_object_hash
-from ..integrity.canonical import canonical_json
+from ..integrity.hashing import (
+    DIGEST_SIZE,
+    HASH_ALGORITHM,
+    compute_file_hash,
+    compute_hash,
+    hash_to_digest,
+    intern_hash,
+    is_valid_hash,
+    iter_digest_hashes,
+)
+from ..integrity.canonical import canonical_json, decode_json
 from ..integrity.verification import (
+    extract_encoded_references,
+    extract_references,
     verify_object_integrity,
     verify_object_structure,
 )
+from .blob_payload import (
+    blob_payload_hash,
+    blob_payload_to_object,
+    decode_blob_payload,
+    encode_blob_payload,
+    is_blob_payload,
+)
+from .bloom import BloomFilter
+from .compression import ObjectCompressor
 from .layout import StorageLayout
 
 
+# Batches of at least this many objects are written on a thread pool
+PARALLEL_WRITE_THRESHOLD = 64
+
+# Maximum number of object files remembered as verified by put_encoded
+VERIFIED_CACHE_SIZE = 4096
+
+# Shards queried for at least this many hashes are listed once with
+# os.scandir instead of checking each object file separately
+SCAN_SHARD_THRESHOLD = 8
+
+# Errors meaning O_TMPFILE files cannot be created or linked into place
+# here (old kernel, unsupported filesystem, or a sandboxed /proc)
+_TMPFILE_UNSUPPORTED = frozenset({
+    errno.EACCES, errno.EINVAL, errno.EISDIR, errno.ENOENT,
+    errno.EOPNOTSUPP, errno.EPERM, errno.EXDEV,
+})
+
+# Compact integer codes for object types
+TYPE_CODES = {
+    'blob': 0,
+    'bundle': 1,
+    'snapshot': 2,
+    'tree': 3,
+}
+_TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+
 class ObjectStore:
     """
     Content-addressed object store with immutable objects.
     
     Objects are stored by their content hash.
     Once written, objects never change.
+    
+    Most objects are stored as their canonical encoding. Blobs written
+    with put_blob are stored as raw payloads (see blob_payload) under
+    the same hash, avoiding the base64 inflation of their content.
     """
     
     def __init__(self, layout: StorageLayout):
         """Initialize object store with given layout."""
         self.layout = layout
+        # Held by the thread running write_batch() for the whole block
+        self._batch_lock = threading.RLock()
+        # Shard directories written during an open write_batch()
+        self._pending_dirs: Optional[Set[str]] = None
+        # Whether a reference was written in the open refs_batch(), or
+        # None outside one
+        self._refs_written: Optional[bool] = None
+        # Set by enable_existence_filter()
+        self._existence_filter: Optional[BloomFilter] = None
+        # _contents_stamp() from just before the filter was built or
+        # loaded, when it last matched the stored objects
+        self._filter_stamp: Optional[bytes] = None
+        # Serializes filter updates from concurrent puts
+        self._existence_lock = threading.Lock()
+        # obj_hash -> file fingerprint when last found intact by a put,
+        # in LRU order; lets repeated puts skip re-reading the file
+        self._verified_files: OrderedDict = OrderedDict()
+        self._verified_lock = threading.Lock()
+        self.compressor = ObjectCompressor(layout.zstd_dict_path)
+        # Cleared once writing through O_TMPFILE proves unsupported
+        self._use_tmpfile = hasattr(os, 'O_TMPFILE') and os.path.isdir('/proc/self/fd')
     
     def put_object(self, obj_data: dict) -> str:
         """
@@ -48,22 +126,83 @@ class ObjectStore:
         
         Returns the content hash.
         """
+        obj_hash, canonical_bytes = self.encode_object(obj_data)
+        return self.put_encoded(obj_data['type'], obj_hash, canonical_bytes)
+    
+    def put_model(self, model) -> str:
+        """
+        Store a Bundle, Snapshot or Tree model and return its hash.
+        
+        The model's cached canonical encoding and hash are reused, so a
+        model that was already hashed is not encoded a second time.
+        """
+        return self.put_encoded(*self.encode_model(model))
+    
+    @staticmethod
+    def encode_model(model) -> Tuple[str, str, bytes]:
+        """
+        Validate a model and get its (type, hash, canonical bytes).
+        
+        The result is what put_encoded and put_encoded_many accept. Like
+        encode_object it touches no storage.
+        """
+        obj_data = model.to_dict()
+        verify_object_structure(obj_data)
+        return obj_data['type'], model.compute_hash(), model.canonical_bytes()
+    
+    def put_blob(self, data: bytes, metadata: Optional[dict] = None) -> str:
+        """
+        Store blob content as a raw payload and return the blob's hash.
+        
+        The hash is the one put_object would compute for the blob's
+        canonical dictionary, so both ways of storing a blob agree.
+        
+        Raises InvalidObjectError if metadata is not a dictionary.
+        """
+        payload = encode_blob_payload(data, metadata)
+        obj_hash = blob_payload_hash(payload)
+        return self.put_encoded('blob', obj_hash, payload)
+    
+    @staticmethod
+    def encode_object(obj_data: dict) -> Tuple[str, bytes]:
+        """
+        Validate an object and compute its canonical encoding and hash.
+        
+        Touches no storage, so it may run on worker threads ahead of
+        put_encoded.
+        
+        Returns (hash, canonical bytes).
+        """
         # Verify object structure
         verify_object_structure(obj_data)
         
         # Compute hash from canonical representation
-        obj_hash = compute_object_hash(obj_data)
+        canonical_bytes = canonical_json(obj_data)
+        return compute_hash(canonical_bytes), canonical_bytes
+    
+    def put_encoded(self, obj_type: str, obj_hash: str, canonical_bytes: bytes) -> str:
+        """
+        Store an object already processed by encode_object.
         
+        Returns the content hash.
+        """
         # Check if already exists (idempotent)
-        obj_path = self.layout.get_object_path(obj_hash)
-        if obj_path.exists():
+        obj_path = self.layout.get_object_path_str(obj_hash)
+        fingerprint = self._file_fingerprint(obj_hash)
+        if fingerprint is not None:
+            # Unchanged since a previous put found it intact
+            if self._known_intact(obj_hash, fingerprint):
+                return obj_hash
+            
             # Verify existing object integrity
             existing_data = self._read_object_file(obj_path)
             try:
-                existing_obj = json.loads(existing_data.decode('utf-8'))
-                verify_object_integrity(existing_obj, obj_hash)
+                existing_data = self.compressor.decompress(existing_data)
+                if self._payload_hash(existing_data) != obj_hash:
+                    verify_object_integrity(self._decode_object(existing_data), obj_hash)
+                self._remember_verified(obj_hash, fingerprint)
                 return obj_hash  # Already exists and valid
-            except (json.JSONDecodeError, ObjectCorruptedError):
+            except (ValueError, ObjectCorruptedError):
                 # Existing file is corrupted, will overwrite
                 pass
         
@@ -71,41 +210,547 @@ class ObjectStore:
         self.layout.ensure_object_directory(obj_hash)
         
         # Write atomically using temp file + rename
-        canonical_bytes = canonical_json(obj_data)
-        self._write_object_atomic(obj_path, canonical_bytes)
+        self._write_object_atomic(obj_path, self.compressor.compress(canonical_bytes))
+        
+        pending_dirs = self._pending_dirs
+        if pending_dirs is not None:
+            pending_dirs.add(os.path.dirname(obj_path))
+        
+        self._record_existence(obj_hash)
         
         return obj_hash
     
+    def put_encoded_many(self, items: List[Tuple[str, str, bytes]]) -> List[str]:
+        """
+        Store several encoded objects as one group commit.
+        
+        items are (type, hash, encoded bytes) tuples as produced by
+        encode_object. Large groups are written on a thread pool, since
+        hashing existing files and file I/O release the GIL.
+        
+        Returns the content hashes in the same order as the input.
+        """
+        with self.write_batch():
+            if len(items) >= PARALLEL_WRITE_THRESHOLD:
+                with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+                    return list(executor.map(lambda item: self.put_encoded(*item), items))
+            return [self.put_encoded(*item) for item in items]
+    
+    def put_objects_batch(self, objs: List[dict]) -> List[str]:
+        """
+        Store several objects as one group commit.
+        
+        Equivalent to calling put_object for each object, but the
+        directory entries are flushed once per shard directory instead
+        of once per object. Every object is validated and encoded before
+        any is stored; large batches are encoded and written on a thread
+        pool through put_encoded_many.
+        
+        Returns the content hashes in the same order as the input.
+        """
+        if len(objs) >= PARALLEL_WRITE_THRESHOLD:
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+                encoded = list(executor.map(self.encode_object, objs))
+        else:
+            encoded = [self.encode_object(obj_data) for obj_data in objs]
+        
+        return self.put_encoded_many([
+            (obj_data['type'], obj_hash, canonical_bytes)
+            for obj_data, (obj_hash, canonical_bytes) in zip(objs, encoded)
+        ])
+    
+    @contextmanager
+    def write_batch(self) -> Iterator[None]:
+        """
+        Group all puts made inside the block into one commit.
+        
+        Objects are written and renamed into place as usual; when the
+        block exits, each touched shard directory is fsynced once so the
+        new entries are durable together. Nested batches in the same
+        thread join the outermost one; batches in other threads wait for
+        it to finish.
+        """
+        with self._batch_lock:
+            if self._pending_dirs is not None:
+                yield
+                return
+            
+            pending_dirs = self._pending_dirs = set()
+            try:
+                yield
+            finally:
+                self._pending_dirs = None
+            for dir_path in pending_dirs:
+                self._fsync_directory(dir_path)
+    
     def get_object(self, obj_hash: str, verify: bool = True) -> dict:
         """
         Retrieve an object by its hash.
         
         If verify=True (default), verifies integrity before returning.
+        The stored bytes are hashed before they are decoded; the object
+        is only re-encoded and checked field by field when they are not
+        its canonical encoding. Bytes that cannot be decoded at all are
+        reported as corrupted.
         
         Raises ObjectNotFoundError if object doesn't exist.
         Raises ObjectCorruptedError if verification fails.
         """
-        obj_path = self.layout.get_object_path(obj_hash)
+        if not verify:
+            return self.load_object(obj_hash)[0]
+        return self.load_verified_object(obj_hash)[0]
+    
+    def load_verified_object(self, obj_hash: str) -> Tuple[dict, bytes]:
+        """
+        Load and verify an object as get_object(verify=True) does.
         
-        if not obj_path.exists():
-            raise ObjectNotFoundError(obj_hash)
+        Returns (object, stored bytes), like load_object; the bytes are
+        known to encode an object with hash obj_hash.
         
+        Raises ObjectNotFoundError if object doesn't exist.
+        Raises ObjectCorruptedError if verification fails.
+        """
+        data = self.read_payload(obj_hash)
+        actual = self._payload_hash(data)
         try:
-            data = self._read_object_file(obj_path)
-            obj_data = json.loads(data.decode('utf-8'))
-        except (OSError, json.JSONDecodeError) as e:
-            raise StorageError("read_object", str(obj_path), e)
+            obj_data = self._decode_object(data)
+        except ValueError as e:
+            if actual == obj_hash:
+                raise StorageError("read_object", obj_hash, e)
+            raise ObjectCorruptedError(obj_hash, obj_hash, actual or 'invalid')
         
-        if verify:
+        if actual != obj_hash:
+            if is_blob_payload(data):
+                raise ObjectCorruptedError(obj_hash, obj_hash, actual or 'invalid')
+            # An equivalent but non-canonical encoding is checked in full
             verify_object_structure(obj_data)
             verify_object_integrity(obj_data, obj_hash)
         
-        return obj_data
+        return obj_data, data
+    
+    def load_object(self, obj_hash: str) -> Tuple[dict, bytes]:
+        """
+        Load an object without verifying it.
+        
+        Returns (object, stored bytes), the bytes being the uncompressed
+        payload the object was decoded from. Callers can verify the
+        object by hashing them (see verify_object_integrity_bytes);
+        raw blob payloads hash to their name through _payload_hash.
+        
+        Raises ObjectNotFoundError if object doesn't exist.
+        """
+        data = self.read_payload(obj_hash)
+        
+        try:
+            return self._decode_object(data), data
+        except ValueError as e:
+            raise StorageError("read_object", obj_hash, e)
     
-    def has_object(self, obj_hash: str) -> bool:
-        """Check if an object exists in the store."""
+    def load_many(
+        self,
+        hashes: List[str],
+        executor: Optional[Executor] = None
+    ) -> Dict[str, Union[dict, Exception]]:
+        """
+        Load several objects without verifying them.
+        
+        With an executor the objects are read concurrently; file reads
+        release the GIL.
+        
+        Returns a dict mapping the hash of each existing object to its
+        dictionary, or to the exception raised loading it; hashes of
+        missing objects are left out.
+        """
+        def load(obj_hash: str) -> Union[dict, Exception, None]:
+            try:
+                return self.get_object(obj_hash, verify=False)
+            except ObjectNotFoundError:
+                return None
+            except Exception as e:
+                return e
+        
+        loaded = executor.map(load, hashes) if executor is not None else map(load, hashes)
+        return {
+            obj_hash: obj_data
+            for obj_hash, obj_data in zip(hashes, loaded)
+            if obj_data is not None
+        }
+    
+    def get_object_refs(self, obj_hash: str) -> Set[str]:
+        """
+        Get the hashes an object references, without verifying it.
+        
+        References are matched in the stored bytes (see
+        extract_encoded_references), so the object is only decoded when
+        they are not a canonical encoding.
+        
+        Raises ObjectNotFoundError if object doesn't exist.
+        Raises StorageError if the stored bytes cannot be decoded.
+        """
+        return self._payload_references(obj_hash, self.read_payload(obj_hash))
+    
+    def get_object_refs_many(
+        self,
+        hashes: List[str],
+        executor: Optional[Executor] = None
+    ) -> Dict[str, Union[Set[str], Exception]]:
+        """
+        Get the references of several objects, as get_object_refs does.
+        
+        Returns a dict like load_many's, mapping the hash of each
+        existing object to its references or to the exception raised
+        reading them.
+        """
+        def load(obj_hash: str) -> Union[Set[str], Exception, None]:
+            try:
+                return self.get_object_refs(obj_hash)
+            except ObjectNotFoundError:
+                return None
+            except Exception as e:
+                return e
+        
+        loaded = executor.map(load, hashes) if executor is not None else map(load, hashes)
+        return {
+            obj_hash: refs
+            for obj_hash, refs in zip(hashes, loaded)
+            if refs is not None
+        }
+    
+    def get_blob_content(self, obj_hash: str) -> Optional[Tuple[bytes, dict]]:
+        """
+        Read and verify a blob stored as a raw payload.
+        
+        Returns (content, metadata), or None if the object is not stored
+        as a raw blob payload (e.g. a blob stored with put_object).
+        
+        Raises ObjectNotFoundError if object doesn't exist.
+        Raises ObjectCorruptedError if verification fails.
+        """
+        data = self.read_payload(obj_hash)
+        if not is_blob_payload(data):
+            return None
+        
+        actual = self._payload_hash(data)
+        if actual != obj_hash:
+            raise ObjectCorruptedError(obj_hash, obj_hash, actual or 'invalid')
+        
+        content, metadata = decode_blob_payload(data)
+        return bytes(content), metadata
+    
+    def read_payload(self, obj_hash: str) -> bytes:
+        """
+        Read the uncompressed stored bytes of an object.
+        
+        These are either its canonical encoding or a raw blob payload.
+        
+        Raises ObjectNotFoundError if object doesn't exist.
+        """
+        if not is_valid_hash(obj_hash):
+            raise ObjectNotFoundError(obj_hash)
+        
+        # Opening reports a missing object itself, so no separate stat
+        try:
+            fd = self.layout.open_object(obj_hash)
+        except FileNotFoundError:
+            raise ObjectNotFoundError(obj_hash)
+        except OSError as e:
+            raise StorageError("read_file", self.layout.get_object_path_str(obj_hash), e)
+        
+        try:
+            with open(fd, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise StorageError("read_file", self.layout.get_object_path_str(obj_hash), e)
+        
+        try:
+            return self.compressor.decompress(data)
+        except ValueError as e:
+            raise StorageError("read_object", self.layout.get_object_path_str(obj_hash), e)
+    
+    def verify_object(self, obj_hash: str) -> bool:
+        """
+        Verify an object's integrity without decoding it.
+        
+        Objects are stored as their canonical encoding, so an intact file
+        hashes to its name byte-for-byte. Compressed objects and raw blob
+        payloads are hashed after reading them; only when that hash
+        differs is the object decoded, to report what is wrong with it.
+        
+        Returns True if valid.
+        Raises ObjectNotFoundError if object doesn't exist.
+        Raises ObjectCorruptedError or InvalidObjectError if corrupted.
+        """
+        if not is_valid_hash(obj_hash):
+            raise ObjectNotFoundError(obj_hash)
+        
+        try:
+            if compute_file_hash(self.layout.get_object_path_str(obj_hash)) == obj_hash:
+                return True
+        except OSError:
+            pass
+        
+        if self._payload_hash(self.read_payload(obj_hash)) != obj_hash:
+            self.get_object(obj_hash, verify=True)
+        return True
+    
+    def verify_many(
+        self,
+        hashes: List[str],
+        executor: Optional[Executor] = None
+    ) -> List[Optional[Exception]]:
+        """
+        Verify several objects.
+        
+        Returns, for each hash in order, the exception verify_object
+        raised for it, or None if the object is intact. With an executor
+        the objects are verified concurrently.
+        """
+        mapper = executor.map if executor is not None else map
+        return list(mapper(self._verification_error, hashes))
+    
+    def _verification_error(self, obj_hash: str) -> Optional[Exception]:
+        """Verify one object, returning the failure instead of raising."""
+        try:
+            self.verify_object(obj_hash)
+            return None
+        except Exception as e:
+            return e
+    
+    def train_compression_dictionary(self, max_samples: int = 1000) -> None:
+        """
+        Train a zstd dictionary from up to max_samples stored objects.
+        
+        Objects written afterwards are compressed with it; existing
+        objects are left as they are and remain readable.
+        
+        Raises StorageError if zstandard is not installed or training fails.
+        """
+        samples = []
+        for obj_hash in islice(self.iter_all_objects(), max_samples):
+            try:
+                obj_data = self.get_object(obj_hash, verify=False)
+            except SnapshotStoreError:
+                continue
+            samples.append(canonical_json(obj_data))
+        
+        self.compressor.train(samples)
+    
+    def object_fingerprint(self, obj_hash: str) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Get (size, mtime_ns, ctime_ns, inode) of an object's file.
+        
+        The mtime can be set back after a rewrite, but the ctime is
+        updated by the kernel on every change and cannot be set from
+        userspace, so a rewrite changes it even in place. Returns None
+        if the object has no file.
+        """
+        if not is_valid_hash(obj_hash):
+            return None
+        return self._file_fingerprint(obj_hash)
+    
+    def _file_fingerprint(self, obj_hash: str) -> Optional[Tuple[int, int, int, int]]:
+        """Get the object_fingerprint of an object file, or None if it is missing."""
+        try:
+            st = self.layout.stat_object(obj_hash)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino
+    
+    def _known_intact(
+        self,
+        obj_hash: str,
+        fingerprint: Optional[Tuple[int, int, int, int]] = None
+    ) -> bool:
+        """
+        Check whether a put found an object's file intact and it is unchanged.
+        
+        fingerprint is the file's current fingerprint, if already taken.
+        """
+        if fingerprint is None:
+            if not is_valid_hash(obj_hash):
+                return False
+            fingerprint = self._file_fingerprint(obj_hash)
+            if fingerprint is None:
+                return False
+        
+        with self._verified_lock:
+            if self._verified_files.get(obj_hash) != fingerprint:
+                return False
+            self._verified_files.move_to_end(obj_hash)
+            return True
+    
+    def _remember_verified(self, obj_hash: str, fingerprint: Tuple[int, int, int, int]) -> None:
+        """Record an object file found intact, evicting the oldest entry."""
+        with self._verified_lock:
+            self._verified_files[obj_hash] = fingerprint
+            self._verified_files.move_to_end(obj_hash)
+            if len(self._verified_files) > VERIFIED_CACHE_SIZE:
+                self._verified_files.popitem(last=False)
+    
+    def has_object(self, obj_hash: str, use_filter: bool = True) -> bool:
+        """
+        Check if an object exists in the store.
+        
+        With use_filter=False the existence filter is bypassed, for
+        checks where a false negative is unsafe, such as deciding what
+        garbage collection may delete.
+        """
+        if use_filter and self._existence_filter is not None and obj_hash not in self._existence_filter:
+            return False
         return self.layout.object_exists(obj_hash)
     
+    def exists_many(self, hashes: Iterable[str]) -> Set[str]:
+        """
+        Return the subset of hashes that exist in the store.
+        
+        Hashes are grouped by shard directory. Shards queried for many
+        hashes are listed once; others are checked hash by hash. The
+        existence filter is not consulted, so verification never reports
+        an object written by another instance as missing.
+        """
+        by_prefix: Dict[str, List[str]] = {}
+        for obj_hash in set(hashes):
+            if is_valid_hash(obj_hash):
+                by_prefix.setdefault(obj_hash[:2], []).append(obj_hash)
+        
+        found = set()
+        for prefix, group in by_prefix.items():
+            if len(group) < SCAN_SHARD_THRESHOLD:
+                found.update(h for h in group if self.layout.object_exists(h))
+                continue
+            
+            try:
+                with os.scandir(self.layout.objects_dir / prefix) as entries:
+                    names = {entry.name for entry in entries}
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                raise StorageError("scan_objects", prefix, e)
+            found.update(names.intersection(group))
+        
+        return found
+    
+    def enable_existence_filter(self, error_rate: float = 1e-4) -> None:
+        """
+        Answer has_object negatives from an in-memory Bloom filter.
+        
+        The filter is built by scanning the store once and then updated
+        by put_object, so has_object only touches storage for hashes
+        that are probably present. Objects written by anything other
+        than this store instance are invisible to the filter: enable it
+        only when this instance is the sole writer. Only has_object
+        consults it; exists_many always checks storage, and
+        has_object(use_filter=False) bypasses it where a false negative
+        could lose data.
+        
+        A filter saved by save_existence_filter is reused instead of
+        scanning, as long as the store's contents have not changed
+        since it was saved.
+        """
+        stamp = self._contents_stamp()
+        bloom = self._load_existence_filter(stamp)
+        if bloom is None:
+            self._build_existence_filter(error_rate)
+        else:
+            self._existence_filter = bloom
+            self._filter_stamp = stamp
+    
+    def save_existence_filter(self) -> None:
+        """
+        Persist the existence filter, if enabled, for a later
+        enable_existence_filter to reuse.
+        
+        The file holds a checksum digest, a stamp of the store's
+        contents (see _contents_stamp) and the serialized filter.
+        Failures only cost a scan later.
+        
+        The filter is only saved if the store is unchanged since it was
+        built or loaded: writes by this instance and by others look the
+        same in the stamp, so after any write the saved filter is
+        removed instead, and the next enable_existence_filter scans.
+        """
+        if self._existence_filter is None:
+            return
+        
+        with self._existence_lock:
+            stamp = self._contents_stamp()
+            if stamp != self._filter_stamp:
+                try:
+                    self.layout.existence_filter_path.unlink()
+                except OSError:
+                    pass
+                return
+            body = stamp + self._existence_filter.to_bytes()
+        
+        self.layout.write_cache_file(self.layout.existence_filter_path, body)
+    
+    def close(self) -> None:
+        """Save the existence filter and close the objects directory."""
+        self.save_existence_filter()
+        self.layout.close()
+    
+    def _load_existence_filter(self, stamp: bytes) -> Optional[BloomFilter]:
+        """
+        Load the saved existence filter, or None if absent or stale.
+        
+        stamp is the store's current _contents_stamp().
+        """
+        body = self.layout.read_cache_file(self.layout.existence_filter_path)
+        if body is None:
+            return None
+        
+        if body[:len(stamp)] != stamp:
+            return None
+        
+        try:
+            return BloomFilter.from_bytes(body[len(stamp):])
+        except ValueError:
+            return None
+    
+    def _build_existence_filter(self, error_rate: float = 1e-4) -> None:
+        """Build the existence filter by scanning the store."""
+        # Taken first, so a write during the scan makes the stamp stale
+        stamp = self._contents_stamp()
+        hashes = list(self.iter_all_objects())
+        bloom = BloomFilter(max(len(hashes) * 2, 1024), error_rate)
+        for obj_hash in hashes:
+            bloom.add(obj_hash)
+        self._existence_filter = bloom
+        self._filter_stamp = stamp
+    
+    def _contents_stamp(self) -> bytes:
+        """
+        Fingerprint the set of stored objects without listing them.
+        
+        Creating or removing an object file updates the mtime of its
+        shard directory, so the digest of all shard mtimes changes
+        whenever the stored objects do.
+        """
+        shards = []
+        try:
+            with os.scandir(self.layout.objects_dir) as entries:
+                for entry in entries:
+                    if entry.is_dir() and not entry.name.startswith('.'):
+                        shards.append(f'{entry.name} {entry.stat().st_mtime_ns}')
+        except OSError:
+            pass
+        
+        shards.sort()
+        return bytes.fromhex(compute_hash('\n'.join(shards).encode('utf-8')))
+    
+    def _record_existence(self, obj_hash: str) -> None:
+        """Add a newly stored object to the existence filter, if enabled."""
+        if self._existence_filter is None:
+            return
+        
+        with self._existence_lock:
+            bloom = self._existence_filter
+            bloom.add(obj_hash)
+            
+            # Rebuild at twice the size once the false positive rate degrades
+            if bloom.count > bloom.capacity:
+                self._build_existence_filter()
+    
     def delete_object(self, obj_hash: str) -> bool:
         """
         Delete an object from the store.
@@ -115,20 +760,51 @@ class ObjectStore:
         
         Returns True if deleted, False if didn't exist.
         """
-        obj_path = self.layout.get_object_path(obj_hash)
-        
-        if not obj_path.exists():
+        if not is_valid_hash(obj_hash):
             return False
         
+        # unlink reports a missing file itself, so no separate stat
         try:
-            obj_path.unlink()
+            self.layout.unlink_object(obj_hash)
             return True
+        except FileNotFoundError:
+            return False
         except OSError as e:
-            raise StorageError("delete_object", str(obj_path), e)
+            raise StorageError("delete_object", self.layout.get_object_path_str(obj_hash), e)
+    
+    def delete_many(self, hashes: List[str]) -> List[Tuple[bool, Optional[Exception]]]:
+        """
+        Delete several objects.
+        
+        Failures are reported instead of raised, so a sweep can delete
+        many objects without handling an exception per object.
+        
+        Returns one (deleted, error) pair per hash, in input order;
+        deleted is False if the object didn't exist or could not be
+        deleted, and error is the StorageError of a failed delete.
+        """
+        results = []
+        for obj_hash in hashes:
+            if not is_valid_hash(obj_hash):
+                results.append((False, None))
+                continue
+            try:
+                self.layout.unlink_object(obj_hash)
+                results.append((True, None))
+            except FileNotFoundError:
+                results.append((False, None))
+            except OSError as e:
+                obj_path = self.layout.get_object_path_str(obj_hash)
+                results.append((False, StorageError("delete_object", obj_path, e)))
+        return results
     
     def list_all_objects(self) -> list[str]:
         """List all object hashes in the store."""
-        return self.layout.list_all_objects()
+        return list(self.iter_all_objects())
+    
+    def iter_all_objects(self) -> Iterator[str]:
+        """Iterate over all object hashes in the store."""
+        return self.layout.iter_all_objects()
     
     def put_snapshot_ref(self, name: str, snapshot_hash: str) -> None:
         """
@@ -145,9 +821,38 @@ class ObjectStore:
         
         try:
             ref_path.parent.mkdir(parents=True, exist_ok=True)
-            ref_path.write_text(snapshot_hash, encoding='utf-8')
         except OSError as e:
             raise StorageError("write_snapshot_ref", str(ref_path), e)
+        
+        # Replaced atomically, so readers never see a partial reference
+        self._write_object_atomic(str(ref_path), snapshot_hash.encode('utf-8'))
+        
+        if self._refs_written is not None:
+            self._refs_written = True
+    
+    @contextmanager
+    def refs_batch(self) -> Iterator[None]:
+        """
+        Make all references written inside the block durable together.
+        
+        References are written and renamed into place as usual; when the
+        block exits, the snapshots directory is fsynced once for all of
+        them instead of once per reference. Commit the objects they
+        point to first (see write_batch), so no durable reference can
+        name an object lost in a crash. Nested batches join the
+        outermost one.
+        """
+        if self._refs_written is not None:
+            yield
+            return
+        
+        self._refs_written = False
+        try:
+            yield
+            if self._refs_written:
+                self._fsync_directory(self.layout.snapshots_dir)
+        finally:
+            self._refs_written = None
     
     def get_snapshot_ref(self, name: str) -> Optional[str]:
         """
@@ -157,11 +862,11 @@ class ObjectStore:
         """
         ref_path = self.layout.get_snapshot_ref_path(name)
         
-        if not ref_path.exists():
-            return None
-        
+        # Opening reports a missing reference itself, so no separate stat
         try:
-            return ref_path.read_text(encoding='utf-8').strip()
+            return intern_hash(ref_path.read_text(encoding='utf-8').strip())
+        except FileNotFoundError:
+            return None
         except OSError as e:
             raise StorageError("read_snapshot_ref", str(ref_path), e)
     
@@ -173,12 +878,11 @@ class ObjectStore:
         """
         ref_path = self.layout.get_snapshot_ref_path(name)
         
-        if not ref_path.exists():
-            return False
-        
         try:
             ref_path.unlink()
             return True
+        except FileNotFoundError:
+            return False
         except OSError as e:
             raise StorageError("delete_snapshot_ref", str(ref_path), e)
     
@@ -186,32 +890,139 @@ class ObjectStore:
         """List all named snapshot references."""
         return self.layout.list_snapshot_refs()
     
-    def _read_object_file(self, path: Path) -> bytes:
+    def dump_snapshot_refs(self) -> Dict[str, str]:
+        """
+        Get all named snapshot references as a name -> hash mapping.
+        
+        Reads every reference in one directory scan instead of a
+        list_snapshot_refs() call followed by get_snapshot_ref() per name.
+        """
+        refs = {}
+        
+        try:
+            with os.scandir(self.layout.snapshots_dir) as entries:
+                for entry in entries:
+                    # Reference names never start with '.'; those are
+                    # temporary files of writes in progress
+                    if entry.name.startswith('.') or not entry.is_file():
+                        continue
+                    try:
+                        with open(entry.path, encoding='utf-8') as f:
+                            refs[entry.name] = intern_hash(f.read().strip())
+                    except FileNotFoundError:
+                        continue  # Deleted while scanning
+        except FileNotFoundError:
+            return {}
+        except OSError as e:
+            raise StorageError("read_snapshot_refs", str(self.layout.snapshots_dir), e)
+        
+        return refs
+    
+    @staticmethod
+    def _decode_object(data: bytes) -> dict:
+        """Decode stored bytes into an object dictionary."""
+        if is_blob_payload(data):
+            return blob_payload_to_object(data)
+        return decode_json(data)
+    
+    @classmethod
+    def _payload_references(cls, obj_hash: str, data: bytes) -> Set[str]:
+        """
+        Get the references of an object from its stored bytes.
+        
+        Raises StorageError if the bytes cannot be decoded.
+        """
+        if is_blob_payload(data):
+            return set()
+        
+        refs = extract_encoded_references(data)
+        if refs is not None:
+            return refs
+        
+        try:
+            obj_data = cls._decode_object(data)
+        except ValueError as e:
+            raise StorageError("read_object", obj_hash, e)
+        if not isinstance(obj_data, dict):
+            raise StorageError("read_object", obj_hash, ValueError("Object must be a dictionary"))
+        return extract_references(obj_data)
+    
+    @staticmethod
+    def _payload_hash(data: bytes) -> Optional[str]:
+        """
+        Hash stored bytes as the object they encode.
+        
+        Returns None for a raw blob payload that cannot be decoded.
+        """
+        if not is_blob_payload(data):
+            return compute_hash(data)
+        try:
+            return blob_payload_hash(data)
+        except ValueError:
+            return None
+    
+    def _load_type_index(self) -> Dict[str, str]:
+        """
+        Load the object type index, or an empty one if absent or damaged.
+        
+        The file holds a checksum digest followed by one record per
+        object: its raw digest and a one-byte type code.
+        """
+        body = self.layout.read_cache_file(self.layout.type_index_path)
+        record_size = DIGEST_SIZE + 1
+        if body is None or len(body) % record_size:
+            return {}
+        
+        index = {}
+        for i, obj_hash in enumerate(iter_digest_hashes(body, record_size)):
+            obj_type = _TYPE_NAMES.get(body[i * record_size + DIGEST_SIZE])
+            if obj_type is None:
+                return {}
+            index[obj_hash] = obj_type
+        return index
+    
+    def _save_type_index(self, index: Dict[str, str]) -> None:
+        """Persist the object type index; failures only cost re-reads later."""
+        records = []
+        for obj_hash, obj_type in sorted(index.items()):
+            digest = hash_to_digest(obj_hash)
+            if digest is None:
+                continue  # Not an object file name (e.g. a stray temp file)
+            records.append(digest + bytes([TYPE_CODES[obj_type]]))
+        
+        self.layout.write_cache_file(self.layout.type_index_path, b''.join(records))
+    
+    def _read_object_file(self, path: Union[str, Path]) -> bytes:
         """Read object file contents."""
         try:
-            return path.read_bytes()
+            with open(path, 'rb') as f:
+                return f.read()
         except OSError as e:
             raise StorageError("read_file", str(path), e)
     
-    def _write_object_atomic(self, path: Path, data: bytes) -> None:
+    def _write_object_atomic(self, path: str, data: bytes) -> None:
         """
-        Write object file atomically.
+        Write an object or reference file atomically.
         
-        Uses temp file + rename for atomicity.
+        New files are written through an unnamed O_TMPFILE inode where
+        supported (see _link_new_file); otherwise, and when replacing an
+        existing file, uses temp file + rename for atomicity.
         """
-        dir_path = path.parent
+        if self._use_tmpfile and self._link_new_file(path, data):
+            return
+        
         fd = None
         temp_path = None
         try:
             # Write to temporary file in same directory
             fd, temp_path = tempfile.mkstemp(
-                dir=str(dir_path),
+                dir=os.path.dirname(path),
                 prefix='.tmp_',
                 suffix='.json'
             )
             
             # Write data and close fd
-            os.write(fd, data)
+            self._write_all(fd, data)
             os.close(fd)
             fd = None  # Mark as closed so we don't double-close
             
@@ -233,9 +1044,111 @@ class ObjectStore:
                 except OSError:
                     pass
             if isinstance(e, OSError):
-                raise StorageError("write_file", str(path), e)
+                raise StorageError("write_file", path, e)
             raise
     
+    def _link_new_file(self, path: str, data: bytes) -> bool:
+        """
+        Write a new object file through an unnamed temporary inode.
+        
+        The file is created with O_TMPFILE and linked into place only
+        once fully written, so it never has a temporary name and a
+        crash leaves nothing behind.
+        
+        Returns False if the caller must fall back to temp file +
+        rename: when path already exists (linking cannot replace it), or
+        when the filesystem or kernel does not support the technique,
+        in which case it is not attempted again.
+        """
+        try:
+            fd = os.open(os.path.dirname(path), os.O_TMPFILE | os.O_WRONLY, 0o600)
+        except OSError as e:
+            if e.errno in _TMPFILE_UNSUPPORTED:
+                self._use_tmpfile = False
+            # Other errors are reported by the fallback's own attempt
+            return False
+        
+        try:
+            self._write_all(fd, data)
+            os.link(f'/proc/self/fd/{fd}', path)
+        except FileExistsError:
+            return False
+        except OSError as e:
+            if e.errno not in _TMPFILE_UNSUPPORTED:
+                raise StorageError("write_file", path, e)
+            self._use_tmpfile = False
+            return False
+        finally:
+            os.close(fd)
+        return True
+    
+    @staticmethod
+    def _write_all(fd: int, data: bytes) -> None:
+        """
+        Write all of data to a file descriptor.
+        
+        os.write may write less than asked (Linux caps a single write
+        just below 2 GiB), so the rest is written from a memoryview of
+        data, without copying it.
+        """
+        written = os.write(fd, data)
+        if written == len(data):
+            return
+        
+        view = memoryview(data)
+        while written < len(view):
+            written += os.write(fd, view[written:])
+    
+    def _fsync_directory(self, dir_path: Union[str, Path]) -> None:
+        """
+        Flush a directory's entries to disk.
+        
+        No-op on platforms that cannot open directories (Windows).
+        """
+        if os.name == 'nt':
+            return
+        
+        try:
+            fd = os.open(str(dir_path), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            raise StorageError("fsync_directory", str(dir_path), e)
+    
+    def count_objects_by_type(self) -> Dict[str, int]:
+        """
+        Count the stored objects of each type.
+        
+        An object's type can never change, so types of object files are
+        kept in a persistent index and only files not yet in it are read.
+        Unreadable objects are not counted.
+        """
+        index = self._load_type_index()
+        seen: Dict[str, str] = {}
+        counts = dict.fromkeys(TYPE_CODES, 0)
+        
+        for obj_hash in self.layout.iter_all_objects():
+            obj_type = index.get(obj_hash)
+            if obj_type is None:
+                try:
+                    obj_type = self.get_object(obj_hash, verify=False).get('type')
+                except Exception:
+                    continue  # Skip corrupted objects
+                if obj_type not in TYPE_CODES:
+                    continue
+            if len(obj_hash) == 2 * DIGEST_SIZE:
+                seen[obj_hash] = obj_type
+            counts[obj_type] += 1
+        
+        if seen.keys() != index.keys():
+            self._save_type_index(seen)
+        
+        return counts
+    
     def get_stats(self) -> dict:
-        """Get storage statistics."""
-        return self.layout.get_storage_stats()
+        """Get storage statistics, including the hash algorithm in use."""
+        stats = self.layout.get_storage_stats()
+        stats['hash_algorithm'] = HASH_ALGORITHM
+        return stats
@@ -0,0 +1,499 @@
+"""
+SQLite-backed storage for small objects.
+
+Small objects live as rows in a single database; large ones keep the
+file-per-object layout.
+"""
+
+import os
+import sqlite3
+import threading
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from ..errors import StorageError
+from ..integrity.hashing import compute_hash, compute_hashes_bulk
+from .blob_payload import is_blob_payload
+from .layout import StorageLayout
+from .object_store import ObjectStore, TYPE_CODES
+
+
+# Stored payloads smaller than this are stored inline in the database
+INLINE_LIMIT = 64 * 1024
+
+# Maximum number of keys bound to one "IN (...)" query
+QUERY_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    hash BLOB PRIMARY KEY,
+    type INTEGER NOT NULL,
+    payload BLOB NOT NULL
+) WITHOUT ROWID
+"""
+
+_PRAGMAS = (
+    "PRAGMA page_size=8192",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+)
+
+
+class SqliteObjectStore(ObjectStore):
+    """
+    Object store keeping small objects inside one SQLite database.
+    
+    Objects whose stored encoding is below inline_limit are stored as
+    rows in store_root/objects.db; larger objects fall back to the
+    file-per-object layout of ObjectStore. Reads, existence checks and
+    deletes consult the database first, then the filesystem.
+    
+    Named snapshot references remain files under snapshots/.
+    """
+    
+    def __init__(self, layout: StorageLayout, inline_limit: int = INLINE_LIMIT):
+        """Initialize store with given layout and inline size limit."""
+        super().__init__(layout)
+        self.inline_limit = inline_limit
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+    
+    def put_encoded(self, obj_type: str, obj_hash: str, canonical_bytes: bytes) -> str:
+        """
+        Store an encoded object and return its hash.
+        
+        Small objects are inserted into the database; large objects are
+        delegated to the file-backed store.
+        """
+        if len(canonical_bytes) >= self.inline_limit:
+            return super().put_encoded(obj_type, obj_hash, canonical_bytes)
+        
+        key = bytes.fromhex(obj_hash)
+        
+        # Idempotent: keep an existing row if it is intact
+        existing = self._fetch_payload(key)
+        if existing is not None and self._payload_hash(existing) == obj_hash:
+            return obj_hash
+        
+        self._execute(
+            "INSERT OR REPLACE INTO objects (hash, type, payload) VALUES (?, ?, ?)",
+            (key, TYPE_CODES[obj_type], canonical_bytes),
+        )
+        self._record_existence(obj_hash)
+        return obj_hash
+    
+    def put_encoded_many(self, items: List[Tuple[str, str, bytes]]) -> List[str]:
+        """
+        Store several encoded objects in one transaction.
+        
+        Existing rows are fetched with batched queries and new rows are
+        inserted with a single executemany; large objects are delegated
+        to the file-backed store.
+        
+        Returns the content hashes in the same order as the input.
+        """
+        inline = {}
+        large = []
+        for obj_type, obj_hash, payload in items:
+            if len(payload) >= self.inline_limit:
+                large.append((obj_type, obj_hash, payload))
+            else:
+                inline[bytes.fromhex(obj_hash)] = (obj_type, obj_hash, payload)
+        
+        with self.write_batch():
+            # Idempotent: keep existing rows that are intact
+            for key, existing in self._fetch_rows("hash, payload", list(inline)):
+                if self._payload_hash(existing) == inline[key][1]:
+                    del inline[key]
+            
+            if inline:
+                self._executemany(
+                    "INSERT OR REPLACE INTO objects (hash, type, payload) VALUES (?, ?, ?)",
+                    [
+                        (key, TYPE_CODES[obj_type], payload)
+                        for key, (obj_type, _, payload) in inline.items()
+                    ],
+                )
+                for _, obj_hash, _ in inline.values():
+                    self._record_existence(obj_hash)
+            
+            super().put_encoded_many(large)
+        
+        return [obj_hash for _, obj_hash, _ in items]
+    
+    def read_payload(self, obj_hash: str) -> bytes:
+        """
+        Read the stored bytes of an object.
+        
+        Database rows are returned as stored; objects without a row are
+        read from the file-backed store.
+        
+        Raises ObjectNotFoundError if object doesn't exist.
+        """
+        key = self._key(obj_hash)
+        payload = self._fetch_payload(key) if key is not None else None
+        
+        if payload is None:
+            return super().read_payload(obj_hash)
+        return payload
+    
+    def load_many(
+        self,
+        hashes: List[str],
+        executor: Optional[Executor] = None
+    ) -> Dict[str, Union[dict, Exception]]:
+        """
+        Load several objects without verifying them.
+        
+        Database rows are fetched with batched queries instead of one
+        query per object; hashes without a row are loaded from the
+        file-backed store. Results are as in ObjectStore.load_many.
+        """
+        keys = {}
+        for obj_hash in hashes:
+            key = self._key(obj_hash)
+            if key is not None:
+                keys[key] = obj_hash
+        
+        loaded = {}
+        for key, payload in self._fetch_rows("hash, payload", list(keys)):
+            obj_hash = keys[key]
+            try:
+                loaded[obj_hash] = self._decode_object(payload)
+            except ValueError as e:
+                loaded[obj_hash] = StorageError("read_object", obj_hash, e)
+        
+        remaining = [obj_hash for obj_hash in hashes if obj_hash not in loaded]
+        loaded.update(super().load_many(remaining, executor))
+        return loaded
+    
+    def get_object_refs_many(
+        self,
+        hashes: List[str],
+        executor: Optional[Executor] = None
+    ) -> Dict[str, Union[Set[str], Exception]]:
+        """
+        Get the references of several objects.
+        
+        Database rows are fetched with batched queries, as in load_many;
+        hashes without a row are handled by the file-backed store.
+        """
+        keys = {}
+        for obj_hash in hashes:
+            key = self._key(obj_hash)
+            if key is not None:
+                keys[key] = obj_hash
+        
+        loaded = {}
+        for key, payload in self._fetch_rows("hash, payload", list(keys)):
+            obj_hash = keys[key]
+            try:
+                loaded[obj_hash] = self._payload_references(obj_hash, payload)
+            except StorageError as e:
+                loaded[obj_hash] = e
+        
+        remaining = [obj_hash for obj_hash in hashes if obj_hash not in loaded]
+        loaded.update(super().get_object_refs_many(remaining, executor))
+        return loaded
+    
+    def verify_object(self, obj_hash: str) -> bool:
+        """
+        Verify an object's integrity without decoding it.
+        
+        Database rows are checked by hashing the stored payload; large
+        objects are verified as in ObjectStore.verify_object.
+        """
+        key = self._key(obj_hash)
+        payload = self._fetch_payload(key) if key is not None else None
+        
+        if payload is None:
+            return super().verify_object(obj_hash)
+        
+        if self._payload_hash(payload) != obj_hash:
+            self.get_object(obj_hash, verify=True)
+        return True
+    
+    def verify_many(
+        self,
+        hashes: List[str],
+        executor: Optional[Executor] = None
+    ) -> List[Optional[Exception]]:
+        """
+        Verify several objects.
+        
+        Database rows are fetched with batched queries and their payloads
+        hashed together (see compute_hashes_bulk); only rows that do not
+        hash to their key, raw blob payloads and large objects are
+        verified one by one as in ObjectStore.verify_many.
+        """
+        keys = {}
+        for obj_hash in hashes:
+            key = self._key(obj_hash)
+            if key is not None:
+                keys[key] = obj_hash
+        
+        rows = [
+            (keys[key], payload)
+            for key, payload in self._fetch_rows("hash, payload", list(keys))
+            if not is_blob_payload(payload)
+        ]
+        digests = compute_hashes_bulk([payload for _, payload in rows], executor)
+        intact = {obj_hash for (obj_hash, _), digest in zip(rows, digests) if digest == obj_hash}
+        
+        remaining = [obj_hash for obj_hash in hashes if obj_hash not in intact]
+        errors = dict(zip(remaining, super().verify_many(remaining, executor)))
+        return [errors.get(obj_hash) for obj_hash in hashes]
+    
+    def object_fingerprint(self, obj_hash: str) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Get the file fingerprint of a large object.
+        
+        Database rows have no per-row change marker, so objects stored
+        inline return None and must always be re-hashed.
+        """
+        key = self._key(obj_hash)
+        if key is not None:
+            row = self._execute(
+                "SELECT 1 FROM objects WHERE hash = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                return None
+        return super().object_fingerprint(obj_hash)
+    
+    def has_object(self, obj_hash: str, use_filter: bool = True) -> bool:
+        """Check if an object exists in the database or on disk, as in ObjectStore."""
+        if use_filter and self._existence_filter is not None and obj_hash not in self._existence_filter:
+            return False
+        
+        key = self._key(obj_hash)
+        if key is not None:
+            row = self._execute(
+                "SELECT 1 FROM objects WHERE hash = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                return True
+        return super().has_object(obj_hash, use_filter=False)
+    
+    def exists_many(self, hashes: Iterable[str]) -> Set[str]:
+        """
+        Return the subset of hashes that exist in the store.
+        
+        The database is queried in batches; hashes without a row are
+        looked up in the file-backed store.
+        """
+        keys = {}
+        for obj_hash in set(hashes):
+            key = self._key(obj_hash)
+            if key is not None:
+                keys[key] = obj_hash
+        
+        found = {keys[key] for (key,) in self._fetch_rows("hash", list(keys))}
+        
+        remaining = [h for h in keys.values() if h not in found]
+        found.update(super().exists_many(remaining))
+        return found
+    
+    def delete_object(self, obj_hash: str) -> bool:
+        """
+        Delete an object from the database or disk.
+        
+        Returns True if deleted, False if didn't exist.
+        """
+        key = self._key(obj_hash)
+        if key is not None:
+            cursor = self._execute("DELETE FROM objects WHERE hash = ?", (key,))
+            if cursor.rowcount > 0:
+                return True
+        return super().delete_object(obj_hash)
+    
+    def delete_many(self, hashes: List[str]) -> List[Tuple[bool, Optional[Exception]]]:
+        """
+        Delete several objects.
+        
+        Rows are looked up with batched queries and deleted in one
+        transaction; hashes without a row are deleted from the
+        file-backed store. Results are as in ObjectStore.delete_many.
+        """
+        keys = {}
+        for obj_hash in hashes:
+            key = self._key(obj_hash)
+            if key is not None:
+                keys[key] = obj_hash
+        
+        found = {key for (key,) in self._fetch_rows("hash", list(keys))}
+        results = {}
+        if found:
+            try:
+                with self.write_batch():
+                    self._executemany(
+                        "DELETE FROM objects WHERE hash = ?",
+                        [(key,) for key in found],
+                    )
+                outcome = (True, None)
+            except StorageError as e:
+                outcome = (False, e)
+            for key in found:
+                results[keys[key]] = outcome
+        
+        remaining = [obj_hash for obj_hash in hashes if obj_hash not in results]
+        results.update(zip(remaining, super().delete_many(remaining)))
+        return [results[obj_hash] for obj_hash in hashes]
+    
+    def iter_all_objects(self) -> Iterator[str]:
+        """
+        Iterate over all object hashes.
+        
+        Streams database rows through a cursor, then scans the
+        filesystem for large objects.
+        """
+        cursor = self._execute("SELECT hash FROM objects")
+        cursor.arraysize = 1024
+        while True:
+            with self._lock:
+                batch = cursor.fetchmany()
+            if not batch:
+                break
+            for (key,) in batch:
+                yield key.hex()
+        
+        yield from super().iter_all_objects()
+    
+    @contextmanager
+    def write_batch(self) -> Iterator[None]:
+        """
+        Group all puts made inside the block into one transaction.
+        
+        Rows are committed with a single BEGIN IMMEDIATE ... COMMIT;
+        file-backed objects are flushed as in ObjectStore.write_batch.
+        
+        The connection lock is held until the transaction ends, so
+        statements from other threads wait instead of joining it.
+        """
+        with self._batch_lock, self._lock:
+            if self._pending_dirs is not None:
+                yield
+                return
+            
+            self._execute("BEGIN IMMEDIATE")
+            try:
+                with super().write_batch():
+                    yield
+            except BaseException:
+                self._execute("ROLLBACK")
+                raise
+            self._execute("COMMIT")
+    
+    def count_objects_by_type(self) -> Dict[str, int]:
+        """Count stored objects of each type, using the type column for rows."""
+        counts = super().count_objects_by_type()
+        
+        rows = self._execute("SELECT type, COUNT(*) FROM objects GROUP BY type").fetchall()
+        names = {code: name for name, code in TYPE_CODES.items()}
+        for code, count in rows:
+            counts[names[code]] += count
+        
+        return counts
+    
+    def get_stats(self) -> dict:
+        """Get storage statistics including database-resident objects."""
+        stats = super().get_stats()
+        
+        count, size = self._execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM objects"
+        ).fetchone()
+        stats['total_objects'] += count
+        stats['total_size_bytes'] += size
+        
+        return stats
+    
+    def _contents_stamp(self) -> bytes:
+        """
+        Fingerprint the stored objects, including database rows.
+        
+        Any committed write changes the size or mtime of the database
+        or its write-ahead log, so their stats extend the file stamp.
+        """
+        stats = []
+        db_path = str(self.layout.objects_db_path)
+        for path in (db_path, db_path + '-wal'):
+            try:
+                st = os.stat(path)
+                stats.append(f'{st.st_size} {st.st_mtime_ns}')
+            except OSError:
+                stats.append('-')
+        
+        extra = '\n'.join(stats).encode('utf-8')
+        return bytes.fromhex(compute_hash(super()._contents_stamp() + extra))
+    
+    def close(self) -> None:
+        """Close the database connection and save the existence filter."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        
+        # Closing checkpoints the write-ahead log, so stamp afterwards
+        super().close()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use."""
+        if self._conn is None:
+            db_path = self.layout.objects_db_path
+            try:
+                conn = sqlite3.connect(
+                    str(db_path),
+                    isolation_level=None,
+                    check_same_thread=False,
+                )
+                for pragma in _PRAGMAS:
+                    conn.execute(pragma)
+                conn.execute(_SCHEMA)
+            except sqlite3.Error as e:
+                raise StorageError("open_database", str(db_path), e)
+            self._conn = conn
+        return self._conn
+    
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """Execute a statement under the connection lock."""
+        with self._lock:
+            try:
+                return self._connection().execute(sql, params)
+            except sqlite3.Error as e:
+                raise StorageError("sqlite", sql.split()[0], e)
+    
+    def _executemany(self, sql: str, rows: List[tuple]) -> None:
+        """Execute a statement for each row under the connection lock."""
+        with self._lock:
+            try:
+                self._connection().executemany(sql, rows)
+            except sqlite3.Error as e:
+                raise StorageError("sqlite", sql.split()[0], e)
+    
+    def _fetch_rows(self, columns: str, keys: List[bytes]) -> List[tuple]:
+        """Select columns of the rows with the given keys, in batches."""
+        rows = []
+        for start in range(0, len(keys), QUERY_BATCH_SIZE):
+            batch = keys[start:start + QUERY_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            rows.extend(self._execute(
+                f"SELECT {columns} FROM objects WHERE hash IN ({placeholders})",
+                tuple(batch),
+            ).fetchall())
+        return rows
+    
+    def _fetch_payload(self, key: bytes) -> Optional[bytes]:
+        """Fetch a stored payload, or None if absent."""
+        row = self._execute(
+            "SELECT payload FROM objects WHERE hash = ?", (key,)
+        ).fetchone()
+        return row[0] if row is not None else None
+    
+    @staticmethod
+    def _key(obj_hash: str) -> Optional[bytes]:
+        """Convert a hex hash to its database key, or None if not hex."""
+        try:
+            return bytes.fromhex(obj_hash)
+        except ValueError:
+            return None
@@ -4,6 +4,7 @@ Test garbage collection safety.
 Verifies that GC never deletes reachable objects.
 """
 
+import os
 import pytest
 import tempfile
 
@@ -138,6 +139,10 @@ class TestGarbageCollectionSafety:
         # Orphan should be deleted
         assert not store.has_object(bundle3)
         assert len(result['deleted']) == 1
+        
+        # Both roots are read back in one scan
+        refs = store.object_store.dump_snapshot_refs()
+        assert refs == {'branch1': snap1, 'branch2': snap2}
     
     def test_gc_shared_bundles(self, store):
         """GC preserves bundles shared by multiple snapshots."""
@@ -298,6 +303,72 @@ class TestGarbageCollectionEdgeCases:
         assert not store.has_object(bundle2)
         assert len(result['deleted']) == 2
     
+    def test_gc_ignores_writes_in_progress(self, store):
+        """Temporary files of unfinished writes are not listed or swept."""
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        temp_path = store.layout.get_object_path(bundle).with_name('.tmp_pending.json')
+        temp_path.write_bytes(b'{}')
+        
+        assert store.list_all_objects() == [bundle]
+        
+        result = store.garbage_collect()
+        
+        assert result['deleted'] == [bundle]
+        assert temp_path.exists()
+    
+    def test_delete_missing_object(self, store):
+        """Deleting an object twice reports it missing the second time."""
+        small = store.put_bundle({'sequence': 1, 'operations': []})
+        large = store.put_blob(os.urandom(256 * 1024))
+        
+        for obj_hash in (small, large):
+            assert store.object_store.delete_object(obj_hash) is True
+            assert store.object_store.delete_object(obj_hash) is False
+            assert not store.has_object(obj_hash)
+    
+    def test_missing_snapshot_refs(self, store):
+        """Missing references read as None and delete as False."""
+        import shutil
+        
+        snapshot = store.put_snapshot([store.put_bundle({'sequence': 1, 'operations': []})])
+        store.create_snapshot_ref('main', snapshot)
+        
+        assert store.list_snapshot_refs() == ['main']
+        assert store.delete_snapshot_ref('main') is True
+        assert store.delete_snapshot_ref('main') is False
+        assert store.get_snapshot_ref('main') is None
+        
+        shutil.rmtree(store.layout.snapshots_dir)
+        assert store.list_snapshot_refs() == []
+        assert store.get_snapshot_ref('main') is None
+    
+    def test_refs_batch_flushes_once(self, store, monkeypatch):
+        """References written in a batch share one directory flush."""
+        snapshots = [
+            store.put_snapshot([store.put_bundle({'sequence': i, 'operations': []})])
+            for i in range(5)
+        ]
+        store.create_snapshot_ref('branch-0', snapshots[-1])
+        
+        flushed = []
+        monkeypatch.setattr(store.object_store, '_fsync_directory', flushed.append)
+        
+        with store.object_store.refs_batch():
+            for i, snapshot in enumerate(snapshots):
+                store.create_snapshot_ref(f'branch-{i}', snapshot)
+            with store.object_store.refs_batch():
+                store.create_snapshot_ref('main', snapshots[0])
+            assert flushed == []
+        
+        assert flushed == [store.layout.snapshots_dir]
+        assert sorted(os.listdir(store.layout.snapshots_dir)) == sorted(
+            store.list_snapshot_refs()
+        )
+        assert store.object_store.dump_snapshot_refs() == {
+            'main': snapshots[0],
+            **{f'branch-{i}': snapshot for i, snapshot in enumerate(snapshots)},
+        }
+    
     def test_gc_all_reachable(self, store):
         """GC when all objects are reachable."""
         # Create objects and reference them
@@ -335,3 +406,437 @@ class TestGarbageCollectionEdgeCases:
         assert not store.has_object(snap2)
         
         assert len(result['deleted']) == 2
+    
+    
+    def test_parallel_mark_of_wide_snapshot(self, store):
+        """Waves loaded on the thread pool mark every reachable object."""
+        from snapshot_store.storage.gc import PARALLEL_MARK_THRESHOLD
+        
+        bundles = [
+            store.put_bundle({'sequence': i, 'operations': []})
+            for i in range(4 * PARALLEL_MARK_THRESHOLD)
+        ]
+        parent = store.put_snapshot(bundles[:PARALLEL_MARK_THRESHOLD])
+        snapshot = store.put_snapshot(bundles, parent=parent)
+        store.create_snapshot_ref('main', snapshot)
+        garbage = store.put_bundle({'sequence': -1, 'operations': []})
+        
+        reachable, complete = store.gc.compute_closure(snapshot)
+        assert complete is True
+        assert reachable == frozenset(bundles) | {parent, snapshot}
+        
+        # A missing object makes the closure incomplete
+        store.object_store.delete_object(bundles[-1])
+        assert store.gc.compute_closure(snapshot)[1] is False
+        
+        result = store.garbage_collect()
+        assert result['deleted'] == [garbage]
+    
+    def test_mark_visits_shared_objects_once(self, store):
+        """Objects referenced many times are checked and loaded once per mark."""
+        from snapshot_store.storage.gc import GarbageCollector, IncrementalGC
+        
+        bundles = [store.put_bundle({'sequence': i, 'operations': []}) for i in range(3)]
+        snapshots = [store.put_snapshot(bundles * 10, metadata={'n': i}) for i in range(20)]
+        tip = store.put_snapshot(bundles, parent=snapshots[0])
+        roots = set(snapshots) | {tip}
+        
+        checked = []
+        
+        def exists(obj_hash):
+            checked.append(obj_hash)
+            return store.object_store.has_object(obj_hash)
+        
+        gc = GarbageCollector(
+            store.object_store.iter_all_objects,
+            lambda h: store.object_store.get_object(h, verify=False),
+            store.object_store.delete_object,
+            exists,
+        )
+        
+        assert gc._mark_reachable(roots) == roots | set(bundles)
+        assert sorted(checked) == sorted(roots | set(bundles))
+        
+        checked.clear()
+        assert IncrementalGC(gc).mark_batch(roots)['complete'] is True
+        assert sorted(checked) == sorted(roots | set(bundles))
+    
+    def test_repeated_collections_reuse_references(self, store):
+        """References loaded by one collection are reused by the next."""
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot = store.put_snapshot([bundle])
+        store.create_snapshot_ref('main', snapshot)
+        
+        assert store.gc.compute_closure(snapshot) == (frozenset({bundle, snapshot}), True)
+        
+        loads = []
+        load = store.gc.load_references
+        store.gc.load_references = lambda h: loads.append(h) or load(h)
+        
+        assert store.gc.compute_closure(snapshot) == (frozenset({bundle, snapshot}), True)
+        assert loads == []
+        
+        garbage = store.put_bundle({'sequence': 2, 'operations': []})
+        store.gc.references(garbage)
+        store.gc.collect({snapshot})
+        assert garbage not in store.gc._refs_cache
+        
+        loads.clear()
+        store.gc.clear_reference_cache()
+        store.gc.compute_closure(snapshot)
+        assert sorted(loads) == sorted([bundle, snapshot])
+    
+    def test_references_read_from_stored_bytes(self, store, monkeypatch):
+        """Mark-phase references are matched in the bytes, not decoded."""
+        from snapshot_store.integrity.canonical import canonical_json
+        from snapshot_store.integrity.hashing import compute_hash
+        from snapshot_store.integrity.verification import extract_references
+        from snapshot_store.storage.object_store import ObjectStore
+        
+        blob = store.put_blob(b'data', metadata={'type': 'tree'})
+        bundle = store.put_bundle({'sequence': 1, 'children': [blob]})
+        parent = store.put_snapshot([bundle])
+        snapshot = store.put_snapshot([bundle, blob], parent=parent, metadata={'bundles': [parent]})
+        tree = store.put_tree([blob, bundle], metadata={'children': 'x'})
+        empty = store.put_tree([])
+        
+        # An equivalent but non-canonical encoding is decoded instead
+        loose = {'type': 'tree', 'content': {'children': [blob]}}
+        loose_bytes = canonical_json(loose).replace(b':', b': ')
+        loose_hash = compute_hash(canonical_json(loose))
+        store.object_store.put_encoded('tree', loose_hash, loose_bytes)
+        
+        hashes = [blob, bundle, parent, snapshot, tree, empty, loose_hash]
+        expected = {
+            h: extract_references(store.object_store.get_object(h, verify=False))
+            for h in hashes
+        }
+        assert expected[snapshot] == {bundle, blob, parent}
+        
+        decoded = []
+        decode = ObjectStore._decode_object
+        monkeypatch.setattr(
+            ObjectStore, '_decode_object', staticmethod(lambda d: decoded.append(d) or decode(d))
+        )
+        
+        assert {h: store.object_store.get_object_refs(h) for h in hashes} == expected
+        assert store.object_store.get_object_refs_many(hashes + ['0' * 64]) == expected
+        assert decoded == [loose_bytes, loose_bytes]
+    
+    def test_streaming_gc_yields_sweep_results(self, tmp_path):
+        """Streaming GC deletes garbage while the listing is still open."""
+        store = SnapshotStoreEngine(tmp_path, backend='sqlite')
+        store.initialize()
+        
+        bundle = store.put_bundle({'sequence': 0, 'operations': []})
+        store.create_snapshot_ref('main', store.put_snapshot([bundle]))
+        # More than one fetch batch of the SQLite listing cursor
+        garbage = {
+            store.put_bundle({'sequence': i, 'operations': []})
+            for i in range(1, 2500)
+        }
+        
+        preview = list(store.iter_garbage_collect(dry_run=True))
+        assert {h for h, status, _ in preview} == garbage
+        assert {status for _, status, _ in preview} == {'unreachable'}
+        
+        swept = list(store.iter_garbage_collect())
+        assert {h for h, status, error in swept if status == 'deleted' and error is None} == garbage
+        assert len(swept) == len(garbage)
+        assert not any(store.has_object(h) for h in garbage)
+        assert store.has_object(bundle)
+        assert list(store.iter_garbage_collect()) == []
+    
+    def test_sweep_deletes_in_batches(self, store):
+        """Unreachable objects are deleted in batches; failures are reported."""
+        from snapshot_store.storage.gc import SWEEP_BATCH_SIZE, GarbageCollector
+        
+        garbage = [
+            store.put_bundle({'sequence': i, 'operations': []})
+            for i in range(SWEEP_BATCH_SIZE + 10)
+        ]
+        failing = garbage[3]
+        batches = []
+        
+        def delete_many(hashes):
+            batches.append(len(hashes))
+            return [
+                (False, OSError('busy')) if h == failing else store.object_store.delete_many([h])[0]
+                for h in hashes
+            ]
+        
+        gc = GarbageCollector(
+            store.object_store.iter_all_objects,
+            lambda h: store.object_store.get_object(h, verify=False),
+            store.object_store.delete_object,
+            store.object_store.has_object,
+            delete_many,
+        )
+        result = gc.collect(set())
+        
+        assert sorted(batches) == [10, SWEEP_BATCH_SIZE]
+        assert sorted(result['deleted']) == sorted(set(garbage) - {failing})
+        assert result['errors'] == [f"Failed to delete {failing}: busy"]
+        assert store.object_store.list_all_objects() == [failing]
+        
+        # The store reports missing objects instead of raising
+        assert store.object_store.delete_many([failing, garbage[0]]) == [(True, None), (False, None)]
+    
+    def test_incremental_gc_in_batches(self, store):
+        """Incremental marking and sweeping spread work over several calls."""
+        from snapshot_store.storage.gc import IncrementalGC
+        
+        current = None
+        for i in range(5):
+            bundle = store.put_bundle({'sequence': i, 'operations': []})
+            current = store.put_snapshot([bundle], parent=current)
+        garbage = [store.put_bundle({'sequence': 100 + i, 'operations': []}) for i in range(3)]
+        
+        incremental = IncrementalGC(store.gc)
+        assert incremental.sweep_batch()['errors']
+        
+        progress = [incremental.mark_batch({current}, batch_size=2) for _ in range(5)]
+        assert [p['marked'] for p in progress] == [2, 4, 6, 8, 10]
+        assert [p['complete'] for p in progress] == [False] * 4 + [True]
+        
+        first = incremental.sweep_batch(batch_size=2)
+        second = incremental.sweep_batch(batch_size=2)
+        assert (first['deleted'], first['remaining']) == (2, 1)
+        assert (second['deleted'], second['remaining']) == (1, 0)
+        
+        assert not any(store.has_object(h) for h in garbage)
+        assert store.verify_snapshot(current)['valid'] is True
+
+class TestClosureCache:
+    """Test the persisted GC closure cache."""
+    
+    @pytest.fixture
+    def store_path(self):
+        """Create a temporary store directory."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            SnapshotStoreEngine(tmpdir).initialize()
+            yield tmpdir
+    
+    def test_closure_persisted_across_engines(self, store_path):
+        """A complete closure is reused by a fresh engine."""
+        store = SnapshotStoreEngine(store_path)
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot = store.put_snapshot([bundle])
+        store.create_snapshot_ref('main', snapshot)
+        store.garbage_collect()
+        
+        assert store.layout.get_gc_cache_path(snapshot).exists()
+        
+        reopened = SnapshotStoreEngine(store_path)
+        assert reopened._load_closure(snapshot) == {snapshot, bundle}
+        assert reopened.garbage_collect()['deleted'] == []
+    
+    def test_incomplete_closure_not_cached(self, store_path):
+        """Objects that appear after a GC with missing refs stay protected."""
+        from snapshot_store import Bundle
+        
+        store = SnapshotStoreEngine(store_path)
+        bundle_data = {'sequence': 1, 'operations': []}
+        late_bundle = Bundle(bundle_data).compute_hash()
+        snapshot = store.put_snapshot([late_bundle])
+        store.create_snapshot_ref('main', snapshot)
+        
+        store.garbage_collect()
+        assert not store.layout.get_gc_cache_path(snapshot).exists()
+        
+        store.put_bundle(bundle_data)
+        store.garbage_collect()
+        assert store.has_object(late_bundle)
+    
+    def test_damaged_closure_ignored(self, store_path):
+        """A corrupted cache file is recomputed rather than trusted."""
+        store = SnapshotStoreEngine(store_path)
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot = store.put_snapshot([bundle])
+        store.create_snapshot_ref('main', snapshot)
+        store.garbage_collect()
+        
+        cache_path = store.layout.get_gc_cache_path(snapshot)
+        cache_path.write_bytes(cache_path.read_bytes()[:-1])
+        
+        reopened = SnapshotStoreEngine(store_path)
+        assert reopened._load_closure(snapshot) is None
+        assert reopened.garbage_collect()['deleted'] == []
+        assert reopened.has_object(bundle)
+    
+    def test_cache_files_share_validation(self, store_path):
+        """Every persisted cache is written and checked the same way."""
+        store = SnapshotStoreEngine(store_path, existence_filter=True)
+        store.initialize()
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot = store.put_snapshot([bundle])
+        store.create_snapshot_ref('main', snapshot)
+        store.garbage_collect()
+        assert store.object_store.count_objects_by_type()['bundle'] == 1
+        assert store.verify_snapshot(snapshot, use_index=True)['valid'] is True
+        store.close()
+        
+        # The filter is only saved by a session that wrote nothing
+        reader = SnapshotStoreEngine(store_path, existence_filter=True)
+        reader.initialize()
+        reader.close()
+        
+        paths = [
+            store.layout.get_gc_cache_path(snapshot),
+            store.layout.get_verify_cache_path(snapshot),
+            store.layout.existence_filter_path,
+            store.layout.type_index_path,
+        ]
+        for path in paths:
+            body = store.layout.read_cache_file(path)
+            assert body is not None
+            
+            data = path.read_bytes()
+            path.write_bytes(data[:-1] + bytes([data[-1] ^ 1]))
+            assert store.layout.read_cache_file(path) is None
+            assert not list(path.parent.glob('*.tmp'))
+        
+        reopened = SnapshotStoreEngine(store_path, existence_filter=True)
+        reopened.initialize()
+        assert reopened._load_closure(snapshot) is None
+        assert not reopened._verify_index_matches(snapshot)
+        assert reopened.has_object(bundle)
+        assert reopened.object_store.count_objects_by_type()['bundle'] == 1
+        assert reopened.garbage_collect()['deleted'] == []
+
+
+class TestExistenceFilter:
+    """Test the Bloom filter in front of has_object."""
+    
+    @pytest.fixture
+    def store_path(self):
+        """Create a temporary store directory."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            SnapshotStoreEngine(tmpdir).initialize()
+            yield tmpdir
+    
+    def test_filter_has_no_false_negatives(self, store_path):
+        """Existing and newly stored objects are always found."""
+        existing = SnapshotStoreEngine(store_path).put_bundle({'sequence': 0, 'operations': []})
+        
+        store = SnapshotStoreEngine(store_path, existence_filter=True)
+        store.initialize()
+        
+        hashes = [store.put_bundle({'sequence': i, 'operations': []}) for i in range(1, 50)]
+        for h in [existing] + hashes:
+            assert store.has_object(h)
+        
+        assert not store.has_object('a' * 64)
+    
+    def test_saved_filter_reused_until_store_changes(self, store_path, monkeypatch):
+        """A saved filter skips the scan only while the store is unchanged."""
+        for backend in ('file', 'sqlite'):
+            store = SnapshotStoreEngine(store_path, backend=backend, existence_filter=True)
+            store.initialize()
+            bundle = store.put_bundle({'sequence': 1, 'operations': [], 'backend': backend})
+            store.close()
+            assert not store.layout.existence_filter_path.exists()
+            
+            # A session without writes saves its filter
+            reader = SnapshotStoreEngine(store_path, backend=backend, existence_filter=True)
+            reader.initialize()
+            assert reader.has_object(bundle)
+            reader.close()
+            assert reader.layout.existence_filter_path.exists()
+            
+            def fail():
+                raise AssertionError("store was scanned")
+            
+            reopened = SnapshotStoreEngine(store_path, backend=backend, existence_filter=True)
+            with monkeypatch.context() as patch:
+                patch.setattr(reopened.object_store, 'iter_all_objects', fail)
+                reopened.initialize()
+            assert reopened.has_object(bundle)
+            assert not reopened.has_object('a' * 64)
+            reopened.object_store.close()
+            
+            # Written while the filter was not being updated
+            writer = SnapshotStoreEngine(store_path, backend=backend)
+            added = writer.put_bundle({'sequence': 2, 'operations': [], 'backend': backend})
+            writer.object_store.close()
+            
+            rebuilt = SnapshotStoreEngine(store_path, backend=backend, existence_filter=True)
+            rebuilt.initialize()
+            assert rebuilt.has_object(bundle)
+            assert rebuilt.has_object(added)
+            rebuilt.object_store.close()
+    
+    def test_filter_not_saved_after_other_writers(self, store_path):
+        """Writes by another engine during a filtered session are never lost."""
+        for backend in ('file', 'sqlite'):
+            reader = SnapshotStoreEngine(store_path, backend=backend, existence_filter=True)
+            reader.initialize()
+            reader.close()
+            
+            store = SnapshotStoreEngine(store_path, backend=backend, existence_filter=True)
+            store.initialize()
+            
+            writer = SnapshotStoreEngine(store_path, backend=backend)
+            added = writer.put_bundle({'sequence': 1, 'operations': [], 'backend': backend})
+            writer.close()
+            
+            # Only has_object trusts the filter of the running session
+            assert store.object_store.exists_many([added]) == {added}
+            store.close()
+            
+            reopened = SnapshotStoreEngine(store_path, backend=backend, existence_filter=True)
+            reopened.initialize()
+            assert reopened.has_object(added)
+            assert reopened.object_store.exists_many([added]) == {added}
+            assert reopened.sync_adapter.create_snapshot_from_bundles([added])
+            reopened.close()
+    
+    def test_parallel_import_updates_filter(self, store_path):
+        """Bundles written by the import thread pool are all recorded."""
+        from snapshot_store.integration.sync_adapter import PARALLEL_IMPORT_THRESHOLD
+        
+        store = SnapshotStoreEngine(store_path, existence_filter=True)
+        store.initialize()
+        
+        bundles = [
+            {'sequence': i, 'operations': []}
+            for i in range(4 * PARALLEL_IMPORT_THRESHOLD)
+        ]
+        hashes = store.sync_adapter.import_bundles(bundles)
+        
+        assert all(store.has_object(h) for h in hashes)
+    
+    def test_gc_with_filter(self, store_path):
+        """GC keeps reachable objects when existence checks use the filter."""
+        store = SnapshotStoreEngine(store_path, existence_filter=True)
+        store.initialize()
+        
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot = store.put_snapshot([bundle])
+        store.create_snapshot_ref('main', snapshot)
+        garbage = store.put_bundle({'sequence': 2, 'operations': []})
+        
+        result = store.garbage_collect()
+        
+        assert result['deleted'] == [garbage]
+        assert store.has_object(bundle)
+        assert store.has_object(snapshot)
+    
+    def test_gc_ignores_stale_filter(self, store_path):
+        """Objects missing from the filter are still traversed by GC."""
+        for backend in ('file', 'sqlite'):
+            store = SnapshotStoreEngine(store_path, backend=backend, existence_filter=True)
+            store.initialize()
+            
+            # Written by another engine, so never added to the filter
+            writer = SnapshotStoreEngine(store_path, backend=backend)
+            bundle = writer.put_bundle({'sequence': 1, 'operations': [], 'backend': backend})
+            snapshot = writer.put_snapshot([bundle], metadata={'backend': backend})
+            writer.create_snapshot_ref(f'main-{backend}', snapshot)
+            assert not store.has_object(snapshot)
+            
+            store.garbage_collect()
+            assert store.object_store.has_object(bundle, use_filter=False)
+            assert store.object_store.has_object(snapshot, use_filter=False)
+            store.object_store.close()
+            writer.object_store.close()
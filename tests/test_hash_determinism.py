@@ -8,7 +8,7 @@ import pytest
 import tempfile
 from pathlib import Path
 
-from snapshot_store import SnapshotStoreEngine, Blob, Bundle, Snapshot
+from snapshot_store import SnapshotStoreEngine, Blob, Bundle, Snapshot, Tree
 
 
 class TestHashDeterminism:
@@ -115,6 +115,26 @@ class TestHashDeterminism:
         
         assert hash1 != hash2
     
+    def test_empty_metadata_is_not_encoded(self, store):
+        """Empty metadata is left out of every canonical encoding."""
+        from snapshot_store import Tree
+        
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        models = [
+            (Blob(b'x', {}), Blob(b'x')),
+            (Bundle({'sequence': 1}, {}), Bundle({'sequence': 1})),
+            (Snapshot([bundle_hash], metadata={}), Snapshot([bundle_hash])),
+            (Tree([bundle_hash], {}), Tree([bundle_hash])),
+        ]
+        
+        for with_empty, without in models:
+            assert 'metadata' not in with_empty.to_dict()
+            assert with_empty.canonical_bytes() == without.canonical_bytes()
+            assert type(with_empty).from_dict(with_empty.to_dict()).metadata == {}
+        
+        snapshot = store.get_snapshot(store.put_snapshot([bundle_hash], metadata={}))
+        assert b'metadata' not in snapshot.canonical_bytes()
+    
     def test_model_hash_methods_match_storage(self, store):
         """Model compute_hash methods match storage hashes."""
         # Blob
@@ -130,6 +150,128 @@ class TestHashDeterminism:
         bundle_hash_stored = store.put_bundle(bundle_data)
         assert bundle_hash_computed == bundle_hash_stored
     
+    def test_model_hash_is_cached(self, store, monkeypatch):
+        """Model hashes are computed once and seeded when loading by hash."""
+        from snapshot_store.model import snapshot as snapshot_module
+        
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot = Snapshot([bundle_hash], metadata={'name': 'cached'})
+        snapshot_hash = snapshot.compute_hash()
+        loaded_hash = store.put_snapshot([bundle_hash])
+        loaded = store.get_snapshot(loaded_hash)
+        
+        def fail(data):
+            raise AssertionError("hash was recomputed")
+        
+        monkeypatch.setattr(snapshot_module, 'compute_hash', fail)
+        
+        assert snapshot.compute_hash() == snapshot_hash
+        assert loaded.compute_hash() == loaded_hash
+        assert store.get_bundle(bundle_hash).compute_hash() == bundle_hash
+    
+    def test_stored_model_is_encoded_once(self, store, monkeypatch):
+        """Storing a hashed model reuses the encoding its hash came from."""
+        from snapshot_store.model import bundle as bundle_module
+        from snapshot_store.storage import object_store as object_store_module
+        
+        bundle = Bundle({'sequence': 1, 'operations': []}, {'source': 'memo'})
+        bundle_hash = bundle.compute_hash()
+        
+        def fail(obj):
+            raise AssertionError("model was encoded again")
+        
+        monkeypatch.setattr(bundle_module, 'canonical_json', fail)
+        monkeypatch.setattr(object_store_module, 'canonical_json', fail)
+        
+        assert store.object_store.put_model(bundle) == bundle_hash
+        assert store.get_bundle(bundle_hash).compute_hash() == bundle_hash
+    
+    def test_put_object_encodes_once(self, store, monkeypatch):
+        """The bytes that are hashed are the bytes that are written."""
+        from snapshot_store.storage import object_store as object_store_module
+        
+        encoded = []
+        encode = object_store_module.canonical_json
+        monkeypatch.setattr(
+            object_store_module, 'canonical_json',
+            lambda obj: encoded.append(obj) or encode(obj),
+        )
+        
+        obj_data = Bundle({'sequence': 1, 'operations': []}).to_dict()
+        obj_hash = store.object_store.put_object(obj_data)
+        
+        assert encoded == [obj_data]
+        assert store.object_store.read_payload(obj_hash) == encode(obj_data)
+    
+    def test_derived_models_are_hashed_afresh(self, store):
+        """Models derived from a hashed instance do not reuse its cached hash."""
+        from snapshot_store import Tree
+        
+        bundle1 = store.put_bundle({'sequence': 1, 'operations': []})
+        bundle2 = store.put_bundle({'sequence': 2, 'operations': []})
+        
+        snapshot = store.get_snapshot(store.put_snapshot([bundle1]))
+        tree = Tree([bundle1])
+        snapshot.compute_hash()
+        tree.compute_hash()
+        
+        derived = [
+            (snapshot.with_parent(bundle2), store.put_snapshot([bundle1], parent=bundle2)),
+            (snapshot.with_additional_bundles([bundle2]), store.put_snapshot([bundle1, bundle2])),
+            (tree.with_child(bundle2), store.put_tree([bundle1, bundle2])),
+            (tree.without_child(bundle1), store.put_tree([])),
+        ]
+        for model, expected_hash in derived:
+            assert model.compute_hash() == expected_hash
+        
+        # Hash sequences are kept as tuples; lists encode identically
+        assert snapshot.with_additional_bundles([bundle2]).bundles == (bundle1, bundle2)
+        assert Tree((bundle1,)).compute_hash() == Tree([bundle1]).compute_hash()
+        
+        # Removing an absent child is a no-op; removing a named child drops its name
+        assert tree.without_child('f' * 64) is tree
+        named = tree.with_child(bundle2, 'second')
+        assert named.without_child(bundle2).get_child_names() == {bundle1: ''}
+        assert named.without_child(bundle2).metadata == {'names': {}}
+        
+        # Names are parallel to children; naming a child leaves the source tree unchanged
+        renamed = named.with_child(bundle1, 'first')
+        assert renamed.child_names() == ('first', 'second', 'first')
+        assert named.child_names() == ('', 'second')
+        assert named.metadata == {'names': {bundle2: 'second'}}
+    
+    def test_models_have_no_instance_dict(self):
+        """Model instances are slotted and reject unknown attributes."""
+        from snapshot_store import Tree
+        
+        for model in (Blob(b'x'), Bundle({'sequence': 1}), Snapshot([]), Tree([])):
+            assert not hasattr(model, '__dict__')
+            with pytest.raises((AttributeError, TypeError)):
+                model.extra = 1
+    
+    def test_model_canonical_bytes_are_cached(self, store):
+        """Models encode once and hash the cached canonical bytes."""
+        from snapshot_store.integrity.canonical import canonical_json
+        
+        bundle = Bundle({'sequence': 1, 'operations': []}, {'source': 'test'})
+        encoded = bundle.canonical_bytes()
+        
+        assert encoded == canonical_json(bundle.to_dict())
+        assert bundle.canonical_bytes() is encoded
+        assert store.object_store.encode_model(bundle) == ('bundle', bundle.compute_hash(), encoded)
+        assert store.object_store.encode_model(bundle)[2] is encoded
+        
+        from snapshot_store import InvalidObjectError
+        with pytest.raises(InvalidObjectError):
+            store.put_tree([], metadata='not a dict')
+        assert bundle.compute_hash() == store.put_bundle(
+            {'sequence': 1, 'operations': []}, {'source': 'test'}
+        )
+        
+        blob = Blob(b'cached', {'name': 'x'})
+        blob.canonical_bytes()
+        assert blob.compute_hash() == Blob(b'cached', {'name': 'x'}).compute_hash()
+    
     def test_no_timestamp_in_hash(self, store):
         """Hashes are not affected by timestamps (deterministic)."""
         import time
@@ -156,6 +298,157 @@ class TestHashDeterminism:
         assert bytes1 == bytes2
         assert bytes1 == b'{"a":1,"b":2,"c":3}'
     
+    def test_canonical_json_round_trip(self):
+        """Decoding canonical bytes restores the original object."""
+        from snapshot_store.integrity.canonical import canonical_json, decode_json
+        
+        obj = {'big': 2 ** 70, 'text': 'héllo', 'nested': [1.5, None, True]}
+        
+        assert decode_json(canonical_json(obj)) == obj
+        
+        # Views into a larger buffer decode without copying them out
+        framed = b'..' + canonical_json(obj) + b'..'
+        assert decode_json(memoryview(framed)[2:-2]) == obj
+    
+    def test_wide_integers_round_trip(self, store):
+        """Integers beyond 64 bits are read back exactly, never as floats."""
+        from snapshot_store.integrity.canonical import canonical_json, decode_json
+        
+        values = [2 ** 70, -2 ** 70, 2 ** 64, -2 ** 63 - 1, 10 ** 19, 2 ** 63, -2 ** 63]
+        for value in values:
+            obj = {'n': value, 'list': [value, 1.5]}
+            decoded = decode_json(canonical_json(obj))
+            assert decoded == obj
+            assert type(decoded['n']) is int
+        
+        bundle_hash = store.put_bundle({'n': 2 ** 70})
+        bundle = store.get_bundle(bundle_hash)
+        assert bundle.bundle_data['n'] == 2 ** 70
+        assert type(bundle.bundle_data['n']) is int
+        assert store.object_store.get_object(bundle_hash, verify=False)['content']['n'] == 2 ** 70
+        assert store.object_store.load_many([bundle_hash])[bundle_hash]['content']['n'] == 2 ** 70
+    
+    def test_canonical_json_matches_stdlib(self):
+        """Canonical bytes match the standard library encoder exactly."""
+        import json
+        from snapshot_store.integrity.canonical import canonical_json, canonical_json_str
+        
+        values = [
+            0.1, 1.5, -0.0, 1e15, 1e16, 1.5e300, 2.5e-5, 1e-7, 0.0001,
+            2 ** 63, 2 ** 64, -2 ** 63 - 1, None, True,
+            'héllo\n\x00\x1f\x7f \U0001f600', 'e-mail', 'null',
+            {'￿': 1, '\U0001f600': 2, 'B': 3, 'a': 4}, {1: 'int key'},
+            ('tuple', 1),
+        ]
+        
+        for value in values:
+            expected = json.dumps(
+                {'value': value, 'list': [value]},
+                sort_keys=True,
+                separators=(',', ':'),
+                ensure_ascii=False,
+                allow_nan=False,
+            ).encode('utf-8')
+            assert canonical_json({'value': value, 'list': [value]}) == expected
+            assert canonical_json_str({'value': value, 'list': [value]}) == expected.decode('utf-8')
+        
+        with pytest.raises(ValueError):
+            canonical_json({'value': float('nan')})
+    
+    def test_canonical_json_rejects_what_stdlib_rejects(self):
+        """Non-JSON types encode, or fail, exactly as with the standard library."""
+        import dataclasses
+        import datetime
+        import decimal
+        import enum
+        import json
+        import uuid
+        from collections import OrderedDict
+        from snapshot_store.integrity.canonical import canonical_json
+        
+        class Color(enum.Enum):
+            RED = 'red'
+        
+        class Name(str, enum.Enum):
+            ADA = 'ada'
+        
+        class Level(enum.IntEnum):
+            HIGH = 3
+        
+        class Tag(str):
+            pass
+        
+        @dataclasses.dataclass
+        class Point:
+            x: int
+        
+        values = [
+            uuid.UUID(int=5), Color.RED, Name.ADA, Level.HIGH, Tag('tag'),
+            OrderedDict(b=1, a=2), decimal.Decimal('1.5'), b'bytes', {1, 2},
+            datetime.date(2024, 1, 1), Point(1), {Color.RED: 1}, {Name.ADA: 1},
+        ]
+        
+        for value in values:
+            obj = {'value': value, 'list': [value]}
+            try:
+                expected = json.dumps(
+                    obj,
+                    sort_keys=True,
+                    separators=(',', ':'),
+                    ensure_ascii=False,
+                    allow_nan=False,
+                ).encode('utf-8')
+            except TypeError:
+                with pytest.raises(TypeError):
+                    canonical_json(obj)
+            else:
+                assert canonical_json(obj) == expected
+    
+    def test_streamed_canonical_json_matches(self):
+        """Streamed fragments join to the one-shot canonical encoding."""
+        from snapshot_store.integrity.canonical import (
+            STREAM_LIST_CHUNK,
+            canonical_json,
+            iter_canonical_json,
+        )
+        from snapshot_store.integrity.hashing import compute_hash, compute_object_hash
+        
+        operations = [{'id': i, 'value': f'v{i}', 'x': i / 7} for i in range(2 * STREAM_LIST_CHUNK + 3)]
+        objects = [
+            Bundle({'sequence': 1, 'operations': operations}, {'note': 'é'}).to_dict(),
+            {'nested': {'b': [1, 2], 'a': {}}, 'list': list(range(STREAM_LIST_CHUNK + 1))},
+            {'keys': {1: 'int key'}},
+            {'quote"back\\slash': 1, 'new\nline\x00': 2, 'é\U0001f600': 3},
+            [], {}, 'text', 2 ** 70,
+        ]
+        
+        for obj in objects:
+            expected = canonical_json(obj)
+            assert b''.join(iter_canonical_json(obj)) == expected
+            assert compute_object_hash(obj) == compute_hash(expected)
+        
+        with pytest.raises(ValueError):
+            compute_object_hash({'value': [float('nan')]})
+    
+    def test_specialized_model_encoding_matches(self):
+        """Snapshots and trees encode exactly like their dictionaries."""
+        from snapshot_store.integrity.canonical import canonical_json, canonical_string_list
+        
+        h1, h2 = 'a' * 64, 'b' * 64
+        odd_lists = [[], [h1, h2], ['quote"', 'back\\slash', 'tab\t', 'é'], [h1, 7, None]]
+        for items in odd_lists:
+            assert canonical_string_list(items) == canonical_json(items)
+        
+        models = [
+            Snapshot([h1, h2]),
+            Snapshot([h1], parent=h2, metadata={'name': 'main', 'n': 1.5}),
+            Snapshot([], parent='', metadata={}),
+            Tree([h1, h2], {'names': {h1: 'x'}}),
+            Tree([]),
+        ] + [Snapshot(items, parent=h1) for items in odd_lists]
+        for model in models:
+            assert model.canonical_bytes() == canonical_json(model.to_dict())
+    
     def test_hash_length_and_format(self, store):
         """Test that hashes have expected length and format."""
         data = b"test"
@@ -165,6 +458,108 @@ class TestHashDeterminism:
         # Hex-encoded = 64 characters
         assert len(hash_str) == 64
         assert all(c in '0123456789abcdef' for c in hash_str)
+    
+    def test_hash_algorithm_reported(self, store):
+        """Statistics name the algorithm objects are hashed with."""
+        import hashlib
+        from snapshot_store.integrity.hashing import HAS_BLAKE3, compute_hash
+        
+        algorithm = store.get_statistics()['hash_algorithm']
+        
+        assert algorithm == ('blake3' if HAS_BLAKE3 else 'sha256')
+        if algorithm == 'sha256':
+            assert compute_hash(b'test') == hashlib.sha256(b'test').hexdigest()
+    
+    def test_incremental_hasher_matches_one_shot(self):
+        """Chunked hashing produces the same digest as one-shot hashing."""
+        from snapshot_store.integrity.hashing import (
+            compute_hash,
+            new_hasher,
+            PARALLEL_HASH_THRESHOLD,
+        )
+        
+        for size in (0, 1000, PARALLEL_HASH_THRESHOLD + 1):
+            data = bytes(i % 251 for i in range(size))
+            hasher = new_hasher(len(data))
+            hasher.update(data[:size // 2])
+            hasher.update(data[size // 2:])
+            assert hasher.hexdigest() == compute_hash(data)
+    
+    def test_bulk_hashes_match_one_shot(self):
+        """Bulk hashing returns the one-shot hashes in input order."""
+        from concurrent.futures import ThreadPoolExecutor
+        from snapshot_store.integrity.hashing import (
+            compute_hash,
+            compute_hashes_bulk,
+            PARALLEL_HASH_THRESHOLD,
+        )
+        
+        payloads = [bytes([i]) * (i * 997) for i in range(40)]
+        payloads.append(b'z' * (2 * PARALLEL_HASH_THRESHOLD))
+        expected = [compute_hash(data) for data in payloads]
+        
+        assert compute_hashes_bulk(payloads) == expected
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            assert compute_hashes_bulk(payloads, executor) == expected
+            assert compute_hashes_bulk([], executor) == []
+    
+    def test_streamed_blob_hash_matches_object_hash(self):
+        """Streaming blob content gives the same hash as encoding the dict."""
+        from snapshot_store.integrity.hashing import (
+            BASE64_CHUNK_SIZE,
+            compute_object_hash,
+        )
+        
+        for size in (0, 1, 2, 3, 1000, 2 * BASE64_CHUNK_SIZE + 1):
+            data = bytes(i % 251 for i in range(size))
+            for metadata in (None, {'name': 'fïle', 'tags': [1, 2]}):
+                blob = Blob(data, metadata)
+                assert blob.compute_hash() == compute_object_hash(blob.to_dict())
+    
+    def test_loaded_hashes_are_interned(self, store):
+        """Hashes read back from stored objects share one string object."""
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        snap1 = store.put_snapshot([bundle_hash])
+        snap2 = store.put_snapshot([bundle_hash], parent=snap1)
+        
+        first = store.get_snapshot(snap1).bundles[0]
+        second = store.get_snapshot(snap2).bundles[0]
+        
+        assert first == bundle_hash
+        assert first is second
+    
+    def test_constructed_hashes_are_interned(self):
+        """Models built directly share hash strings with each other."""
+        bundle_hash = Bundle({'sequence': 1, 'operations': []}).compute_hash()
+        # Build equal strings that are distinct objects
+        copies = [''.join(bundle_hash) for _ in range(3)]
+        
+        snap = Snapshot(copies[:1], parent=copies[1])
+        tree = Tree([copies[2]])
+        
+        assert snap.bundles[0] is snap.parent
+        assert tree.children[0] is snap.bundles[0]
+    
+    def test_digest_round_trip(self):
+        """Hex hashes convert to raw digests and back unchanged."""
+        from snapshot_store.integrity.hashing import (
+            DIGEST_SIZE,
+            hash_to_digest,
+            iter_digest_hashes,
+        )
+        
+        hashes = [Bundle({'sequence': i, 'operations': []}).compute_hash() for i in range(3)]
+        digests = [hash_to_digest(h) for h in hashes]
+        
+        assert all(len(d) == DIGEST_SIZE for d in digests)
+        assert list(iter_digest_hashes(b''.join(digests))) == hashes
+        
+        # Records may carry trailing bytes after the digest
+        records = b''.join(d + b'\x01' for d in digests)
+        assert list(iter_digest_hashes(records, DIGEST_SIZE + 1)) == hashes
+        
+        for invalid in ('', 'abc', 'zz' * DIGEST_SIZE, hashes[0][:-2], None):
+            assert hash_to_digest(invalid) is None
 
 
 class TestHashCollisionResistance:
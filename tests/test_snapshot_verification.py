@@ -7,6 +7,7 @@ Verifies integrity checking and corruption detection.
 import pytest
 import tempfile
 import json
+import os
 from pathlib import Path
 
 from snapshot_store import (
@@ -14,6 +15,7 @@ from snapshot_store import (
     ObjectCorruptedError,
     ReferenceMissingError,
     InvalidObjectError,
+    InvariantViolationError,
 )
 
 
@@ -138,6 +140,7 @@ class TestSnapshotVerification:
         
         assert len(result['broken_snapshots']) == 1
         assert snapshot in result['broken_snapshots']
+        assert result['missing_objects'] == {bundle1}
     
     def test_verify_empty_snapshot(self, store):
         """Verify snapshot with no bundles."""
@@ -146,6 +149,20 @@ class TestSnapshotVerification:
         result = store.verify_snapshot(snapshot)
         assert result['valid'] is True
     
+    def test_extract_references(self, store):
+        """References are read from the reference fields of each type."""
+        from snapshot_store.integrity.verification import extract_references
+        
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        parent = store.put_snapshot([bundle])
+        snapshot = store.put_snapshot([bundle], parent=parent)
+        
+        assert extract_references(store.object_store.get_object(snapshot)) == {bundle, parent}
+        assert extract_references(store.object_store.get_object(parent)) == {bundle}
+        assert extract_references(store.object_store.get_object(bundle)) == set()
+        assert extract_references({'type': 'tree', 'content': {'children': [bundle]}}) == {bundle}
+        assert extract_references({'type': 'snapshot', 'content': 'invalid'}) == set()
+    
     def test_verify_deep_snapshot_chain(self, store):
         """Verify a deep chain of snapshots."""
         # Create a chain of 10 snapshots
@@ -159,6 +176,41 @@ class TestSnapshotVerification:
         result = store.verify_snapshot(current)
         assert result['valid'] is True
     
+    def test_chain_longer_than_recursion_limit(self, store):
+        """Chains deeper than the recursion limit verify, loading each object once."""
+        import sys
+        from snapshot_store.integrity.verification import verify_snapshot_recursive
+        
+        shared = store.put_bundle({'sequence': 0, 'operations': []})
+        current = None
+        for i in range(sys.getrecursionlimit() + 10):
+            current = store.put_snapshot([shared], parent=current)
+        
+        loads = []
+        
+        def load(obj_hash):
+            loads.append(obj_hash)
+            return store.object_store.load_object(obj_hash)
+        
+        is_valid, errors = verify_snapshot_recursive(
+            current, load, store.object_store.exists_many
+        )
+        
+        assert is_valid is True, errors
+        assert len(loads) == len(set(loads)) == sys.getrecursionlimit() + 11
+    
+    def test_snapshot_chain(self, store):
+        """The chain walk returns snapshots from root to tip."""
+        chain = []
+        for i in range(5):
+            bundle = store.put_bundle({'sequence': i, 'operations': []})
+            chain.append(store.put_snapshot([bundle], parent=chain[-1] if chain else None))
+        
+        assert store.sync_adapter.get_snapshot_chain(chain[-1]) == chain
+        
+        with pytest.raises(ValueError):
+            store.sync_adapter.get_snapshot_chain(bundle)
+    
     def test_object_idempotency(self, store):
         """Storing same object twice is idempotent."""
         bundle_data = {'sequence': 1, 'operations': []}
@@ -185,6 +237,298 @@ class TestSnapshotVerification:
         
         # Data should match
         assert bundle.bundle_data == bundle_data
+    
+    def test_batch_put_matches_individual_puts(self, store):
+        """Batched writes return the same hashes, in input order."""
+        from snapshot_store import Bundle
+        
+        objs = [Bundle({'sequence': i, 'operations': []}).to_dict() for i in range(5)]
+        
+        batch_hashes = store.object_store.put_objects_batch(objs)
+        
+        assert batch_hashes == [store.object_store.put_object(o) for o in objs]
+        for h in batch_hashes:
+            assert store.verify_object(h) is True
+    
+    def test_large_batch_put_is_validated_first(self, store):
+        """Large batches match individual puts and store nothing if invalid."""
+        from snapshot_store import Bundle
+        from snapshot_store.storage.object_store import PARALLEL_WRITE_THRESHOLD
+        
+        objs = [
+            Bundle({'sequence': i, 'operations': []}).to_dict()
+            for i in range(PARALLEL_WRITE_THRESHOLD + 1)
+        ]
+        
+        with pytest.raises(InvalidObjectError):
+            store.object_store.put_objects_batch(objs + [{'type': 'unknown', 'content': {}}])
+        assert store.object_store.list_all_objects() == []
+        
+        batch_hashes = store.object_store.put_objects_batch(objs)
+        
+        assert batch_hashes == [store.object_store.put_object(o) for o in objs]
+        assert sorted(store.object_store.list_all_objects()) == sorted(batch_hashes)
+    
+    def test_large_import_matches_individual_puts(self, store):
+        """Parallel bundle import returns the same hashes, in input order."""
+        from snapshot_store.integration.sync_adapter import PARALLEL_IMPORT_THRESHOLD
+        
+        bundles = [
+            {'sequence': i, 'operations': []}
+            for i in range(PARALLEL_IMPORT_THRESHOLD + 1)
+        ]
+        
+        bundle_hashes, snapshot = store.import_sync_bundles(bundles)
+        
+        assert bundle_hashes == [store.put_bundle(b) for b in bundles]
+        assert store.verify_snapshot(snapshot)['valid'] is True
+    
+    def test_iter_snapshot_bundles(self, store):
+        """Lazy export yields the same bundles as the list export."""
+        from snapshot_store.errors import ObjectNotFoundError
+        
+        bundles = [{'sequence': i, 'operations': []} for i in range(3)]
+        _, snapshot = store.import_sync_bundles(bundles)
+        
+        exported = store.iter_snapshot_bundles(snapshot)
+        assert next(exported) == bundles[0]
+        assert list(exported) == bundles[1:]
+        assert store.export_snapshot_bundles(snapshot) == bundles
+        
+        with pytest.raises(ObjectNotFoundError):
+            store.iter_snapshot_bundles('a' * 64)
+    
+    def test_statistics_type_counts(self, store):
+        """Type counts come from the type index and follow deletions."""
+        bundles = [store.put_bundle({'sequence': i, 'operations': []}) for i in range(3)]
+        store.put_snapshot(bundles)
+        
+        stats = store.get_statistics()
+        assert (stats['bundle_count'], stats['snapshot_count']) == (3, 1)
+        assert store.layout.type_index_path.exists()
+        
+        store.object_store.delete_object(bundles[0])
+        assert store.get_statistics()['bundle_count'] == 2
+        
+        # A damaged index is rebuilt from the objects themselves
+        store.layout.type_index_path.write_bytes(b'garbage')
+        stats = store.get_statistics()
+        assert (stats['bundle_count'], stats['snapshot_count']) == (2, 1)
+    
+    def test_storage_stats_single_scan(self, store):
+        """Object counts and sizes match the object files on disk."""
+        hashes = [store.put_bundle({'sequence': i, 'operations': []}) for i in range(5)]
+        hashes.append(store.put_blob(b'x' * 1000))
+        
+        stats = store.layout.get_storage_stats()
+        
+        assert sorted(store.layout.iter_all_objects()) == sorted(hashes)
+        assert stats['total_objects'] == len(hashes)
+        assert stats['total_size_bytes'] == sum(
+            store.layout.get_object_path(h).stat().st_size for h in hashes
+        )
+    
+    def test_object_path_forms_agree(self, store):
+        """String and Path forms of an object path name the same file."""
+        obj_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        
+        path_str = store.layout.get_object_path_str(obj_hash)
+        
+        assert path_str == str(store.layout.get_object_path(obj_hash))
+        assert os.path.isfile(path_str)
+        with pytest.raises(ValueError):
+            store.layout.get_object_path_str('a')
+    
+    def test_verify_uses_string_paths(self, store, monkeypatch):
+        """Storing and verifying objects does not build Path objects."""
+        obj_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        
+        def fail(obj_hash):
+            raise AssertionError("Path built for object")
+        
+        monkeypatch.setattr(store.layout, 'get_object_path', fail)
+        
+        assert store.verify_object(obj_hash) is True
+        assert store.object_store.has_object(obj_hash)
+        assert store.put_bundle({'sequence': 1, 'operations': []}) == obj_hash
+        
+        with store.object_store.write_batch():
+            new_hash = store.put_bundle({'sequence': 2, 'operations': []})
+        store.object_store._use_tmpfile = False
+        replaced = store.put_blob(b"replaced", {'name': 'fallback'})
+        assert store.verify_object(new_hash) is True
+        assert store.verify_object(replaced) is True
+    
+    def test_objects_directory_descriptor_follows_store(self, store):
+        """Object access survives closing and recreating the objects directory."""
+        import shutil
+        
+        obj_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        if store.layout.objects_dir_fd() is None:
+            pytest.skip("dir_fd not supported")
+        
+        store.layout.close()
+        assert store.verify_object(obj_hash) is True
+        assert store.layout.objects_dir_fd() is not None
+        
+        shutil.rmtree(store.layout.objects_dir)
+        store.initialize()
+        assert not store.has_object(obj_hash)
+        assert store.put_bundle({'sequence': 1, 'operations': []}) == obj_hash
+        assert store.has_object(obj_hash)
+        assert store.object_store.delete_object(obj_hash) is True
+        assert not os.path.exists(store.layout.get_object_path_str(obj_hash))
+    
+    def test_object_directories_created_once(self, store, monkeypatch):
+        """Each prefix directory is created on first use only."""
+        from pathlib import Path
+        
+        created = []
+        mkdir = Path.mkdir
+        monkeypatch.setattr(
+            Path, 'mkdir',
+            lambda path, *args, **kwargs: created.append(path) or mkdir(path, *args, **kwargs),
+        )
+        
+        obj_hash = 'ab' * 32
+        for _ in range(3):
+            store.layout.ensure_object_directory(obj_hash)
+        
+        assert created == [store.layout.objects_dir / 'ab']
+        assert (store.layout.objects_dir / 'ab').is_dir()
+    
+    def test_export_snapshot_json(self, store, tmp_path):
+        """Streamed export matches the standard library's pretty-printing."""
+        bundle1 = store.put_bundle({
+            'sequence': 1,
+            'operations': [{'id': 1, 'name': 'héllo \U0001f600', 'big': 2 ** 70, 'x': 1e20}],
+        })
+        bundle2 = store.put_bundle({'sequence': 2, 'operations': []})
+        snapshot = store.put_snapshot([bundle2, bundle1], metadata={'note': 'x'})
+        
+        output_path = tmp_path / 'export.json'
+        store.export_snapshot_json(snapshot, output_path)
+        
+        expected = {
+            'snapshot_hash': snapshot,
+            'snapshot': store.get_snapshot(snapshot).to_dict(),
+            'bundles': {
+                h: store.get_bundle(h).to_dict() for h in (bundle1, bundle2)
+            },
+        }
+        assert output_path.read_bytes() == json.dumps(expected, indent=2, sort_keys=True).encode('ascii')
+    
+    def test_non_canonical_file_still_verifies(self, store):
+        """A reformatted but unchanged object passes the full check."""
+        bundle_data = {'sequence': 1, 'operations': []}
+        bundle_hash = store.put_bundle(bundle_data)
+        obj_path = store.layout.get_object_path(bundle_hash)
+        
+        obj_data = json.loads(obj_path.read_bytes())
+        with open(obj_path, 'w') as f:
+            json.dump(obj_data, f, indent=2)
+        
+        assert store.get_object_raw(bundle_hash) == obj_data
+        assert store.verify_object(bundle_hash) is True
+        assert store.verify_snapshot(store.put_snapshot([bundle_hash]))['valid'] is True
+    
+    def test_snapshot_verified_from_stored_bytes(self, store, monkeypatch):
+        """Intact objects are verified without re-encoding them."""
+        from snapshot_store.integrity import verification
+        
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot_hash = store.put_snapshot([bundle_hash])
+        
+        def fail(obj_data, obj_hash):
+            raise AssertionError(f"{obj_hash} was re-encoded")
+        
+        monkeypatch.setattr(verification, 'verify_object_integrity', fail)
+        assert store.verify_snapshot(snapshot_hash)['valid'] is True
+    
+    def test_verify_large_object_file(self, store):
+        """Memory-mapped verification accepts intact and rejects corrupted files."""
+        from snapshot_store.integrity.hashing import MMAP_THRESHOLD, compute_file_hash
+        
+        operations = [{'type': 'insert', 'data': 'x' * (4 * MMAP_THRESHOLD)}]
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': operations})
+        obj_path = store.layout.get_object_path(bundle_hash)
+        
+        assert compute_file_hash(obj_path) == bundle_hash
+        assert store.verify_object(bundle_hash) is True
+        
+        data = bytearray(obj_path.read_bytes())
+        index = data.rindex(b'"type"') + len(b'"type":"')
+        data[index:index + 4] = b'tree'
+        obj_path.write_bytes(bytes(data))
+        
+        with pytest.raises((ObjectCorruptedError, InvalidObjectError)):
+            store.verify_object(bundle_hash)
+    
+    def test_blob_stored_as_raw_bytes(self, store):
+        """Blobs are stored without base64 and keep their canonical hash."""
+        from snapshot_store.model.blob import Blob
+        
+        data = bytes(range(256)) * 64
+        blob_hash = store.put_blob(data, {'name': 'raw'})
+        obj_path = store.layout.get_object_path(blob_hash)
+        
+        assert blob_hash == Blob(data, {'name': 'raw'}).compute_hash()
+        assert obj_path.stat().st_size < len(Blob(data).canonical_bytes())
+        assert store.get_blob(blob_hash).data == data
+        assert store.get_blob(blob_hash).metadata == {'name': 'raw'}
+        assert store.object_store.get_object(blob_hash) == Blob(data, {'name': 'raw'}).to_dict()
+        assert store.verify_object(blob_hash) is True
+        
+        # Blobs stored as canonical JSON remain readable
+        legacy_hash = store.object_store.put_object(Blob(b'legacy').to_dict())
+        assert store.get_blob(legacy_hash).data == b'legacy'
+        
+        raw = bytearray(obj_path.read_bytes())
+        raw[-1] ^= 0xFF
+        obj_path.write_bytes(bytes(raw))
+        
+        with pytest.raises(ObjectCorruptedError):
+            store.verify_object(blob_hash)
+        with pytest.raises(ObjectCorruptedError):
+            store.get_blob(blob_hash)
+    
+    def test_verification_index(self, store):
+        """An indexed snapshot is re-verified only if its files changed."""
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot = store.put_snapshot([bundle])
+        
+        assert store.verify_snapshot(snapshot, use_index=True)['valid'] is True
+        assert store.layout.get_verify_cache_path(snapshot).exists()
+        assert store._verify_index_matches(snapshot) is True
+        
+        # Rewriting an object file invalidates the index entry
+        with open(store.layout.get_object_path(bundle), 'w') as f:
+            json.dump({'type': 'bundle', 'bundle': {'sequence': 2}}, f)
+        
+        assert store._verify_index_matches(snapshot) is False
+        assert store.verify_snapshot(snapshot, use_index=True)['valid'] is False
+    
+    def test_shared_visited_set_across_snapshots(self, store):
+        """A shared visited set records verified objects without hiding corruption."""
+        bundle1 = store.put_bundle({'sequence': 1, 'operations': []})
+        snap1 = store.put_snapshot([bundle1])
+        bundle2 = store.put_bundle({'sequence': 2, 'operations': []})
+        snap2 = store.put_snapshot([bundle2], parent=snap1)
+        
+        visited = set()
+        assert store.verify_snapshot(snap2, visited=visited)['valid'] is True
+        assert {snap1, snap2, bundle1, bundle2} <= visited
+        assert store.verify_snapshot(snap1, visited=visited)['valid'] is True
+        
+        # Corruption of an unverified object is still reported
+        bundle3 = store.put_bundle({'sequence': 3, 'operations': []})
+        snap3 = store.put_snapshot([bundle3], parent=snap2)
+        with open(store.layout.get_object_path(bundle3), 'w') as f:
+            json.dump({'type': 'bundle', 'bundle': {'sequence': 99}}, f)
+        
+        result = store.verify_snapshot(snap3, visited=visited)
+        assert result['valid'] is False
+        assert bundle3 not in visited
 
 
 class TestReferenceIntegrity:
@@ -238,6 +582,40 @@ class TestReferenceIntegrity:
         with pytest.raises(InvalidObjectError):
             store.sync_adapter.create_snapshot_from_bundles([fake_hash])
     
+    def test_exists_many(self, store):
+        """Bulk existence checks match has_object, including shard scans."""
+        from snapshot_store.storage.object_store import SCAN_SHARD_THRESHOLD
+        
+        present = store.sync_adapter.import_bundles(
+            [{'sequence': i, 'operations': []} for i in range(4 * SCAN_SHARD_THRESHOLD)]
+        )
+        shard = present[0][:2]
+        absent = [shard + f'{i:062x}' for i in range(SCAN_SHARD_THRESHOLD)]
+        absent.append('f' * 64)
+        
+        assert store.object_store.exists_many(present + absent) == set(present)
+        assert store.object_store.exists_many([]) == set()
+    
+    def test_snapshot_with_repeated_bundles(self, store):
+        """Repeated bundle hashes are checked once and kept in order."""
+        from snapshot_store.errors import InvalidObjectError
+        
+        bundle1 = store.put_bundle({'sequence': 1, 'operations': []})
+        bundle2 = store.put_bundle({'sequence': 2, 'operations': []})
+        order = [bundle1, bundle2, bundle1, bundle1]
+        
+        checked = []
+        exists_many = store.object_store.exists_many
+        store.object_store.exists_many = lambda hashes: checked.extend(hashes) or exists_many(hashes)
+        
+        snapshot = store.sync_adapter.create_snapshot_from_bundles(order)
+        
+        assert checked == [bundle1, bundle2]
+        assert store.get_snapshot(snapshot).bundles == tuple(order)
+        
+        with pytest.raises(InvalidObjectError):
+            store.sync_adapter.create_snapshot_from_bundles([bundle1, 'a' * 64, 'a' * 64])
+    
     def test_circular_reference_detection(self, store):
         """Detect circular references in snapshots."""
         # This is tricky - we need to manually create a circular reference
@@ -294,3 +672,133 @@ class TestIntegrityInvariants:
         # Should be identical
         assert obj1.bundle_data == obj2.bundle_data
         assert obj1.compute_hash() == obj2.compute_hash()
+    
+    def test_store_invariants_registry_reused(self, store, monkeypatch):
+        """Core invariants are built once per store and all hold."""
+        from snapshot_store import invariants
+        
+        calls = []
+        create = invariants.create_core_invariants
+        monkeypatch.setattr(invariants, 'create_core_invariants',
+                            lambda s: calls.append(s) or create(s))
+        
+        first = invariants.verify_store_invariants(store)
+        second = invariants.verify_store_invariants(store)
+        
+        assert first['all_passed'] is True
+        assert second == first
+        assert calls == [store]
+    
+    def test_invariant_registry_lookup(self):
+        """Invariants are looked up by name and names must be unique."""
+        from snapshot_store.invariants import InvariantRegistry
+        
+        registry = InvariantRegistry()
+        registry.register("holds", "Always holds", lambda: True)
+        registry.register("fails", "Never holds", lambda: False)
+        
+        assert registry.verify_one("holds") is True
+        with pytest.raises(InvariantViolationError):
+            registry.verify_one("fails")
+        with pytest.raises(ValueError):
+            registry.verify_one("unknown")
+        with pytest.raises(ValueError):
+            registry.register("holds", "Duplicate", lambda: True)
+        
+        assert registry.list_invariants() == [("holds", "Always holds"), ("fails", "Never holds")]
+
+
+class TestCompression:
+    """Test dictionary-compressed object files."""
+    
+    @pytest.fixture
+    def store(self):
+        """Create a store with a trained compression dictionary."""
+        pytest.importorskip('zstandard')
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            engine = SnapshotStoreEngine(tmpdir)
+            engine.initialize()
+            for i in range(200):
+                engine.put_bundle({
+                    'sequence': i,
+                    'operations': [{'type': 'insert', 'table': 'users', 'row': i}],
+                })
+            engine.train_compression_dictionary()
+            yield engine
+    
+    def test_compressed_round_trip(self, store):
+        """Compressed objects keep their hash and verify."""
+        bundle_data = {
+            'sequence': 1000,
+            'operations': [{'type': 'insert', 'table': 'users', 'row': 1000}],
+        }
+        bundle_hash = store.put_bundle(bundle_data)
+        
+        from snapshot_store.storage.compression import ZSTD_MAGIC
+        obj_path = store.layout.get_object_path(bundle_hash)
+        assert obj_path.read_bytes().startswith(ZSTD_MAGIC)
+        
+        assert store.get_bundle(bundle_hash).bundle_data == bundle_data
+        assert store.verify_object(bundle_hash) is True
+        assert store.put_bundle(bundle_data) == bundle_hash
+    
+    def test_retrained_dictionary_keeps_objects_readable(self, store):
+        """Objects compressed with an earlier dictionary stay readable."""
+        from snapshot_store.storage.compression import ZSTD_MAGIC
+        
+        # Opened before the next dictionary exists
+        other = SnapshotStoreEngine(store.store_path)
+        assert other.get_bundle(store.put_bundle({'sequence': 1001, 'operations': []}))
+        
+        hashes = []
+        for round_ in range(2):
+            hashes.append(store.put_bundle({
+                'sequence': 2000 + round_,
+                'operations': [{'type': 'insert', 'table': 'users', 'row': 2000 + round_}],
+            }))
+            for i in range(200):
+                store.put_bundle({'sequence': i, 'operations': [{'type': 'update', 'round': round_, 'row': i}]})
+            store.train_compression_dictionary()
+        hashes.append(store.put_bundle({
+            'sequence': 3000,
+            'operations': [{'type': 'update', 'round': 1, 'row': 3000}],
+        }))
+        
+        for obj_hash in hashes:
+            assert store.layout.get_object_path(obj_hash).read_bytes().startswith(ZSTD_MAGIC)
+        
+        reopened = SnapshotStoreEngine(store.store_path)
+        for engine in (store, reopened, other):
+            for obj_hash in hashes:
+                assert engine.get_bundle(obj_hash).compute_hash() == obj_hash
+            assert engine.detect_tampering()['tampered'] == []
+    
+    def test_dictionary_found_by_engine_opened_earlier(self, tmp_path):
+        """An engine that saw no dictionary still reads objects compressed later."""
+        pytest.importorskip('zstandard')
+        
+        early = SnapshotStoreEngine(tmp_path)
+        early.initialize()
+        assert early.object_store.compressor.enabled is False
+        
+        writer = SnapshotStoreEngine(tmp_path)
+        for i in range(200):
+            writer.put_bundle({'sequence': i, 'operations': [{'type': 'insert', 'row': i}]})
+        writer.train_compression_dictionary()
+        bundle_hash = writer.put_bundle({'sequence': 500, 'operations': [{'type': 'insert', 'row': 500}]})
+        
+        assert early.get_bundle(bundle_hash).compute_hash() == bundle_hash
+        assert early.detect_tampering()['tampered'] == []
+    
+    def test_compressed_tampering_detected(self, store):
+        """Corrupting a compressed file is detected."""
+        bundle_hash = store.put_bundle({'sequence': 1000, 'operations': []})
+        obj_path = store.layout.get_object_path(bundle_hash)
+        
+        data = bytearray(obj_path.read_bytes())
+        data[-1] ^= 0xFF
+        obj_path.write_bytes(bytes(data))
+        
+        result = store.detect_tampering()
+        assert bundle_hash in result['tampered']
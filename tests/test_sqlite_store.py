@@ -0,0 +1,193 @@
+"""
+Test the SQLite storage backend.
+
+Verifies that small objects are stored in the database, large objects
+fall back to files, and the engine behaves identically on both.
+"""
+
+import pytest
+import tempfile
+import threading
+
+from snapshot_store import (
+    SnapshotStoreEngine,
+    ObjectCorruptedError,
+    ObjectNotFoundError,
+)
+from snapshot_store.storage.sqlite_store import INLINE_LIMIT
+
+
+class TestSqliteBackend:
+    """Test the SQLite-backed object store."""
+    
+    @pytest.fixture
+    def store(self):
+        """Create a temporary SQLite-backed store for testing."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            engine = SnapshotStoreEngine(tmpdir, backend='sqlite')
+            engine.initialize()
+            yield engine
+            engine.object_store.close()
+    
+    def test_small_objects_stored_in_database(self, store):
+        """Small objects become database rows, not files."""
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        
+        assert store.has_object(bundle)
+        assert store.layout.objects_db_path.exists()
+        assert not store.layout.get_object_path(bundle).exists()
+        assert store.get_bundle(bundle).get_sequence_number() == 1
+    
+    def test_large_blobs_stored_as_files(self, store):
+        """Objects above the inline limit keep the file layout."""
+        blob = store.put_blob(b'x' * INLINE_LIMIT)
+        
+        assert store.layout.get_object_path(blob).exists()
+        assert store.get_blob(blob).size() == INLINE_LIMIT
+    
+    def test_hashes_match_file_backend(self, store):
+        """Both backends produce the same content hashes."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_engine = SnapshotStoreEngine(tmpdir)
+            file_engine.initialize()
+            
+            for data in (b'small', b'y' * INLINE_LIMIT):
+                assert store.put_blob(data) == file_engine.put_blob(data)
+    
+    def test_list_all_objects_spans_both_tiers(self, store):
+        """Listing yields database and file objects."""
+        small = store.put_blob(b'small')
+        large = store.put_blob(b'z' * INLINE_LIMIT)
+        
+        assert set(store.list_all_objects()) == {small, large}
+        assert store.get_statistics()['total_objects'] == 2
+        assert 'objects=2' in store.describe()
+        
+        # Cached statistics are reused within max_age
+        store.put_bundle({'sequence': 2, 'operations': []})
+        assert store.get_statistics(max_age=3600)['total_objects'] == 2
+        assert store.get_statistics()['total_objects'] == 3
+        assert store.get_statistics()['bundle_count'] == 1
+    
+    def test_exists_many_spans_both_tiers(self, store):
+        """Bulk existence checks find database rows and object files."""
+        small = store.put_blob(b'small')
+        large = store.put_blob(b'z' * INLINE_LIMIT)
+        
+        found = store.object_store.exists_many([small, large, 'b' * 64, 'not-a-hash'])
+        assert found == {small, large}
+    
+    def test_import_and_gc(self, store):
+        """Batch import, verification and GC work on the database."""
+        bundle_hashes, snapshot = store.import_sync_bundles(
+            [{'sequence': i, 'operations': []} for i in range(3)],
+            snapshot_name='main',
+        )
+        orphan = store.put_bundle({'sequence': 99, 'operations': []})
+        
+        assert store.verify_snapshot(snapshot)['valid'] is True
+        
+        result = store.garbage_collect()
+        
+        assert result['deleted'] == [orphan]
+        assert not store.has_object(orphan)
+        for h in bundle_hashes + [snapshot]:
+            assert store.has_object(h)
+    
+    def test_gc_mark_loads_waves_in_bulk(self, store):
+        """Wide mark waves are loaded with batched queries, across both tiers."""
+        from snapshot_store.storage.gc import PARALLEL_MARK_THRESHOLD
+        
+        bundles = [
+            store.put_bundle({'sequence': i, 'operations': []})
+            for i in range(2 * PARALLEL_MARK_THRESHOLD)
+        ]
+        blob = store.put_blob(b'x' * INLINE_LIMIT)
+        tree = store.put_tree(bundles + [blob])
+        
+        loaded = store.object_store.load_many(bundles + [blob, 'f' * 64])
+        assert set(loaded) == set(bundles) | {blob}
+        assert loaded[blob]['type'] == 'blob'
+        
+        refs = store.object_store.get_object_refs_many([tree, blob, 'f' * 64])
+        assert refs == {tree: set(bundles) | {blob}, blob: set()}
+        
+        # Only the single-object root wave is loaded on its own
+        loads = []
+        load = store.gc.load_references
+        store.gc.load_references = lambda h: loads.append(h) or load(h)
+        
+        assert store.gc.compute_closure(tree) == (frozenset(bundles) | {blob, tree}, True)
+        assert loads == [tree]
+    
+    def test_batch_import_repairs_and_reuses_rows(self, store):
+        """Batch imports keep intact rows and replace corrupted ones."""
+        bundles = [{'sequence': i, 'operations': []} for i in range(3)]
+        bundles.append({'sequence': 3, 'operations': [], 'data': 'x' * INLINE_LIMIT})
+        
+        bundle_hashes = store.sync_adapter.import_bundles(bundles)
+        assert bundle_hashes == [store.put_bundle(b) for b in bundles]
+        assert store.layout.get_object_path(bundle_hashes[3]).exists()
+        
+        store.object_store._execute(
+            "UPDATE objects SET payload = ? WHERE hash = ?",
+            (b'{"content":{"sequence":9},"type":"bundle"}', bytes.fromhex(bundle_hashes[0])),
+        )
+        
+        assert store.sync_adapter.import_bundles(bundles) == bundle_hashes
+        for bundle_hash in bundle_hashes:
+            assert store.verify_object(bundle_hash) is True
+    
+    def test_concurrent_write_batches(self, store):
+        """Batches from several threads commit without interleaving."""
+        errors = []
+        
+        def write(n):
+            try:
+                with store.object_store.write_batch():
+                    for i in range(20):
+                        store.put_bundle({'sequence': n * 100 + i, 'operations': []})
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        (count,) = store.object_store._execute("SELECT COUNT(*) FROM objects").fetchone()
+        assert count == 80
+    
+    def test_detect_tampered_row(self, store):
+        """Corrupted database rows fail verification."""
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        
+        store.object_store._execute(
+            "UPDATE objects SET payload = ? WHERE hash = ?",
+            (b'{"content":{"sequence":2},"type":"bundle"}', bytes.fromhex(bundle)),
+        )
+        
+        with pytest.raises(ObjectCorruptedError):
+            store.verify_object(bundle)
+        assert store.detect_tampering()['tampered'] == [bundle]
+    
+    def test_missing_object(self, store):
+        """Unknown hashes raise ObjectNotFoundError."""
+        with pytest.raises(ObjectNotFoundError):
+            store.get_object_raw('a' * 64)
+    
+    def test_unknown_backend(self):
+        """Unknown backend names are rejected."""
+        with pytest.raises(ValueError):
+            SnapshotStoreEngine('/tmp/unused', backend='nope')
+    
+    def test_existence_filter(self, store):
+        """Inline objects are recorded in the existence filter."""
+        store.object_store.enable_existence_filter()
+        
+        bundle = store.put_bundle({'sequence': 1, 'operations': []})
+        
+        assert store.has_object(bundle)
+        assert not store.has_object('b' * 64)
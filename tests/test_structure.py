@@ -45,3 +45,16 @@ def test_subpackage_imports():
     
     assert snapshot_store.storage.object_store.ObjectStore is not None
     assert snapshot_store.integrity.hashing.compute_hash is not None
+
+
+def test_model_objects_are_frozen():
+    """Verify that model objects use slots and reject attribute writes."""
+    import dataclasses
+    
+    snapshot = Snapshot(['a' * 64])
+    
+    assert not hasattr(snapshot, '__dict__')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snapshot.parent = 'b' * 64
+    
+    assert Snapshot.bundle_hashes_only(snapshot.to_dict()) == ('a' * 64,)
@@ -7,6 +7,8 @@ Verifies that tampering with stored objects is detected.
 import pytest
 import tempfile
 import json
+import os
+import time
 from pathlib import Path
 
 from snapshot_store import (
@@ -16,6 +18,19 @@ from snapshot_store import (
 )
 
 
+def rewrite_in_place(path, old: bytes, new: bytes) -> None:
+    """Replace bytes of a file in place, keeping its size, inode and mtime."""
+    st = os.stat(path)
+    data = Path(path).read_bytes().replace(old, new)
+    assert len(data) == st.st_size
+    
+    # Let the rewrite fall in a later timestamp tick than the last change
+    time.sleep(0.01)
+    with open(path, 'r+b') as f:
+        f.write(data)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
 class TestTamperDetection:
     """Test detection of tampered objects."""
     
@@ -74,6 +89,20 @@ class TestTamperDetection:
         with pytest.raises(Exception):  # StorageError or similar
             store.get_bundle(bundle_hash)
     
+    def test_undecodable_object_reported_as_corrupted(self, store):
+        """Verified reads hash stored bytes before decoding them."""
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        blob_hash = store.put_blob(b"payload")
+        
+        for obj_hash in (bundle_hash, blob_hash):
+            obj_path = store.layout.get_object_path(obj_hash)
+            obj_path.write_bytes(obj_path.read_bytes()[:-3])
+            
+            with pytest.raises(ObjectCorruptedError):
+                store.object_store.get_object(obj_hash)
+            with pytest.raises(ObjectCorruptedError):
+                store.verify_object(obj_hash)
+    
     def test_detect_deleted_object(self, store):
         """Detect when object file is deleted."""
         from snapshot_store.errors import ObjectNotFoundError
@@ -221,6 +250,27 @@ class TestIntegrityGuarantees:
         # Verify stored correctly
         assert store.has_object(bundle)
     
+    def test_invalid_structure_rejected(self, store):
+        """Malformed objects are rejected before anything is stored."""
+        from collections import OrderedDict
+        
+        invalid = [
+            ['type', 'bundle'],
+            {'content': {}},
+            {'type': 'bundle'},
+            {'type': 'other', 'content': {}},
+            {'type': ['bundle'], 'content': {}},
+            {'type': 'bundle', 'content': {}, 'metadata': None},
+        ]
+        for obj_data in invalid:
+            with pytest.raises(InvalidObjectError):
+                store.object_store.put_object(obj_data)
+        assert list(store.object_store.iter_all_objects()) == []
+        
+        # Dictionary subclasses are still accepted
+        obj_data = OrderedDict(type='bundle', content={'sequence': 1}, metadata=OrderedDict(a=1))
+        assert store.object_store.put_object(obj_data) == store.put_bundle({'sequence': 1}, metadata={'a': 1})
+    
     def test_atomic_writes(self, store):
         """Object writes are atomic."""
         # Create many objects rapidly
@@ -234,6 +284,66 @@ class TestIntegrityGuarantees:
             assert store.has_object(h)
             assert store.verify_object(h) is True
     
+    def test_writes_leave_no_temporary_files(self, store):
+        """Both write strategies leave only object files behind."""
+        import os
+        
+        hashes = [store.put_bundle({'sequence': i, 'operations': []}) for i in range(5)]
+        store.object_store._use_tmpfile = False
+        hashes += [store.put_bundle({'sequence': i, 'operations': []}) for i in range(5, 10)]
+        
+        names = {
+            name
+            for prefix in os.listdir(store.layout.objects_dir)
+            for name in os.listdir(store.layout.objects_dir / prefix)
+        }
+        assert names == set(hashes)
+        assert all(store.verify_object(h) for h in hashes)
+    
+    def test_short_writes_are_completed(self, store, monkeypatch):
+        """Objects are written whole even if each write is partial."""
+        import os
+        
+        write = os.write
+        monkeypatch.setattr(os, 'write', lambda fd, data: write(fd, data[:1000]))
+        
+        data = bytes(range(256)) * 64
+        new_hash = store.put_blob(data)
+        store.object_store._use_tmpfile = False
+        replaced_hash = store.put_blob(data, {'name': 'fallback'})
+        
+        assert store.get_blob(new_hash).data == data
+        assert store.get_blob(replaced_hash).data == data
+        assert store.verify_object(replaced_hash) is True
+    
+    def test_malformed_hashes_never_reach_the_filesystem(self, store):
+        """Hashes that are not lowercase hex digests name no object."""
+        from snapshot_store.errors import ObjectNotFoundError
+        
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        outside = store.layout.store_root / ('a' * 61)
+        outside.write_bytes(b'not an object')
+        
+        malformed = [
+            bundle_hash.upper(),
+            bundle_hash[:-1],
+            '../' + 'a' * 61,
+            bundle_hash[:-1] + '\u00e9',
+        ]
+        for bad_hash in malformed:
+            assert not store.has_object(bad_hash)
+            assert store.object_store.delete_object(bad_hash) is False
+            with pytest.raises(ObjectNotFoundError):
+                store.object_store.get_object(bad_hash)
+            with pytest.raises(ObjectNotFoundError):
+                store.object_store.verify_object(bad_hash)
+            with pytest.raises(ValueError):
+                store.layout.get_object_path_str(bad_hash)
+        
+        assert store.object_store.exists_many(malformed + [bundle_hash]) == {bundle_hash}
+        assert outside.exists()
+        assert store.has_object(bundle_hash)
+    
     def test_immutability_after_storage(self, store):
         """Objects remain immutable after storage."""
         bundle_data = {'sequence': 1, 'operations': []}
@@ -252,6 +362,168 @@ class TestIntegrityGuarantees:
         assert bundle1.bundle_data == bundle2.bundle_data
         assert bundle1.compute_hash() == bundle2.compute_hash()
     
+    def test_cached_object_reloaded_after_tampering(self, store):
+        """Cached loads are reused only while the object file is unchanged."""
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        
+        bundle1 = store.get_bundle(bundle_hash)
+        assert store.get_bundle(bundle_hash).bundle_data == bundle1.bundle_data
+        assert bundle_hash in store._model_cache
+        
+        # Tamper with the file after it was cached
+        obj_path = store.layout.get_object_path(bundle_hash)
+        with open(obj_path, 'w') as f:
+            f.write('{"type": "bundle", "content": {"sequence": 2, "operations": []}}')
+        
+        with pytest.raises((ObjectCorruptedError, InvalidObjectError)):
+            store.get_bundle(bundle_hash)
+    
+    def test_cached_model_reloaded_after_in_place_rewrite(self, store):
+        """A rewrite that keeps size, inode and mtime still drops cached models."""
+        bundle_hash = store.put_bundle({'v': 'aaaa'})
+        tree_hash = store.put_tree([bundle_hash], metadata={'v': 'aaaa'})
+        snapshot_hash = store.put_snapshot([bundle_hash], metadata={'v': 'aaaa'})
+        
+        for obj_hash, get in [
+            (bundle_hash, store.get_bundle),
+            (tree_hash, store.get_tree),
+            (snapshot_hash, store.get_snapshot),
+        ]:
+            assert get(obj_hash).to_dict() == get(obj_hash).to_dict()
+            assert obj_hash in store._model_cache
+            rewrite_in_place(store.layout.get_object_path(obj_hash), b'aaaa', b'bbbb')
+            with pytest.raises((ObjectCorruptedError, InvalidObjectError)):
+                get(obj_hash)
+    
+    def test_cached_models_are_not_shared(self, store, monkeypatch):
+        """Each read returns its own model; changing one never changes the cache."""
+        bundle_hash = store.put_bundle({'rows': [1, 2]}, metadata={'tag': 'a'})
+        snapshot_hash = store.put_snapshot([bundle_hash], metadata={'tag': 'a'})
+        
+        bundle = store.get_bundle(bundle_hash)
+        bundle.bundle_data['rows'].append(99)
+        bundle.metadata['tag'] = 'b'
+        store.get_snapshot(snapshot_hash).metadata['tag'] = 'b'
+        
+        loads = []
+        load = store.object_store.load_verified_object
+        monkeypatch.setattr(
+            store.object_store, 'load_verified_object',
+            lambda h: loads.append(h) or load(h),
+        )
+        
+        again = store.get_bundle(bundle_hash)
+        assert again is not bundle
+        assert again.bundle_data == {'rows': [1, 2]}
+        assert again.metadata == {'tag': 'a'}
+        assert store.get_snapshot(snapshot_hash).metadata == {'tag': 'a'}
+        assert loads == []
+    
+    def test_repeated_put_repairs_tampered_file(self, store, monkeypatch):
+        """Re-puts skip reading an unchanged file but still repair a changed one."""
+        bundle_data = {'sequence': 1, 'operations': []}
+        bundle_hash = store.put_bundle(bundle_data)
+        store.put_bundle(bundle_data)
+        
+        reads = []
+        read = store.object_store._read_object_file
+        monkeypatch.setattr(
+            store.object_store, '_read_object_file',
+            lambda path: reads.append(path) or read(path),
+        )
+        store.put_bundle(bundle_data)
+        assert reads == []
+        
+        obj_path = store.layout.get_object_path(bundle_hash)
+        with open(obj_path, 'w') as f:
+            f.write('{"type": "bundle", "content": {"sequence": 2, "operations": []}}')
+        
+        assert store.put_bundle(bundle_data) == bundle_hash
+        assert reads == [str(obj_path)]
+        assert store.verify_object(bundle_hash) is True
+    
+    def test_fingerprint_changes_on_in_place_rewrite(self, store):
+        """Rewriting a file in place and restoring its mtime is still noticed."""
+        bundle_data = {'sequence': 1, 'operations': []}
+        bundle_hash = store.put_bundle(bundle_data)
+        store.put_bundle(bundle_data)
+        snapshot_hash = store.put_snapshot([bundle_hash])
+        assert store.verify_snapshot(snapshot_hash, use_index=True)['valid'] is True
+        
+        fingerprint = store.object_store.object_fingerprint(bundle_hash)
+        obj_path = store.layout.get_object_path(bundle_hash)
+        rewrite_in_place(obj_path, b'"sequence":1', b'"sequence":2')
+        assert os.stat(obj_path).st_mtime_ns == fingerprint[1]
+        assert store.object_store.object_fingerprint(bundle_hash) != fingerprint
+        
+        # Neither the on-disk verification index nor a put trust the file
+        fresh = SnapshotStoreEngine(store.layout.store_root)
+        result = fresh.verify_snapshot(snapshot_hash, use_index=True)
+        assert result['valid'] is False
+        
+        assert not store.object_store._known_intact(bundle_hash)
+        assert store.put_bundle(bundle_data) == bundle_hash
+        assert store.verify_object(bundle_hash) is True
+    
+    def test_repeated_model_put_skips_encoding(self, store, monkeypatch):
+        """A known-intact model is not re-encoded; a changed file is repaired."""
+        from snapshot_store import Bundle
+        from snapshot_store.storage import object_store as object_store_module
+        
+        bundle = Bundle({'sequence': 1, 'operations': []})
+        obj_hash = store.object_store.put_model(bundle)
+        # The repeated put finds the file intact and remembers it
+        store.object_store.put_model(bundle)
+        other_hash = store.put_bundle({'sequence': 2, 'operations': []})
+        
+        def fail(obj):
+            raise AssertionError("object was encoded")
+        
+        with monkeypatch.context() as patch:
+            patch.setattr(object_store_module, 'canonical_json', fail)
+            assert store.object_store.put_model(bundle) == obj_hash
+        
+        # A changed file is verified and repaired as usual
+        obj_path = store.layout.get_object_path(obj_hash)
+        obj_path.write_bytes(store.layout.get_object_path(other_hash).read_bytes())
+        assert store.object_store.put_model(bundle) == obj_hash
+        assert store.verify_object(obj_hash) is True
+    
+    def test_snapshot_reverified_after_in_place_rewrite(self, store):
+        """The verification memo is not fooled by a restored mtime."""
+        bundle_hash = store.put_bundle({'v': 'aaaa'})
+        snapshot_hash = store.put_snapshot([bundle_hash])
+        assert store.verify_snapshot(snapshot_hash)['valid'] is True
+        
+        rewrite_in_place(store.layout.get_object_path(bundle_hash), b'aaaa', b'bbbb')
+        
+        result = store.verify_snapshot(snapshot_hash)
+        assert result['valid'] is False
+        assert any(bundle_hash in error for error in result['errors'])
+    
+    def test_snapshot_reverified_after_tampering(self, store, monkeypatch):
+        """Remembered verifications are dropped when a file changes."""
+        from snapshot_store.integrity import verification
+        
+        bundle_hash = store.put_bundle({'sequence': 1, 'operations': []})
+        snapshot_hash = store.put_snapshot([bundle_hash])
+        assert store.verify_snapshot(snapshot_hash)['valid'] is True
+        
+        # Unchanged objects are not re-hashed by a second verification
+        def fail(obj_data, *args):
+            raise AssertionError("an object was re-verified")
+        
+        with monkeypatch.context() as patch:
+            patch.setattr(verification, 'verify_object_integrity', fail)
+            patch.setattr(verification, 'verify_object_integrity_bytes', fail)
+            assert store.verify_snapshot(snapshot_hash)['valid'] is True
+        
+        obj_path = store.layout.get_object_path(bundle_hash)
+        with open(obj_path, 'w') as f:
+            f.write('{"type": "bundle", "content": {"sequence": 2, "operations": []}}')
+        
+        assert store.verify_snapshot(snapshot_hash)['valid'] is False
+    
     def test_verification_catches_all_tampering(self, store):
         """Verification catches all forms of tampering."""
         # Create object